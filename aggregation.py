@@ -0,0 +1,206 @@
+import pyomo.environ as pyo
+import numpy as np
+import time
+
+import input
+from pyo_model import build_model, solve_model, is_solved, extract_results, split_units
+from pyo_model import BATTERY_START, BATTERY_LOAD_TIME, BATTERY_EFF, START_UP_COST, MIN_POWER
+from merit_order import net_demand
+
+
+# ## Aggregation settings
+DAY = 24  # hours in one period
+KMEANS_ITERATIONS = 100
+
+
+def annual_profiles(days=365, profiles=input.profiles, seed=0):
+    '''Synthetic year from the daily profile - seasonal demand and pv, weather driven wind and clouds.
+    Demand is never lower and renewables never higher than in the daily profile, so each day stays feasible.'''
+
+    rng = np.random.default_rng(seed)
+
+    season = np.cos( 2 * np.pi * ( np.arange(days) - 196 ) / 365 )  # 1 in mid July, -1 in mid January
+    demand = np.array(profiles['demand']) * ( 1 + 0.08 * ( 1 + season ) )[:, None] * rng.uniform(1, 1.04, (days, DAY))
+    wind = np.array(profiles['wind']) * np.clip( rng.uniform(0.3, 1, (days, 1)) * rng.normal(1, 0.05, (days, DAY)), 0, 1 )
+    pv = np.array(profiles['pv']) * ( 0.75 + 0.25 * season )[:, None] * rng.uniform(0.5, 1, (days, 1))
+
+    return {
+        'demand': demand.round(3).ravel().tolist(),
+        'wind': wind.round(3).ravel().tolist(),
+        'pv': pv.round(3).ravel().tolist(),
+    }
+
+
+def day_profiles(profiles, day):
+
+    return { key: list(values[day * DAY:(day + 1) * DAY]) for key, values in profiles.items() }
+
+
+def cluster_days(units, profiles, n, seed=0):
+    '''Group days by their demand, wind and pv production (k-means), each group is represented by its most typical day.
+    Day with highest net demand is always kept as its own period, so peak adequacy is not averaged away (n >= 2).'''
+
+    if n < 2:
+        raise ValueError('At least 2 representative days are needed - peak day and one typical day.')
+
+    _, demand_sources, wind_farms, pv_farms, _ = split_units(units)
+    days = len(profiles['demand']) // DAY
+
+    # Features in MW - hourly demand, wind and pv production
+    installed = [
+        sum( ele['power'] for ele in demand_sources.values() ),
+        sum( ele['power'] for ele in wind_farms.values() ),
+        sum( ele['power'] for ele in pv_farms.values() ),
+    ]
+    features = np.hstack([ np.array(profiles[key]).reshape(days, DAY) * power for key, power in zip(['demand', 'wind', 'pv'], installed) ])
+
+    peak_day = int( net_demand(units, profiles).reshape(days, DAY).max(axis=1).argmax() )
+    others = np.array([ day for day in range(days) if day != peak_day ])
+    k = min(n - 1, len(others))
+
+    # k-means++ initialization
+    rng = np.random.default_rng(seed)
+    centers = features[ others[[rng.integers(len(others))]] ]
+    while len(centers) < k:
+        distance = ( ( features[others, None, :] - centers[None, :, :] ) ** 2 ).sum(axis=2).min(axis=1)
+        centers = np.vstack([ centers, features[ others[rng.choice(len(others), p=distance / distance.sum())] ] ])
+
+    for _ in range(KMEANS_ITERATIONS):
+        labels = ( ( features[others, None, :] - centers[None, :, :] ) ** 2 ).sum(axis=2).argmin(axis=1)
+        new_centers = np.array([ features[others[labels == c]].mean(axis=0) if (labels == c).any() else centers[c] for c in range(k) ])
+        if np.allclose(new_centers, centers):
+            break
+        centers = new_centers
+
+    # Representative day of group - its member closest to the group mean
+    representatives, groups = [], []
+    for c in range(k):
+        members = others[labels == c]
+        if len(members):
+            representatives.append( int( members[ ( ( features[members] - centers[c] ) ** 2 ).sum(axis=1).argmin() ] ) )
+            groups.append(members)
+    representatives.append(peak_day)
+    groups.append(np.array([peak_day]))
+
+    assignment = [0] * days
+    for period, members in enumerate(groups):
+        for day in members:
+            assignment[int(day)] = period
+
+    return {
+        'days': representatives,
+        'weights': [ len(members) for members in groups ],
+        'assignment': assignment,
+    }
+
+
+def _link_period(block, batteries):
+    '''Representative day with commitment and battery level at day start given from outside'''
+
+    last = block.hours.last()
+
+    # Start-up at hour 1 depends on the previous day of the horizon - it is counted in the horizon model, not in the period
+    for plant in block.plants:
+        block.ct_change_state[plant, 1].deactivate()
+        for var in [block.change_state, block.switch_on, block.switch_off]:
+            var[plant, 1].fix(0)
+
+    # Battery level at day start and swing of the level during the day
+    for battery in block.batteries:
+        block.b_volume_state[battery, 1].deactivate()
+    block.b_start = pyo.Var(block.batteries, domain=pyo.NonNegativeReals, bounds=lambda b, battery: (0, batteries[battery]['power'] * BATTERY_LOAD_TIME))
+    block.b_swing_max = pyo.Var(block.batteries, domain=pyo.Reals)
+    block.b_swing_min = pyo.Var(block.batteries, domain=pyo.Reals)
+    block.ct_b_start = pyo.Constraint(block.batteries, rule=lambda b, battery: b.b_volume[battery, 1] == ( b.b_load[battery, 1] * BATTERY_EFF + b.b_reload[battery, 1] ) * b.duration[1] + b.b_start[battery])
+    block.ct_b_swing_max = pyo.Constraint(block.batteries, block.hours, rule=lambda b, battery, hour: b.b_volume[battery, hour] - b.b_start[battery] <= b.b_swing_max[battery])
+    block.ct_b_swing_min = pyo.Constraint(block.batteries, block.hours, rule=lambda b, battery, hour: b.b_volume[battery, hour] - b.b_start[battery] >= b.b_swing_min[battery])
+    block.b_delta = pyo.Expression(block.batteries, rule=lambda b, battery: b.b_volume[battery, last] - b.b_start[battery])
+
+
+def aggregated_uc(units, profiles, n, seed=0):
+    '''UC of long horizon solved on n weighted representative days - commitment and battery level are linked through the whole horizon
+    (day by day in chronological order), results are expanded back to every hour'''
+
+    start_time = time.time()
+
+    plants, _, _, _, batteries = split_units(units)
+    clusters = cluster_days(units, profiles, n, seed)
+    periods = list(range(len(clusters['days'])))
+    days = list(range(len(clusters['assignment'])))
+    assignment = clusters['assignment']
+
+    model = pyo.ConcreteModel()
+    model.periods = pyo.Set(initialize=periods)
+    model.period = pyo.Block(model.periods)
+    for period in periods:
+        build_model(units, day_profiles(profiles, clusters['days'][period]), model=model.period[period])
+        model.period[period].system_costs.deactivate()
+        _link_period(model.period[period], batteries)
+
+    # Start-up at the first hour of each day of the horizon - against the last hour of the previous day (all plants are off before the horizon)
+    model.plants = pyo.Set(initialize=list(plants.keys()))
+    model.day_start_up = pyo.Var(model.plants, days, domain=pyo.NonNegativeReals, bounds=(0, 1))
+    model.ct_day_start_up = pyo.Constraint(model.plants, days, rule=lambda m, plant, day:
+        m.day_start_up[plant, day] >= m.period[assignment[day]].on[plant, 1] - ( m.period[assignment[day-1]].on[plant, DAY] if day > 0 else 0 ))
+
+    # Ramp from the last hour of the previous day (as ramp_up / ramp_down of hourly model)
+    def day_ramp(m, plant, day, sense):
+        before, after = m.period[assignment[day-1]], m.period[assignment[day]]
+        change = after.power[plant, 1] - before.power[plant, DAY]
+        if sense > 0:
+            return change <= plants[plant]['ramp'] * before.on[plant, DAY] + MIN_POWER * plants[plant]['power'] * ( 1 - before.on[plant, DAY] )
+        return change >= - plants[plant]['ramp'] * after.on[plant, 1] - plants[plant]['power'] * ( 1 - after.on[plant, 1] )
+
+    model.ct_day_ramp_up = pyo.Constraint(model.plants, days[1:], rule=lambda m, plant, day: day_ramp(m, plant, day, 1))
+    model.ct_day_ramp_down = pyo.Constraint(model.plants, days[1:], rule=lambda m, plant, day: day_ramp(m, plant, day, -1))
+
+    # Battery level at start of each day of the horizon
+    model.batteries = pyo.Set(initialize=list(batteries.keys()))
+    model.days = pyo.Set(initialize=days + [len(days)])
+    model.b_level = pyo.Var(model.batteries, model.days, domain=pyo.NonNegativeReals, bounds=lambda m, battery, day: (0, batteries[battery]['power'] * BATTERY_LOAD_TIME))
+    model.ct_level_start = pyo.Constraint(model.batteries, rule=lambda m, battery: m.b_level[battery, 0] == batteries[battery]['power'] * BATTERY_START * BATTERY_LOAD_TIME)
+    model.ct_level = pyo.Constraint(model.batteries, days, rule=lambda m, battery, day: m.b_level[battery, day + 1] == m.b_level[battery, day] + m.period[assignment[day]].b_delta[battery])
+    model.ct_level_max = pyo.Constraint(model.batteries, days, rule=lambda m, battery, day: m.b_level[battery, day] + m.period[assignment[day]].b_swing_max[battery] <= batteries[battery]['power'] * BATTERY_LOAD_TIME)
+    model.ct_level_min = pyo.Constraint(model.batteries, days, rule=lambda m, battery, day: m.b_level[battery, day] + m.period[assignment[day]].b_swing_min[battery] >= 0)
+
+    model.system_costs = pyo.Objective(
+        expr =
+        + sum( clusters['weights'][period] * model.period[period].system_costs.expr for period in periods )
+        + sum( START_UP_COST * plants[plant]['vc'] * plants[plant]['power'] * model.day_start_up[plant, day] for plant in model.plants for day in days )
+        , sense=pyo.minimize)
+
+    pyo.TransformationFactory('gdp.hull').apply_to(model)
+    results = solve_model(model)
+
+    if not is_solved(results):
+        print('Model is infeasible')
+        return False
+
+    # ## Expand representative days to the whole horizon
+    period_results = [ extract_results(model.period[period], units, day_profiles(profiles, clusters['days'][period])) for period in periods ]
+    expanded = {
+        unit: { day * DAY + hour: period_results[assignment[day]][unit][hour] for day in days for hour in range(1, DAY + 1) }
+        for unit in period_results[0]
+    }
+
+    return {
+        'results': expanded,
+        'cost': pyo.value(model.system_costs),
+        'sys_cost': f'{round(pyo.value(model.system_costs), 0)} $',
+        'battery_level': { battery: [ round(pyo.value(model.b_level[battery, day]), 2) for day in model.days ] for battery in model.batteries },
+        'clusters': clusters,
+        'wall_time': time.time() - start_time,
+    }
+
+
+if __name__ == '__main__':
+
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
+
+    # Whole year on representative days
+    year = annual_profiles()
+    for n in [4, 8, 12]:
+        result = aggregated_uc(input.units, year, n)
+        if result:
+            print(f"{n} representative days: annual cost {result['sys_cost']}, wall time {result['wall_time']:.1f} s")
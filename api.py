@@ -0,0 +1,179 @@
+from flask import Blueprint, Response, request, jsonify, redirect, send_file
+from urllib.parse import urlencode
+import dash_bootstrap_components as dbc
+import tempfile
+import html
+import csv
+import json
+import os
+
+import input
+import service
+import fleet_io
+import fleet_store
+from solve_queue import QueueFull
+from validation import fleet_errors, profiles_errors
+from presolve import CapacityError
+
+
+API_MAX_FLEETS = int( os.environ.get('API_MAX_FLEETS', 1000) )  # fleets in one request
+
+blueprint = Blueprint('api', __name__, url_prefix='/api')
+
+# Native upload form (shown in dashboard frame) - file goes from disk straight to the server, page returns with token of new fleet
+IMPORT_FORM = '''<!doctype html>
+<link rel="stylesheet" href="{stylesheet}">
+<form action="/api/fleets" method="post" enctype="multipart/form-data" target="_top" class="d-flex gap-2 m-0">
+    <input type="file" name="file" accept=".csv,.parquet" class="form-control form-control-sm" required>
+    <input type="hidden" name="base" value="{base}">
+    <input type="hidden" name="redirect" value="/dashboard">
+    <button name="mode" value="replace" class="btn btn-outline-secondary btn-sm">Replace</button>
+    <button name="mode" value="append" class="btn btn-outline-secondary btn-sm">Add</button>
+</form>'''
+
+
+def _solve_fleet(fleet, profiles, session):
+    '''One line of response - fleet is validated and solved through history, in-flight coalescing and solve queue'''
+
+    line = { 'id': fleet.get('id') }
+
+    # Fleet imported before is referenced by its token
+    if 'units' not in fleet and fleet_store.exists(fleet.get('fleet')):
+        fleet = { **fleet, 'units': fleet_store.load(fleet['fleet']) }
+
+    errors = fleet_errors(fleet.get('units')) + profiles_errors(profiles)
+    if errors:
+        return { **line, 'status': 'invalid', 'errors': errors }
+
+    try:
+        results, sys_cost, from_history = service.solve(fleet['units'], session, profiles)
+    except QueueFull as error:
+        return { **line, 'status': 'busy', 'errors': [str(error)] }
+    except CapacityError as error:
+        return { **line, 'status': 'infeasible', 'errors': [str(error)], **error.check }
+
+    if not results:
+        return { **line, 'status': 'infeasible' }
+
+    return { **line, 'status': 'solved', 'sys_cost': sys_cost, 'from_history': from_history, 'results': results }
+
+
+@blueprint.route('/solve', methods=['POST'])
+def solve():
+    '''Solve one fleet ({"units": ...} or {"fleet": <token of imported fleet>}, with "profiles": ...) or many ({"fleets": [...], "profiles": ...}).
+    Profiles of fleet default to profiles of request, then to input.profiles. Results are streamed as NDJSON as fleets are solved.
+    Fleets of a request are solved one after another in one queue session of the client (its address) - a batch gets the same share
+    of solve workers as one dashboard user, other requests of the same client meanwhile get busy status.'''
+
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify(error='Request body must be a JSON object.'), 400
+
+    fleets = body['fleets'] if 'fleets' in body else [ body ]
+    if not isinstance(fleets, list) or not all( isinstance(fleet, dict) for fleet in fleets ):
+        return jsonify(error='Fleets must be a list of objects.'), 400
+    if len(fleets) > API_MAX_FLEETS:
+        return jsonify(error=f'At most {API_MAX_FLEETS} fleets in one request.'), 413
+
+    default_profiles = body.get('profiles', input.profiles)
+    fleets = [ { 'id': fleet.get('id', index), **fleet } for index, fleet in enumerate(fleets) ]
+    session = f'api:{request.remote_addr}'
+
+    def generate():
+        for fleet in fleets:
+            try:
+                line = _solve_fleet(fleet, fleet.get('profiles', default_profiles), session)
+            except Exception as error:
+                line = { 'id': fleet['id'], 'status': 'error', 'errors': [str(error)] }
+            yield json.dumps(line) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
+# ### Bulk fleet import and export
+
+def _failed_report(error):
+    # Import report of file that could not be read at all (missing column, encoding, CSV syntax, Parquet without pyarrow)
+
+    return { 'fleet': None, 'units': 0, 'rows': 0, 'imported': 0, 'rejected': 0, 'errors': [], 'error': error }
+
+
+def _redirect_report(target, fleet, report):
+    # Form of dashboard is sent back to the page with token of the fleet and id of saved import report
+
+    query = { 'fleet': fleet, 'report': fleet_store.save_report(report) }
+    return redirect(f"{target}?{urlencode({ key: value for key, value in query.items() if value })}", code=303)
+
+
+@blueprint.route('/fleets', methods=['POST'])
+def import_fleet():
+    '''Import fleet from CSV or Parquet (columns name, type, power, vc, ramp, lat, lon) - file field of multipart form or raw request body.
+    Rows are validated in chunks, valid units are added to fleet ?base=<token> (or new fleet), rejected rows are reported by number.
+    Form of dashboard is redirected back with token of the new fleet.'''
+
+    upload = request.files.get('file')
+    if upload is not None:
+        stream, fmt = upload.stream, fleet_io.file_format(upload.filename, upload.content_type)
+    else:
+        stream, fmt = request.stream, request.args.get('format') or fleet_io.file_format(content_type=request.content_type)
+
+    mode = request.values.get('mode', 'replace')
+    base = request.values.get('base')
+    target = request.values.get('redirect', '')
+    if mode == 'append' and not fleet_store.exists(base):
+        error = 'Fleet to append to was not found.'
+        return _redirect_report(target, base, _failed_report(error)) if target.startswith('/dashboard') else ( jsonify(error=error), 404 )
+
+    try:
+        report = fleet_io.read_fleet(stream, fmt, fleet_store.load(base) if mode == 'append' else None)
+    except (ValueError, UnicodeDecodeError, csv.Error) as error:
+        return _redirect_report(target, base, _failed_report(str(error))) if target.startswith('/dashboard') else ( jsonify(error=str(error)), 400 )
+
+    units = report.pop('units')
+    token = fleet_store.save(units) if units else None
+    report = { 'fleet': token, 'units': len(units), **report }
+
+    if target.startswith('/dashboard'):
+        return _redirect_report(target, token or base, report)
+
+    return jsonify(report), 200 if token else 422
+
+
+@blueprint.route('/fleets/form', methods=['GET'])
+def import_form():
+
+    return IMPORT_FORM.format(stylesheet=dbc.themes.BOOTSTRAP, base=html.escape(request.args.get('base', ''), quote=True))
+
+
+@blueprint.route('/fleets/<token>.<fmt>', methods=['GET'])
+def export_fleet(token, fmt):
+    '''Fleet as CSV (streamed in chunks) or Parquet'''
+
+    if not fleet_store.exists(token) or fmt not in fleet_io.FORMATS:
+        return jsonify(error='Fleet was not found.'), 404
+    units = fleet_store.load(token)
+    headers = { 'Content-Disposition': f'attachment; filename=fleet-{token[:8]}.{fmt}' }
+
+    if fmt == 'csv':
+        return Response(fleet_io.csv_chunks(units), mimetype='text/csv', headers=headers)
+
+    try:
+        file = tempfile.TemporaryFile()
+        fleet_io.write_parquet(units, file)
+    except ValueError as error:
+        return jsonify(error=str(error)), 501
+    file.seek(0)
+
+    return send_file(file, mimetype='application/vnd.apache.parquet', as_attachment=True, download_name=f'fleet-{token[:8]}.parquet')
+
+
+@blueprint.route('/fleets/reports/<report_id>.csv', methods=['GET'])
+def import_errors(report_id):
+    '''Rejected rows of import'''
+
+    try:
+        report = fleet_store.load_report(report_id)
+    except OSError:
+        return jsonify(error='Report was not found.'), 404
+
+    return Response(fleet_io.error_rows(report['errors']), mimetype='text/csv', headers={ 'Content-Disposition': f'attachment; filename=import-errors-{report_id[:8]}.csv' })
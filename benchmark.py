@@ -0,0 +1,291 @@
+import pyomo.environ as pyo
+import tracemalloc
+import time
+import sys
+import os
+
+import input
+import pyo_tst
+from aggregation import annual_profiles, aggregated_uc
+from presolve import presolve
+from pyo_model import build_model, solve_model, is_solved, is_linear, backend_available, uc_model, SOLVER_BACKENDS
+from pyo_model import MIP_SOLVER, NLP_SOLVER, SOLVER_OPTIONS
+
+
+# ## Instances
+tiny_units = {
+    'Coal 1':   { 'type': 'coal',   'vc': 3, 'power': 180, 'lat': 31.06, 'lon': -97.82, 'ramp': 50 },
+    'Demand 1': { 'type': 'demand', 'vc': 0, 'power': 150, 'lat': 29.98, 'lon': -95.34, 'ramp': 0  },
+}
+
+# High demand with strong wind - big units cannot run in windy hours, ramp of Gas 3 covers its whole power
+tight_units = {
+    **input.units,
+    'Demand 1': { **input.units['Demand 1'], 'power': 1400 },
+    'Wind 1': { **input.units['Wind 1'], 'power': 1200 },
+    'Gas 3': { **input.units['Gas 3'], 'ramp': 300 },
+}
+
+
+# ## Benchmark matrix
+MATRIX_INSTANCES = { 'toy': None, 'tiny': tiny_units, 'input.units': input.units, 'tight': tight_units }  # toy is MILP of pyo_tst.py
+FORMULATIONS = ['hull', 'bigm', 'hull+presolve']
+MINDTPY_STRATEGIES = ['OA', 'ECP', 'FP']  # outer approximation, extended cutting plane, feasibility pump
+MIP_SOLVERS = { 'appsi_highs': 'mip_rel_gap', 'cbc': 'ratioGap', 'glpk': 'mipgap', 'gurobi': 'MIPGap', 'cplex': 'mipgap' }  # solver: its relative gap option
+TOLERANCE_PRESETS = {
+    'loose': { 'mindtpy': SOLVER_OPTIONS, 'gap': 0.1 },  # production setting
+    'medium': { 'mindtpy': { key: 0.01 for key in SOLVER_OPTIONS }, 'gap': 0.01 },
+    'strict': { 'mindtpy': {}, 'gap': 1e-4 },  # MindtPy defaults
+}
+MATRIX_TIME_LIMIT = 120  # sec per run
+
+
+def _timed_solve(units, backend):
+    '''Build and solve model, returns solve wall time (or None when backend does not fit the model)'''
+
+    model = build_model(units)
+    pyo.TransformationFactory('gdp.hull').apply_to(model)
+    if SOLVER_BACKENDS[backend]['engine'] != 'mindtpy' and not is_linear(model):
+        return None
+
+    start_time = time.time()
+    results = solve_model(model, backend=backend)
+    wall_time = time.time() - start_time
+
+    return wall_time if is_solved(results) else None
+
+
+def solver_overhead(repeats=5):
+    '''Per-solve time of each backend - on tiny instance it is almost only overhead (model writing, process start, reading solution)'''
+
+    print('Backend'.ljust(20), 'Tiny [s]'.rjust(10), 'input.units [s]'.rjust(16))
+    for backend in SOLVER_BACKENDS:
+        if not backend_available(backend):
+            print(backend.ljust(20), 'not available'.rjust(10))
+            continue
+
+        tiny = [ _timed_solve(tiny_units, backend) for _ in range(repeats) ]
+        full = [ _timed_solve(input.units, backend) for _ in range(repeats) ]
+        print(
+            backend.ljust(20),
+            (f'{min(tiny):.3f}' if None not in tiny else '-').rjust(10),
+            (f'{min(full):.3f}' if None not in full else '-').rjust(16),
+        )
+
+
+def presolve_effect():
+    '''Model size, build and solve time with and without presolve'''
+
+    print('Instance'.ljust(12), 'Presolve'.ljust(9), 'Fixed'.rjust(6), 'Vars'.rjust(6), 'Cons'.rjust(6), 'Build [s]'.rjust(10), 'Solve [s]'.rjust(10), 'Cost'.rjust(10))
+    for name, units in [ ('input.units', input.units), ('tight', tight_units) ]:
+        for use_presolve in [ False, True ]:
+            stats = {}
+            uc_model(units, stats=stats, use_presolve=use_presolve)
+            timings = stats['timings']
+            fixed = stats['presolve']['fixed_on'] + stats['presolve']['fixed_off'] if use_presolve else 0
+            print(
+                name.ljust(12),
+                str(use_presolve).ljust(9),
+                str(fixed).rjust(6),
+                str(stats['size']['variables']).rjust(6),
+                str(stats['size']['constraints']).rjust(6),
+                f"{timings.get('presolve', 0) + timings['build'] + timings['transform']:.3f}".rjust(10),
+                f"{timings['solve']:.3f}".rjust(10),
+                (f"{stats['cost']:.1f}" if 'cost' in stats else stats['status']).rjust(10),
+            )
+
+
+def aggregation_error(days=7):
+    '''Representative days versus full-resolution solve of the same horizon - cost error, energy error of plants and wall time'''
+
+    profiles = annual_profiles(days)
+    plants = [ unit for unit in input.units if input.units[unit]['type'] not in ['demand', 'wind', 'pv', 'battery'] ]
+
+    start_time = time.time()
+    stats = {}
+    full, _ = uc_model(input.units, profiles, stats=stats)
+    full_time = time.time() - start_time
+    if not full:
+        print('Full-resolution model is infeasible')
+        return
+    full_energy = { plant: sum(full[plant].values()) for plant in plants }
+
+    print(f"Full resolution: {days} days, cost {stats['cost']:.0f}, wall time {full_time:.1f} s")
+    print('Periods'.ljust(8), 'Cost'.rjust(10), 'Cost err [%]'.rjust(13), 'Max energy err [%]'.rjust(19), 'Time [s]'.rjust(9))
+    for n in sorted({ 2, 3, 4, days }):
+        result = aggregated_uc(input.units, profiles, n)
+        if not result:
+            print(str(n).ljust(8), 'infeasible'.rjust(10))
+            continue
+        energy_error = max( abs( sum(result['results'][plant].values()) - full_energy[plant] ) for plant in plants ) / sum(full_energy.values()) * 100
+        print(
+            str(n).ljust(8),
+            f"{result['cost']:.0f}".rjust(10),
+            f"{( result['cost'] / stats['cost'] - 1 ) * 100:+.2f}".rjust(13),
+            f'{energy_error:.2f}'.rjust(19),
+            f"{result['wall_time']:.1f}".rjust(9),
+        )
+
+
+def time_step_size():
+    '''Model size, solve time and cost for hourly, 15-minute and adaptive (merged) steps - on daily and flat profile'''
+
+    flat_profiles = { 'demand': [0.6] * 24, 'wind': [0.7] * 24, 'pv': [0] * 24 }
+    resolutions = [ ('60', '0'), ('60', '1'), ('15', '0'), ('15', '1') ]
+
+    print('Profile'.ljust(15), 'Step'.rjust(5), 'Adaptive'.rjust(9), 'Steps'.rjust(6), 'Vars'.rjust(6), 'Cons'.rjust(6), 'Solve [s]'.rjust(10), 'Cost'.rjust(10))
+    for name, profiles in [ ('input.profiles', input.profiles), ('flat', flat_profiles) ]:
+        for minutes, adaptive in resolutions:
+            os.environ['TIME_STEP'], os.environ['ADAPTIVE_STEPS'] = minutes, adaptive
+            stats = {}
+            uc_model(input.units, profiles, stats=stats)
+            print(
+                name.ljust(15),
+                minutes.rjust(5),
+                adaptive.rjust(9),
+                str(stats['steps']).rjust(6),
+                str(stats['size']['variables']).rjust(6),
+                str(stats['size']['constraints']).rjust(6),
+                f"{stats['timings']['solve']:.3f}".rjust(10),
+                (f"{stats['cost']:.1f}" if 'cost' in stats else stats['status']).rjust(10),
+            )
+
+
+def memory_peak(days=3):
+    '''Peak Python memory of each uc_model phase in default and memory-lean mode (memory of solver libraries is not traced)'''
+
+    phases = ['presolve', 'build', 'transform', 'solve', 'release', 'extract']
+    os.environ['TIME_STEP'], os.environ['ADAPTIVE_STEPS'] = '60', '0'
+
+    print('Instance'.ljust(12), 'Mode'.ljust(8), *[ f'{phase} [MB]'.rjust(15) for phase in phases ], 'Solve [s]'.rjust(10), 'Cost'.rjust(10))
+    for name, profiles in [ ('1 day', input.profiles), (f'{days} days', annual_profiles(days)) ]:
+        for lean in [ False, True ]:
+            stats = {}
+            tracemalloc.start()
+            uc_model(input.units, profiles, stats=stats, lean=lean)
+            tracemalloc.stop()
+            print(
+                name.ljust(12),
+                ('lean' if lean else 'default').ljust(8),
+                *[ (f"{stats['memory'][phase]:.1f}" if phase in stats['memory'] else '-').rjust(15) for phase in phases ],
+                f"{stats['timings']['solve']:.2f}".rjust(10),
+                (f"{stats['cost']:.1f}" if 'cost' in stats else stats['status']).rjust(10),
+            )
+
+
+def price_overhead(days=3):
+    '''Time of marginal prices (LP re-solve with fixed commitment) relative to MIP solve, with price range'''
+
+    os.environ['TIME_STEP'], os.environ['ADAPTIVE_STEPS'] = '60', '0'
+
+    print('Instance'.ljust(12), 'Solve [s]'.rjust(10), 'Prices [s]'.rjust(11), 'Share'.rjust(7), 'Min price'.rjust(10), 'Max price'.rjust(10))
+    for name, profiles in [ ('1 day', input.profiles), (f'{days} days', annual_profiles(days)) ]:
+        stats = {}
+        uc_model(input.units, profiles, stats=stats, prices=True)
+        if not stats.get('prices'):
+            print(name.ljust(12), stats['status'].rjust(10))
+            continue
+        print(
+            name.ljust(12),
+            f"{stats['timings']['solve']:.2f}".rjust(10),
+            f"{stats['timings']['prices']:.2f}".rjust(11),
+            f"{stats['timings']['prices'] / stats['timings']['solve'] * 100:.0f} %".rjust(7),
+            f"{min(stats['prices'].values()):.2f}".rjust(10),
+            f"{max(stats['prices'].values()):.2f}".rjust(10),
+        )
+
+
+def _matrix_model(instance, formulation):
+
+    if MATRIX_INSTANCES[instance] is None:
+        return pyo_tst.build_model()
+
+    units = MATRIX_INSTANCES[instance]
+    model = build_model(units, presolved=presolve(units, input.profiles) if formulation.endswith('presolve') else None)
+    pyo.TransformationFactory(f"gdp.{formulation.split('+')[0]}").apply_to(model)
+
+    return model
+
+
+def _matrix_run(model, method, preset):
+    '''One cell of matrix - status, wall time, relative gap between bounds and objective value'''
+
+    tolerances = TOLERANCE_PRESETS[preset]
+    start_time = time.time()
+    if method.startswith('mindtpy'):
+        results = pyo.SolverFactory('mindtpy').solve(
+            model, strategy=method.split('-')[1], mip_solver=MIP_SOLVER, nlp_solver=NLP_SOLVER, time_limit=MATRIX_TIME_LIMIT, **tolerances['mindtpy'])
+    else:
+        results = pyo.SolverFactory(method).solve(model, timelimit=MATRIX_TIME_LIMIT, options={ MIP_SOLVERS[method]: tolerances['gap'] })
+    wall_time = time.time() - start_time
+
+    if not is_solved(results):
+        return { 'status': str(results.solver.termination_condition), 'time': wall_time, 'gap': None, 'cost': None }
+
+    lower, upper = results.problem.lower_bound, results.problem.upper_bound
+    bounded = all( isinstance(bound, (int, float)) and abs(bound) < float('inf') for bound in [lower, upper] )
+
+    return {
+        'status': str(results.solver.termination_condition),
+        'time': wall_time,
+        'gap': abs(upper - lower) / max(abs(upper), abs(lower), 1e-9) if bounded else None,
+        'cost': pyo.value(next(model.component_data_objects(pyo.Objective, active=True))),
+    }
+
+
+def benchmark_matrix(instances=None, formulations=None, presets=None):
+    '''Every instance solved with every available method (MindtPy strategy or direct MIP solver), tolerance preset and formulation.
+    One table of time to solution, final gap and objective - direct MIP solvers only for linear models (DEVIATION_COST=1).'''
+
+    methods = [ f'mindtpy-{strategy}' for strategy in MINDTPY_STRATEGIES ] + list(MIP_SOLVERS)
+    available = {
+        method: backend_available('mindtpy') if method.startswith('mindtpy') else pyo.SolverFactory(method).available(exception_flag=False)
+        for method in methods
+    }
+    skipped = [ method for method in methods if not available[method] ]
+    if skipped:
+        print(f"Not available: {', '.join(skipped)}")
+
+    print('Instance'.ljust(12), 'Formulation'.ljust(14), 'Method'.ljust(12), 'Tolerance'.ljust(10), 'Status'.ljust(12), 'Time [s]'.rjust(9), 'Gap [%]'.rjust(8), 'Objective'.rjust(11))
+    for instance in instances or MATRIX_INSTANCES:
+        for formulation in ( [ '-' ] if MATRIX_INSTANCES[instance] is None else formulations or FORMULATIONS ):
+            for method in methods:
+                if not available[method]:
+                    continue
+                for preset in presets or TOLERANCE_PRESETS:
+                    model = _matrix_model(instance, formulation)
+                    if not method.startswith('mindtpy') and not is_linear(model):
+                        continue
+
+                    try:
+                        run = _matrix_run(model, method, preset)
+                    except Exception as error:
+                        run = { 'status': type(error).__name__, 'time': None, 'gap': None, 'cost': None }
+                    print(
+                        instance.ljust(12),
+                        formulation.ljust(14),
+                        method.ljust(12),
+                        preset.ljust(10),
+                        run['status'].ljust(12),
+                        (f"{run['time']:.2f}" if run['time'] is not None else '-').rjust(9),
+                        (f"{run['gap'] * 100:.3f}" if run['gap'] is not None else '-').rjust(8),
+                        (f"{run['cost']:.1f}" if run['cost'] is not None else '-').rjust(11),
+                    )
+
+
+if __name__ == '__main__':
+
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
+
+    benchmarks = {
+        'overhead': solver_overhead,
+        'presolve': presolve_effect,
+        'aggregation': aggregation_error,
+        'time_steps': time_step_size,
+        'memory': memory_peak,
+        'prices': price_overhead,
+        'matrix': benchmark_matrix,
+    }
+    for name in sys.argv[1:] or benchmarks.keys():
+        benchmarks[name]()
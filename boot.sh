@@ -1,3 +1,4 @@
 #!/bin/bash
 source venv/bin/activate
-exec gunicorn -b 0.0.0.0:8080 index:server
\ No newline at end of file
+# One worker process with threads, so solve queue limits concurrent solves of the whole server
+exec gunicorn -b 0.0.0.0:8080 --workers 1 --threads 16 index:server
\ No newline at end of file
@@ -0,0 +1,93 @@
+from validation import valid_value, MAX_VALUE
+
+
+EDIT_KEYS = ['power', 'vc', 'ramp']
+OPERATIONS = ['scale', 'set']
+
+
+# ### Selection - map region, unit types and name filter of grid (all given criteria have to match)
+
+def _text_match(text, condition):
+    # One condition of ag-grid text filter (case insensitive as in grid)
+
+    text, value = str(text).lower(), str(condition.get('filter') or '').lower()
+    kind = condition.get('type', 'contains')
+
+    if kind == 'contains':
+        return value in text
+    if kind == 'notContains':
+        return value not in text
+    if kind == 'equals':
+        return text == value
+    if kind == 'notEqual':
+        return text != value
+    if kind == 'startsWith':
+        return text.startswith(value)
+    if kind == 'endsWith':
+        return text.endswith(value)
+    if kind == 'blank':
+        return not text
+    if kind == 'notBlank':
+        return bool(text)
+
+    return True
+
+
+def grid_filter(name, filter_model):
+    '''Unit name passes filter model of grid (text filter of name column, single or combined conditions)'''
+
+    model = ( filter_model or {} ).get('name')
+    if not model:
+        return True
+
+    conditions = model.get('conditions') or [ model[key] for key in ['condition1', 'condition2'] if key in model ] or [ model ]
+    matches = [ _text_match(name, condition) for condition in conditions ]
+
+    return all(matches) if model.get('operator', 'AND') == 'AND' else any(matches)
+
+
+def select_units(units, types=None, region=None, filter_model=None):
+    '''Names of units matching all given criteria - types (list), region of map box selection ([[lon, lat], [lon, lat]]), grid filter model'''
+
+    if region:
+        lons = sorted( corner[0] for corner in region )
+        lats = sorted( corner[1] for corner in region )
+
+    names = []
+    for name, unit in units.items():
+        if types and unit['type'] not in types:
+            continue
+        if region and not ( lats[0] <= unit.get('lat', lats[0] - 1) <= lats[1] and lons[0] <= unit.get('lon', lons[0] - 1) <= lons[1] ):
+            continue
+        if filter_model and not grid_filter(name, filter_model):
+            continue
+        names.append(name)
+
+    return names
+
+
+# ### Edit - applied to all selected units or to none
+
+def edit_units(units, names, key, operation, value):
+    '''Copy of units with key of named units scaled by or set to value.
+    Returns (units, errors) - when any unit would become invalid, units are returned unchanged with the errors.'''
+
+    if key not in EDIT_KEYS or operation not in OPERATIONS:
+        return units, [f"Only {', '.join(EDIT_KEYS)} can be scaled or set."]
+    if not valid_value(value):
+        return units, [f'Value of {key} must be a number between 0 and {MAX_VALUE}.']
+
+    edited, errors = dict(units), []
+    for name in names:
+        new_value = round(units[name][key] * value, 2) if operation == 'scale' else value
+        if isinstance(new_value, float) and new_value.is_integer():
+            new_value = int(new_value)
+        if not valid_value(new_value):
+            errors.append(f'Unit: {name} - {key} {new_value} is out of range.')
+            continue
+        edited[name] = { **units[name], key: new_value }
+
+    if errors:
+        return units, errors
+
+    return edited, []
@@ -0,0 +1,160 @@
+import itertools
+import tempfile
+import shutil
+import csv
+import io
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq  # Parquet import / export is available only with pyarrow
+except ImportError:
+    pa = pq = None
+
+from validation import unit_errors
+
+
+COLUMNS = ['name', 'type', 'power', 'vc', 'ramp', 'lat', 'lon']
+NUMBER_COLUMNS = ['power', 'vc', 'ramp', 'lat', 'lon']
+FORMATS = ['csv', 'parquet']
+CHUNK_ROWS = 10000  # rows validated (and exported) at once
+MAX_REPORTED_ERRORS = 1000  # rejected rows listed in report, the rest is only counted
+
+
+def file_format(filename=None, content_type=None):
+    '''Format of fleet file from its name or content type'''
+
+    extension = ( filename or '' ).rsplit('.', 1)[-1].lower()
+    if extension in FORMATS:
+        return extension
+    if 'parquet' in ( content_type or '' ):
+        return 'parquet'
+
+    return 'csv'
+
+
+def _check_columns(columns):
+
+    missing = [ column for column in COLUMNS if column not in ( columns or [] ) ]
+    if missing:
+        raise ValueError(f"Fleet file is missing columns: {', '.join(missing)}.")
+
+
+# ### Import - file is read in chunks, never as a whole
+
+def _csv_chunks(stream):
+
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    _check_columns(reader.fieldnames)
+    while chunk := list(itertools.islice(reader, CHUNK_ROWS)):
+        yield chunk
+
+
+def _parquet_chunks(stream):
+
+    if pq is None:
+        raise ValueError('Parquet files need pyarrow installed, use CSV instead.')
+
+    # Parquet is read from its footer - stream is spooled to a seekable file first
+    with tempfile.TemporaryFile() as file:
+        shutil.copyfileobj(stream, file)
+        file.seek(0)
+        parquet = pq.ParquetFile(file)
+        _check_columns(parquet.schema_arrow.names)
+        for batch in parquet.iter_batches(batch_size=CHUNK_ROWS, columns=COLUMNS):
+            yield batch.to_pylist()
+
+
+def _parse_row(row):
+    '''Name and unit from row - numbers are converted from text, values which are not numbers are left for validation'''
+
+    unit = { 'type': row.get('type') }
+    for key in NUMBER_COLUMNS:
+        value = row.get(key)
+        if isinstance(value, str):
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+        if isinstance(value, float) and value.is_integer() and key not in ['lat', 'lon']:
+            value = int(value)
+        unit[key] = value
+
+    return row.get('name'), unit
+
+
+def read_fleet(stream, fmt='csv', units=None):
+    '''Units from CSV or Parquet stream validated chunk by chunk with the rules of unit creation.
+    Valid rows are added to copy of units (new fleet when None), rejected rows are reported with their number (first data row is 1).'''
+
+    units = dict(units or {})
+    rows, rejected, errors = 0, 0, []
+
+    chunks = _parquet_chunks(stream) if fmt == 'parquet' else _csv_chunks(stream)
+    for chunk in chunks:
+        for row in chunk:
+            rows += 1
+            name, unit = _parse_row(row)
+
+            problems = unit_errors(name, unit)
+            if name in units:
+                problems.append(f'Unit: {name} - name is already used.')
+
+            if problems:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({ 'row': rows, 'errors': problems })
+                continue
+
+            units[name] = unit
+
+    return {
+        'units': units,
+        'rows': rows,
+        'imported': rows - rejected,
+        'rejected': rejected,
+        'errors': errors,
+    }
+
+
+# ### Export
+
+def csv_chunks(units):
+    '''Fleet as CSV text, one piece per CHUNK_ROWS units (body of streamed response)'''
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+
+    for index, (name, unit) in enumerate(units.items(), 1):
+        writer.writerow([ name ] + [ unit.get(key) for key in COLUMNS[1:] ])
+        if index % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def write_parquet(units, file):
+    '''Fleet written to Parquet file as row groups of CHUNK_ROWS units'''
+
+    if pq is None:
+        raise ValueError('Parquet files need pyarrow installed, use CSV instead.')
+
+    schema = pa.schema([ ('name', pa.string()), ('type', pa.string()) ] + [ (key, pa.float64()) for key in NUMBER_COLUMNS ])
+    items = iter(units.items())
+    with pq.ParquetWriter(file, schema) as writer:
+        while chunk := list(itertools.islice(items, CHUNK_ROWS)):
+            writer.write_table(pa.Table.from_pylist([ { 'name': name, **{ key: unit.get(key) for key in COLUMNS[1:] } } for name, unit in chunk ], schema=schema))
+
+
+def error_rows(errors):
+    '''Rejected rows of import report as CSV text'''
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['row', 'errors'])
+    for error in errors:
+        writer.writerow([ error['row'], ' '.join(error['errors']) ])
+
+    return buffer.getvalue()
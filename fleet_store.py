@@ -0,0 +1,89 @@
+from functools import lru_cache
+import tempfile
+import pickle
+import uuid
+import json
+import time
+import glob
+import os
+
+from single_flight import solve_key
+
+
+FLEETS_DIR = os.environ.get('FLEETS_DIR', os.path.join(tempfile.gettempdir(), 'uc_fleets'))
+FLEET_TTL = 7 * 24 * 3600  # sec, fleets and import reports not read for this long are removed
+
+
+# ### Fleets kept on server, browser holds only token
+
+def _path(name):
+
+    return os.path.join(FLEETS_DIR, os.path.basename(name))
+
+
+def _write(name, content):
+
+    os.makedirs(FLEETS_DIR, exist_ok=True)
+    temp_path = _path(f'{name}.{os.getpid()}.tmp')
+    with open(temp_path, 'wb') as file:
+        file.write(content)
+    os.replace(temp_path, _path(name))
+
+
+def save(units):
+    '''Fleet saved under hash of its units - the same fleet always gets the same token'''
+
+    _remove_old()
+
+    token = solve_key(units)
+    if os.path.exists(_path(f'{token}.pkl')):
+        os.utime(_path(f'{token}.pkl'))
+    else:
+        _write(f'{token}.pkl', pickle.dumps(units, protocol=pickle.HIGHEST_PROTOCOL))
+
+    return token
+
+
+def exists(token):
+
+    return isinstance(token, str) and os.path.exists(_path(f'{token}.pkl'))
+
+
+@lru_cache(maxsize=16)
+def _load(token):
+
+    os.utime(_path(f'{token}.pkl'))
+    with open(_path(f'{token}.pkl'), 'rb') as file:
+        return pickle.load(file)
+
+
+def load(token):
+    '''Units of fleet - units themselves are shared with cache, changed unit has to be replaced by a new dict'''
+
+    return dict(_load(token))
+
+
+# ### Import reports (rejected rows are browsed after redirect to dashboard)
+
+def save_report(report):
+
+    report_id = uuid.uuid4().hex
+    _write(f'{report_id}.report.json', json.dumps(report).encode())
+
+    return report_id
+
+
+def load_report(report_id):
+
+    with open(_path(f'{report_id}.report.json')) as file:
+        return json.load(file)
+
+
+def _remove_old():
+
+    for path in glob.glob(os.path.join(FLEETS_DIR, '*.pkl')) + glob.glob(os.path.join(FLEETS_DIR, '*.report.json')):
+        try:
+            if os.path.getmtime(path) < time.time() - FLEET_TTL:
+                os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,145 @@
+from contextlib import closing
+import numpy as np
+import datetime
+import pathlib
+import sqlite3
+import json
+import io
+import os
+
+from single_flight import solve_key
+
+
+HISTORY_DB = os.environ.get('HISTORY_DB', str(pathlib.Path(__file__).parent.resolve() / 'history.db'))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created TEXT NOT NULL,
+    fleet_hash TEXT NOT NULL,
+    solve_key TEXT NOT NULL,
+    units_count INTEGER NOT NULL,
+    settings TEXT NOT NULL,
+    cost REAL,
+    sys_cost TEXT,
+    timings TEXT
+);
+CREATE TABLE IF NOT EXISTS schedules (
+    run_id INTEGER PRIMARY KEY REFERENCES runs(id),
+    schedule BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_fleet ON runs (fleet_hash, created);
+CREATE INDEX IF NOT EXISTS idx_runs_created ON runs (created);
+CREATE INDEX IF NOT EXISTS idx_runs_key ON runs (solve_key);
+'''
+
+
+def _connect():
+
+    conn = sqlite3.connect(HISTORY_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+
+    return conn
+
+
+def fleet_hash(units):
+
+    return solve_key(units)
+
+
+# ### Columnar schedule (unit x hour matrix), compressed
+
+def pack_schedule(results):
+
+    units = list(results.keys())
+    hours = list(results[units[0]].keys()) if units else []
+    power = np.array([ [ results[unit][hour] for hour in hours ] for unit in units ], dtype=np.float32)
+
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, units=np.array(units), hours=np.array(hours, dtype=int), power=power)
+
+    return buffer.getvalue()
+
+
+def unpack_schedule(blob):
+
+    data = np.load(io.BytesIO(blob))
+
+    return {
+        str(unit): { int(hour): round(float(value), 2) for hour, value in zip(data['hours'], row) }
+        for unit, row in zip(data['units'], data['power'])
+    }
+
+
+# ### Store and lookup
+
+def save_run(key, units, settings, results, sys_cost, stats):
+
+    with closing(_connect()) as conn, conn:
+        cursor = conn.execute(
+            'INSERT INTO runs (created, fleet_hash, solve_key, units_count, settings, cost, sys_cost, timings) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                datetime.datetime.now().isoformat(timespec='seconds'),
+                fleet_hash(units),
+                key,
+                len(units),
+                json.dumps(settings),
+                stats.get('cost'),
+                sys_cost,
+                json.dumps(stats.get('timings', {})),
+            ))
+        conn.execute('INSERT INTO schedules (run_id, schedule) VALUES (?, ?)', (cursor.lastrowid, pack_schedule(results)))
+
+        return cursor.lastrowid
+
+
+def find_run(key):
+    '''Latest run with the same fleet, profiles and settings - (results, sys_cost) or None'''
+
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            'SELECT runs.sys_cost, schedules.schedule FROM runs JOIN schedules ON schedules.run_id = runs.id WHERE runs.solve_key = ? ORDER BY runs.id DESC LIMIT 1',
+            (key,)).fetchone()
+
+    if row is None:
+        return None
+
+    return unpack_schedule(row['schedule']), row['sys_cost']
+
+
+def list_runs(fleet=None, day=None, limit=100):
+    '''Runs metadata (without schedules), optionally for given fleet hash and day (YYYY-MM-DD)'''
+
+    query = 'SELECT id, created, fleet_hash, units_count, cost, sys_cost, timings FROM runs'
+    conditions, params = [], []
+    if fleet:
+        conditions.append('fleet_hash = ?')
+        params.append(fleet)
+    if day:
+        conditions.append('created >= ? AND created < ?')
+        next_day = datetime.date.fromisoformat(day) + datetime.timedelta(days=1)
+        params += [day, next_day.isoformat()]
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY created DESC LIMIT ?'
+    params.append(limit)
+
+    with closing(_connect()) as conn:
+        rows = conn.execute(query, params).fetchall()
+
+    return [ { **dict(row), 'timings': json.loads(row['timings'] or '{}') } for row in rows ]
+
+
+def load_schedules(run_ids):
+    '''Schedules of selected runs only'''
+
+    if not run_ids:
+        return {}
+
+    with closing(_connect()) as conn:
+        rows = conn.execute(
+            f'SELECT run_id, schedule FROM schedules WHERE run_id IN ({", ".join("?" for _ in run_ids)})',
+            list(run_ids)).fetchall()
+
+    return { row['run_id']: unpack_schedule(row['schedule']) for row in rows }
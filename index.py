@@ -9,6 +9,8 @@ import socket
 
 load_dotenv(override=True)
 
+import api  # after environment is loaded (solve queue reads its limits on import)
+
 
 app = Dash(
     __name__, 
@@ -16,11 +18,13 @@ app = Dash(
     use_pages=True
     )
 server = app.server
+server.register_blueprint(api.blueprint)  # headless JSON solve API
 
 app.layout = dbc.Container([
     dbc.NavbarSimple([
         dbc.NavItem(dbc.NavLink('Home', href='/')),
         dbc.NavItem(dbc.NavLink('Dashboard', href='dashboard')),
+        dbc.NavItem(dbc.NavLink('History', href='history')),
     ],
     brand='Unit Commitment App',
     brand_href='/',
@@ -44,7 +48,7 @@ if __name__ == '__main__':
         print(f'Link to share on Intranet: http:{ip_address}:{PORT}')
 
         # Go to localhost:<PORT> on local machine
-        serve(server, host='0.0.0.0', port=PORT) 
+        serve(server, host='0.0.0.0', port=PORT, threads=16)  # same threads as gunicorn in boot.sh - solve queue limits concurrent solves
 
     elif os.environ.get("MODE") == "DEV":
         app.run(debug=True)
@@ -19,6 +19,23 @@ profiles = {
     'pv': [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.01, 0.32, 0.63, 0.87, 0.87, 1.0, 0.91, 0.92, 0.69, 0.38, 0.1, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0], 
 }
 
+# Zonal transmission network (used with ZONAL=1) - units belong to the nearest zone, lines have capacity [MW] and reactance [p.u.]
+network = {
+    'zones': {
+        'West':    { 'lat': 31.8, 'lon': -101.0 },
+        'North':   { 'lat': 32.8, 'lon': -96.8  },
+        'South':   { 'lat': 29.4, 'lon': -98.5  },
+        'Houston': { 'lat': 29.8, 'lon': -95.4  },
+    },
+    'lines': {
+        'West - North':    { 'from': 'West',  'to': 'North',   'capacity': 400, 'reactance': 0.1  },
+        'West - South':    { 'from': 'West',  'to': 'South',   'capacity': 400, 'reactance': 0.1  },
+        'North - South':   { 'from': 'North', 'to': 'South',   'capacity': 600, 'reactance': 0.05 },
+        'North - Houston': { 'from': 'North', 'to': 'Houston', 'capacity': 700, 'reactance': 0.05 },
+        'South - Houston': { 'from': 'South', 'to': 'Houston', 'capacity': 600, 'reactance': 0.05 },
+    },
+}
+
 units_colors = {
     'coal': '#000000',
     'gas': '#940494',
@@ -0,0 +1,99 @@
+from collections import OrderedDict, defaultdict
+import threading
+import math
+
+from single_flight import solve_key
+
+
+# ## Clustering settings
+BASE_CELL = 2.0  # degrees, grid cell at default zoom (halved with each zoom level)
+MAX_LEVEL = 8
+CLUSTER_THRESHOLD = 100  # up to this number of units in view, all are shown individually
+VIEW_MARGIN = 0.2  # share of view added on each side (units just outside are ready when panning)
+CACHED_FLEETS = 8
+
+
+class GridIndex:
+    '''Units bucketed into lat / lon grid cells of one size - lookup of units in view goes only through cells in view'''
+
+    def __init__(self, units, cell):
+
+        self.cell = cell
+        self.cells = defaultdict(list)
+        for name, unit in units.items():
+            self.cells[( math.floor(unit['lat'] / cell), math.floor(unit['lon'] / cell) )].append(name)
+
+    def query(self, lat_range, lon_range):
+        '''Occupied cells intersecting the view'''
+
+        rows = range( math.floor(lat_range[0] / self.cell), math.floor(lat_range[1] / self.cell) + 1 )
+        cols = range( math.floor(lon_range[0] / self.cell), math.floor(lon_range[1] / self.cell) + 1 )
+
+        if len(rows) * len(cols) > len(self.cells):
+            return [ names for (row, col), names in self.cells.items() if row in rows and col in cols ]
+
+        return [ self.cells[(row, col)] for row in rows for col in cols if (row, col) in self.cells ]
+
+
+_indexes = OrderedDict()  # fleet hash -> grid index of each zoom level
+_indexes_lock = threading.Lock()  # callbacks of all sessions share the cache
+
+
+def _fleet_indexes(units, key=None):
+
+    key = key or solve_key(units)
+    with _indexes_lock:
+        if key in _indexes:
+            _indexes.move_to_end(key)
+            return _indexes[key]
+
+    # Built outside the lock - other fleets are not blocked meanwhile
+    indexes = [ GridIndex(units, BASE_CELL / 2 ** level) for level in range(MAX_LEVEL + 1) ]
+
+    with _indexes_lock:
+        indexes = _indexes.setdefault(key, indexes)
+        _indexes.move_to_end(key)
+        if len(_indexes) > CACHED_FLEETS:
+            _indexes.popitem(last=False)
+
+    return indexes
+
+
+def map_view(units, lat_range, lon_range, scale=1, key=None):
+    '''Units and clusters to draw in view - cells of zoom level become clusters (summed power, power by type),
+    units are shown individually when zoomed in enough or alone in their cell. Key identifies fleet (hash of units by default).'''
+
+    lat_margin = VIEW_MARGIN * ( lat_range[1] - lat_range[0] )
+    lon_margin = VIEW_MARGIN * ( lon_range[1] - lon_range[0] )
+    lat_range = ( lat_range[0] - lat_margin, lat_range[1] + lat_margin )
+    lon_range = ( lon_range[0] - lon_margin, lon_range[1] + lon_margin )
+
+    level = min( max( int(math.log2(max(scale, 1))), 0 ), MAX_LEVEL )
+    cells = _fleet_indexes(units, key)[level].query(lat_range, lon_range)
+
+    # Exact filter - cells on the edge may reach out of view
+    cells = [ [ name for name in names if lat_range[0] <= units[name]['lat'] <= lat_range[1] and lon_range[0] <= units[name]['lon'] <= lon_range[1] ] for names in cells ]
+    cells = [ names for names in cells if names ]
+
+    if sum( len(names) for names in cells ) <= CLUSTER_THRESHOLD:
+        return { 'units': [ name for names in cells for name in names ], 'clusters': [] }
+
+    singles, clusters = [], []
+    for names in cells:
+        if len(names) == 1:
+            singles += names
+            continue
+
+        power = sum( units[name]['power'] for name in names )
+        types = defaultdict(float)
+        for name in names:
+            types[units[name]['type']] += units[name]['power']
+        clusters.append({
+            'lat': sum( units[name]['lat'] * units[name]['power'] for name in names ) / power if power else sum( units[name]['lat'] for name in names ) / len(names),
+            'lon': sum( units[name]['lon'] * units[name]['power'] for name in names ) / power if power else sum( units[name]['lon'] for name in names ) / len(names),
+            'count': len(names),
+            'power': power,
+            'types': dict(types),
+        })
+
+    return { 'units': singles, 'clusters': clusters }
@@ -0,0 +1,207 @@
+import numpy as np
+import time
+
+import input
+from pyo_model import split_units, hourly_profiles, generation_cost
+from pyo_model import MIN_POWER, START_UP_COST, BATTERY_EFF, BATTERY_START, BATTERY_LOAD_TIME
+
+
+# ## Heuristic settings
+STRATEGIES = [ (True, 0), (True, 1), (False, 0), (False, 1) ]  # (batteries shave peaks, share of storage power absorbing min power of plants)
+EPS = 1e-6
+
+
+def net_demand(units, profiles=input.profiles):
+    '''Demand reduced by wind and pv production in each hour'''
+
+    _, demand_sources, wind_farms, pv_farms, _ = split_units(units)
+    demand_profile, wind_profile, pv_profile = hourly_profiles(profiles)
+
+    return np.array([
+        + sum( ele['power'] * demand_profile[hour] for ele in demand_sources.values() )
+        - sum( ele['power'] * wind_profile[hour] for ele in wind_farms.values() )
+        - sum( ele['power'] * pv_profile[hour] for ele in pv_farms.values() )
+        for hour in demand_profile
+        ])
+
+
+def _battery_schedule(batteries, demand, shave=True):
+    '''Batteries shave peaks above average net demand and absorb surplus (negative net demand)'''
+
+    target = demand.mean() if shave else np.inf
+    residual = demand.copy()
+
+    injection = {}
+    for name, battery in sorted(batteries.items(), key=lambda x: x[1]['vc']):
+        power = battery['power']
+        volume_max = power * BATTERY_LOAD_TIME
+        volume = volume_max * BATTERY_START
+        injection[name] = np.zeros(len(demand))
+        for h, value in enumerate(residual):
+            if value > target:
+                reload = min(power, volume, value - target)
+                volume -= reload
+                injection[name][h] = reload
+            elif value < 0:
+                load = min(power, ( volume_max - volume ) / BATTERY_EFF, -value)
+                volume += load * BATTERY_EFF
+                injection[name][h] = -load
+        residual = residual - injection[name]
+
+    return injection, residual
+
+
+def _battery_balance(batteries, injection, imbalance):
+    '''Cover remaining imbalance with batteries as far as their power and volume allow'''
+
+    def volume_change(x):
+        return np.where(x > 0, -x, -x * BATTERY_EFF)
+
+    def injection_for(change):
+        return -change if change <= 0 else -change / BATTERY_EFF
+
+    imbalance = imbalance.copy()
+    for name, battery in sorted(batteries.items(), key=lambda x: x[1]['vc']):
+        power = battery['power']
+        volume_max = power * BATTERY_LOAD_TIME
+        for h in np.flatnonzero(np.abs(imbalance) > EPS):
+            volume = volume_max * BATTERY_START + np.cumsum(volume_change(injection[name]))
+            low, high = -volume[h:].min(), volume_max - volume[h:].max()
+            current = volume_change(injection[name][h])
+            wanted = np.clip(injection[name][h] + imbalance[h], -power, power)
+            change = np.clip(volume_change(wanted) - current, low, high)
+            new = injection_for(current + change)
+            imbalance[h] -= new - injection[name][h]
+            injection[name][h] = new
+
+    return injection, imbalance
+
+
+def _plant_commitment(plants, names, residual):
+    '''Priority-list commitment - cheapest plants covering residual demand, short stops bridged at min power,
+    plants started one hour earlier as started plant can only reach min power'''
+
+    p_max = np.array([ plants[plant]['power'] for plant in names ])
+    start_up = np.array([ START_UP_COST * plants[plant]['vc'] * plants[plant]['power'] for plant in names ])
+    idle = np.array([ generation_cost(plants[plant], MIN_POWER * plants[plant]['power']) for plant in names ])
+
+    capacity_before = np.concatenate(( [0], np.cumsum(p_max)[:-1] ))
+    on = capacity_before[None, :] < residual[:, None]
+
+    # Bridge stops which are cheaper at min power than new start-up
+    for i in range(len(names)):
+        hours_on = np.flatnonzero(on[:, i])
+        for first, last in zip(hours_on[:-1], hours_on[1:]):
+            if last - first > 1 and ( last - first - 1 ) * idle[i] < start_up[i]:
+                on[first:last, i] = True
+
+    on[:-1] |= on[1:] & ~on[:-1] & ( np.arange(len(residual))[1:, None] > 0 )
+
+    return on
+
+
+def _plant_schedule(plants, residual, storage):
+    '''Hour by hour dispatch of merit-order commitment respecting min power, ramps and start-up rule'''
+
+    names = sorted(plants, key=lambda plant: plants[plant]['vc'])
+    p_max = np.array([ plants[plant]['power'] for plant in names ])
+    p_min = MIN_POWER * p_max
+    ramp = np.array([ plants[plant]['ramp'] for plant in names ])
+
+    hours = len(residual)
+    on = _plant_commitment(plants, names, residual)
+    power = np.zeros((hours, len(names)))
+    imbalance = np.zeros(hours)
+
+    for h in range(hours):
+
+        on_prev = on[h-1] if h else np.zeros(len(names), dtype=bool)
+        power_prev = power[h-1] if h else np.zeros(len(names))
+
+        # Power range if plant is on (started plant can only reach min power, except first hour)
+        hi = np.where(on_prev, np.minimum(p_max, power_prev + ramp), p_min if h else p_max)
+        lo = np.where(on_prev, np.maximum(p_min, power_prev - ramp), p_min)
+
+        # Release most expensive plants when min power exceeds residual demand and what storage can absorb
+        committed = on[h].copy()
+        for i in np.flatnonzero(committed)[::-1]:
+            if lo[committed].sum() <= residual[h] + storage + EPS:
+                break
+            committed[i] = False
+
+        # Fill from min power in merit order
+        lo, hi = lo * committed, hi * committed
+        room = hi - lo
+        remaining = residual[h] - lo.sum()
+        fill = np.clip(remaining - np.concatenate(( [0], np.cumsum(room)[:-1] )), 0, room)
+
+        on[h] = committed
+        power[h] = lo + fill
+        imbalance[h] = residual[h] - power[h].sum()
+
+    return names, on, power, imbalance
+
+
+def merit_order_dispatch(units, profiles=input.profiles):
+    '''Priority-list schedule - feasible preview of unit commitment and starting point for exact solver'''
+
+    start_time = time.time()
+
+    plants, _, wind_farms, pv_farms, batteries = split_units(units)
+    demand_profile, wind_profile, pv_profile = hourly_profiles(profiles)
+    hours = list(demand_profile.keys())
+
+    demand = net_demand(units, profiles)
+    storage = sum( battery['power'] for battery in batteries.values() )
+
+    # Try each strategy of battery usage and keep the cheapest feasible (or the least imbalanced) schedule
+    best = None
+    for shave, storage_share in STRATEGIES:
+        injection, residual = _battery_schedule(batteries, demand, shave)
+        names, on, power, imbalance = _plant_schedule(plants, residual, storage_share * storage)
+        injection, imbalance = _battery_balance(batteries, injection, imbalance)
+
+        # Cost of the schedule (same terms as model objective)
+        cost = 0
+        for i, plant in enumerate(names):
+            starts = on[:, i] & ~np.concatenate(( [False], on[:-1, i] ))
+            cost += generation_cost(plants[plant], power[:, i]).sum()
+            cost += START_UP_COST * plants[plant]['vc'] * plants[plant]['power'] * starts.sum()
+        for battery in batteries:
+            cost += batteries[battery]['vc'] * np.clip(-injection[battery], 0, None).sum()
+
+        rank = ( np.abs(imbalance).sum() > EPS, np.abs(imbalance).sum(), cost )
+        if best is None or rank < best[0]:
+            best = ( rank, names, on, power, injection, imbalance, cost )
+
+    _, names, on, power, injection, imbalance, cost = best
+
+    results = {}
+    for i, plant in enumerate(names):
+        results[plant] = { hour: round(float(power[h, i]), 2) for h, hour in enumerate(hours) }
+    for unit in pv_farms:
+        results[unit] = { hour: pv_farms[unit]['power'] * pv_profile[hour] for hour in hours }
+    for unit in wind_farms:
+        results[unit] = { hour: wind_farms[unit]['power'] * wind_profile[hour] for hour in hours }
+    for battery in batteries:
+        results[battery] = { hour: round(float(injection[battery][h]), 2) for h, hour in enumerate(hours) }
+
+    return {
+        'results': results,
+        'sys_cost': f'{round(cost, 0)} $',
+        'cost': cost,
+        'feasible': bool(np.abs(imbalance).sum() <= EPS),
+        'imbalance': dict(zip(hours, imbalance.round(2).tolist())),
+        'on': { plant: { hour: int(on[h, i]) for h, hour in enumerate(hours) } for i, plant in enumerate(names) },
+        'wall_time': time.time() - start_time,
+    }
+
+
+if __name__ == '__main__':
+
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
+
+    schedule = merit_order_dispatch(input.units)
+    print(f"Merit order cost: {schedule['sys_cost']}, feasible: {schedule['feasible']}")
+    print(f"Execution time: {1000 * schedule['wall_time']:.1f} ms")
@@ -0,0 +1,252 @@
+from collections import OrderedDict
+import numpy as np
+import threading
+import math
+
+import pyomo.environ as pyo
+
+try:
+    import scipy.sparse as sparse
+    import scipy.sparse.linalg as sparse_linalg  # sparse factorization of network matrix, dense numpy solve without scipy
+except ImportError:
+    sparse = sparse_linalg = None
+
+from pyo_model import split_units, hourly_profiles, is_solved
+from single_flight import solve_key
+
+
+# ## Network settings
+PTDF_TOLERANCE = 1e-4  # sensitivities smaller than this are dropped (sparse rows of flow constraints)
+FLOW_TOLERANCE = 0.01  # MW, overload accepted without adding constraint of the line
+MAX_FLOW_ROUNDS = 10  # re-solves with lazily added flow limits, then all limits are added at once
+CACHED_NETWORKS = 8
+
+
+# ### Zones - units belong to the nearest zone center
+
+def _distance(unit, zone):
+    # Equirectangular approximation - enough to pick the nearest center
+
+    x = ( unit['lon'] - zone['lon'] ) * math.cos(math.radians( ( unit['lat'] + zone['lat'] ) / 2 ))
+    y = unit['lat'] - zone['lat']
+
+    return math.hypot(x, y)
+
+
+def assign_zones(units, network):
+    '''Zone of each unit - units without location belong to the first (reference) zone'''
+
+    zones = network['zones']
+    reference = next(iter(zones))
+
+    return {
+        name: min(zones, key=lambda zone: _distance(unit, zones[zone])) if 'lat' in unit and 'lon' in unit else reference
+        for name, unit in units.items()
+    }
+
+
+# ### Sensitivities of line flows to zone injections (PTDF), cached per topology
+
+def _ptdf(zones, lines):
+    '''Flow on each line caused by 1 MW injected in zone and withdrawn in the reference zone (first zone) - DC power flow'''
+
+    index = { zone: i for i, zone in enumerate(zones) }
+    for name, line in lines.items():
+        if line['from'] not in index or line['to'] not in index:
+            raise ValueError(f'Line: {name} - connects unknown zone.')
+
+    rows = np.repeat(np.arange(len(lines)), 2)
+    cols = [ index[line[end]] for line in lines.values() for end in ['from', 'to'] ]
+    data = np.tile([1.0, -1.0], len(lines))
+    susceptance = np.array([ 1 / line['reactance'] for line in lines.values() ])
+
+    # Reference zone column is removed - reduced susceptance matrix is regular for connected network
+    try:
+        if sparse is not None:
+            incidence = sparse.csr_matrix((data, (rows, cols)), shape=(len(lines), len(zones)))
+            branch = sparse.diags(susceptance) @ incidence
+            bus = ( incidence.T @ branch ).tocsc()[1:, 1:]
+            reduced = sparse_linalg.splu(bus).solve(branch[:, 1:].T.toarray()).T
+        else:
+            incidence = np.zeros((len(lines), len(zones)))
+            incidence[rows, cols] = data
+            branch = susceptance[:, None] * incidence
+            bus = ( incidence.T @ branch )[1:, 1:]
+            reduced = np.linalg.solve(bus, branch[:, 1:].T).T
+    except (RuntimeError, np.linalg.LinAlgError):
+        raise ValueError('Network is not connected - every zone needs a path to the reference zone.')
+
+    ptdf = np.zeros((len(lines), len(zones)))
+    ptdf[:, 1:] = reduced
+    ptdf[np.abs(ptdf) < PTDF_TOLERANCE] = 0
+
+    return ptdf
+
+
+_matrices = OrderedDict()  # topology hash -> sensitivities
+_matrices_lock = threading.Lock()  # solves of all server threads share the cache
+
+
+def network_matrices(network):
+    '''Sensitivities of network as sparse rows (line -> {zone: factor}) and matrix for flow evaluation.
+    Only zones, line ends and reactances matter - change of line capacity uses cached matrices.'''
+
+    zones = list(network['zones'])
+    lines = { name: { key: line[key] for key in ['from', 'to', 'reactance'] } for name, line in network['lines'].items() }
+
+    key = solve_key(zones, lines)
+    with _matrices_lock:
+        if key in _matrices:
+            _matrices.move_to_end(key)
+            return _matrices[key]
+
+    # Factorized outside the lock - other topologies are not blocked meanwhile
+    ptdf = _ptdf(zones, lines)
+    matrices = {
+        'zones': zones,
+        'lines': list(lines),
+        'rows': [ { zones[col]: float(ptdf[row, col]) for col in np.flatnonzero(ptdf[row]) } for row in range(len(lines)) ],
+        'matrix': sparse.csr_matrix(ptdf) if sparse is not None else ptdf,
+    }
+
+    with _matrices_lock:
+        matrices = _matrices.setdefault(key, matrices)
+        _matrices.move_to_end(key)
+        if len(_matrices) > CACHED_NETWORKS:
+            _matrices.popitem(last=False)
+
+    return matrices
+
+
+# ### Zonal model - net injection of each zone, flow limits added only for overloaded lines
+
+def add_network(model, units, network, profiles, elastic=False):
+    '''Add zones and their net injections to built model (before solve). Flow limits start empty.
+    In elastic model unserved energy and curtailment are split into zones (shortfall behind congested line stays local).'''
+
+    matrices = network_matrices(network)
+    zones = matrices['zones']
+    row_of = { zone: row for row, zone in enumerate(zones) }
+    zone_of = assign_zones(units, network)
+    plants, demand_sources, wind_farms, pv_farms, batteries = split_units(units)
+    demand_profile, wind_profile, pv_profile = hourly_profiles(profiles)
+    hours = list(model.hours)
+
+    # Renewables minus demand - fixed part of injection of each zone and step
+    fixed = np.zeros((len(zones), len(hours)))
+    for units_of_type, profile, sign in [ (demand_sources, demand_profile, -1), (wind_farms, wind_profile, 1), (pv_farms, pv_profile, 1) ]:
+        for name, unit in units_of_type.items():
+            fixed[row_of[zone_of[name]]] += sign * unit['power'] * np.array([ profile[hour] for hour in hours ])
+
+    members = { zone: { 'plants': [], 'batteries': [] } for zone in zones }
+    for plant in model.plants:
+        members[zone_of[plant]]['plants'].append(plant)
+    for battery in model.batteries:
+        members[zone_of[battery]]['batteries'].append(battery)
+
+    model.zones = pyo.Set(initialize=zones)
+
+    if elastic:
+        model.zone_unserved = pyo.Var(model.zones, model.hours, domain=pyo.NonNegativeReals)
+        model.zone_curtailed = pyo.Var(model.zones, model.hours, domain=pyo.NonNegativeReals)
+        model.ct_zone_unserved = pyo.Constraint(model.hours, rule=lambda m, hour: m.unserved[hour] == sum( m.zone_unserved[zone, hour] for zone in m.zones ))
+        model.ct_zone_curtailed = pyo.Constraint(model.hours, rule=lambda m, hour: m.curtailed[hour] == sum( m.zone_curtailed[zone, hour] for zone in m.zones ))
+
+    model.injection = pyo.Expression(model.zones, model.hours, rule=lambda m, zone, hour:
+        + float(fixed[row_of[zone], hour - 1])
+        + sum( m.power[plant, hour] for plant in members[zone]['plants'] )
+        + sum( - m.b_load[battery, hour] - m.b_reload[battery, hour] for battery in members[zone]['batteries'] )
+        + ( m.zone_unserved[zone, hour] - m.zone_curtailed[zone, hour] if elastic else 0 )
+        )
+
+    model.flow_limits = pyo.ConstraintList()
+    model.network_data = {
+        'matrices': matrices,
+        'capacity': np.array([ network['lines'][line]['capacity'] for line in matrices['lines'] ], dtype=float),
+        'fixed': fixed,
+        'members': members,
+        'elastic': elastic,
+        'limited': set(),  # (line, hour) with flow limit in model
+    }
+
+    return model
+
+
+def line_flows(model):
+    '''Flow of each line in each step [MW] from current values of model (positive in direction from -> to)'''
+
+    data = model.network_data
+    hours = list(model.hours)
+
+    injection = data['fixed'].copy()
+    for row, (zone, members) in enumerate(data['members'].items()):
+        for plant in members['plants']:
+            injection[row] += [ pyo.value(model.power[plant, hour]) for hour in hours ]
+        for battery in members['batteries']:
+            injection[row] -= [ pyo.value(model.b_load[battery, hour] + model.b_reload[battery, hour]) for hour in hours ]
+        if data['elastic']:
+            injection[row] += [ pyo.value(model.zone_unserved[zone, hour] - model.zone_curtailed[zone, hour]) for hour in hours ]
+
+    return data['matrices']['matrix'] @ injection
+
+
+def add_flow_limits(model, limits):
+    '''Add flow limits of (line index, hour) pairs not yet in model - returns number of added constraints'''
+
+    data = model.network_data
+    added = 0
+    for line, hour in limits:
+        if (line, hour) in data['limited']:
+            continue
+        capacity = data['capacity'][line]
+        flow = sum( factor * model.injection[zone, hour] for zone, factor in data['matrices']['rows'][line].items() )
+        model.flow_limits.add(pyo.inequality(-capacity, flow, capacity))
+        data['limited'].add((line, hour))
+        added += 1
+
+    return added
+
+
+def solve_zonal(model, solve, stats=None):
+    '''Solve zonal model (solve is called without arguments) adding flow limits lazily - only lines overloaded by the last solution get
+    their limit, until no line is overloaded. After MAX_FLOW_ROUNDS all remaining limits are added at once. Network summary is put in stats.'''
+
+    stats = {} if stats is None else stats
+    data = model.network_data
+    hours = list(model.hours)
+
+    results = solve()
+    rounds = 1
+    while is_solved(results):
+        flows = line_flows(model)
+        overloaded = np.argwhere( np.abs(flows) > data['capacity'][:, None] + FLOW_TOLERANCE )
+        if not len(overloaded):
+            break
+
+        if rounds < MAX_FLOW_ROUNDS:
+            add_flow_limits(model, [ (line, hours[step]) for line, step in overloaded ])
+        else:
+            add_flow_limits(model, [ (line, hour) for line in range(len(data['capacity'])) for hour in hours ])
+        results = solve()
+        rounds += 1
+
+    stats['network'] = {
+        'zones': { zone: len(members['plants']) + len(members['batteries']) for zone, members in data['members'].items() },
+        'rounds': rounds,
+        'flow_limits': len(data['limited']),
+    }
+
+    return results
+
+
+def congestion(model):
+    '''Flows of lines at their capacity - {line: {hour: MW}}, empty when network is not congested'''
+
+    data = model.network_data
+    flows = line_flows(model)
+
+    return {
+        line: { hour: round(float(flows[row, step]), 2) for step, hour in enumerate(model.hours) }
+        for row, line in enumerate(data['matrices']['lines'])
+        if np.any( np.abs(flows[row]) >= data['capacity'][row] - FLOW_TOLERANCE )
+    }
@@ -0,0 +1,85 @@
+import dash
+from dash import html, dcc, callback, Input, Output, State
+from dash.exceptions import PreventUpdate
+import dash_bootstrap_components as dbc
+import hmac
+import os
+
+import profiling
+
+
+dash.register_page(__name__)
+
+
+def _authorized(token):
+    '''Admin page is open outside production without ADMIN_TOKEN, otherwise ?token=<ADMIN_TOKEN> is required (production without token - closed)'''
+
+    admin_token = os.environ.get('ADMIN_TOKEN')
+    if not admin_token:
+        return os.environ.get('MODE') != 'PRD'
+
+    return hmac.compare_digest(str(token or ''), admin_token)
+
+
+def layout(token=None, **kwargs):
+
+    if not _authorized(token):
+        return dbc.Container(html.H5('Admin page is not available.', className='mt-4'), fluid=True, className='page-container')
+
+    return dbc.Container([
+
+        # Callbacks check the token too - they can be called without the page
+        dcc.Store(id='id-admin-token', data=token),
+
+        dbc.Card(
+            dbc.CardBody([
+                html.H5('Profiling'),
+                dbc.Switch(id='id-admin-profiling', label='Profile every solve (all users)', value=profiling.is_enabled()),
+                html.P('Single solve can be profiled with ?profile=1 in dashboard address or X-Profile: 1 header.', className='text-muted small'),
+                dcc.Dropdown(id='id-admin-profiles', placeholder='Select captured profile'),
+            ]), className='mb-2 shadow-box'),
+
+        dbc.Row([
+            dbc.Col(dbc.Card(dbc.CardBody([
+                html.H5('Sampled functions'),
+                html.Pre(id='id-admin-summary', style={'maxHeight': '600px', 'overflow': 'auto', 'fontSize': '0.75rem'}),
+            ]), className='mb-2 shadow-box'), xxl=7),
+            dbc.Col(dbc.Card(dbc.CardBody([
+                html.H5('Pyomo construction times'),
+                html.Pre(id='id-admin-construction', style={'maxHeight': '600px', 'overflow': 'auto', 'fontSize': '0.75rem'}),
+            ]), className='mb-2 shadow-box'), xxl=5),
+        ]),
+
+    ], fluid=True, className='page-container')
+
+
+@callback(
+    Output('id-admin-profiles', 'options'),
+    Input('id-admin-profiling', 'value'),
+    State('id-admin-token', 'data'),
+)
+def switch_profiling(enabled, token):
+
+    if not _authorized(token):
+        raise PreventUpdate
+
+    profiling.set_enabled(enabled)
+
+    return [ {'label': f"{profile['name']}  ({profile['wall_time']:.1f} s)", 'value': profile['name']} for profile in profiling.list_profiles() ]
+
+
+@callback(
+    Output('id-admin-summary', 'children'),
+    Output('id-admin-construction', 'children'),
+    Input('id-admin-profiles', 'value'),
+    State('id-admin-token', 'data'),
+    prevent_initial_call=True
+)
+def show_profile(name, token):
+
+    if not name or not _authorized(token):
+        return '', ''
+
+    profile = profiling.load_profile(name)
+
+    return profile['summary'], profile['construction']
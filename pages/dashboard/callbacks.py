@@ -1,12 +1,24 @@
 import dash
-from dash import callback, Output, Input, State, Patch, no_update, ALL, ctx
+from dash import callback, clientside_callback, Output, Input, State, Patch, no_update, ALL, ctx
 import plotly.graph_objects as go
 import dash_bootstrap_components as dbc
-import pandas as pd
+import numpy as np
 from dash.exceptions import PreventUpdate
+from urllib.parse import parse_qs
+import flask
 
 import input
-from pyo_model import uc_model
+from merit_order import merit_order_dispatch
+from solve_queue import solve_queue, QueueFull
+import service
+import results_store
+import fleet_store
+from map_clusters import map_view
+import profiling
+from validation import valid_value, valid_name
+from bulk_edit import select_units, edit_units, grid_filter
+from presolve import CapacityError
+from pyo_model import UNSERVED, CURTAILED
 import time
 
 
@@ -32,14 +44,62 @@ def make_alerts(alerts, msg, color):
     Output('id-store-results', 'data'),
     Output('id-div-results', 'children'),
     Output('id-alert-container', 'children'),
+    Output('id-interval-queue', 'disabled', allow_duplicate=True),
+    Output('id-div-queue', 'children', allow_duplicate=True),
+    Output('id-store-last-solve', 'data'),
     Input('id-button-generate-results', 'n_clicks'),
     State('id-store-units', 'data'),
+    State('id-store-session', 'data'),
+    State('id-location-dashboard', 'search'),
     State('id-alert-container', 'children'),
+    State('id-store-last-solve', 'data'),
     prevent_initial_call=True
 )
-def generate_results(click, units, alerts):
-    
-    model, sys_cost = uc_model(units)
+def generate_results(click, fleet, session, search, alerts, last):
+
+    # Profiling - ?profile=1 in page address, X-Profile header or admin switch
+    profile = (
+        parse_qs((search or '').lstrip('?')).get('profile') == ['1']
+        or flask.request.headers.get('X-Profile') == '1'
+        or profiling.is_enabled()
+    )
+
+    # Previous solve of edited fleet - re-solve starts from its commitment (REPAIR=1)
+    previous = None
+    if last and last['fleet'] != fleet['token']:
+        try:
+            previous = { 'units': fleet_store.load(last['fleet']), 'results': results_store.schedule(last['results']) }
+        except OSError:
+            previous = None
+
+    try:
+        model, sys_cost, from_history = service.solve(fleet_store.load(fleet['token']), session, profile=profile, previous=previous)
+    except QueueFull as error:
+        
+        msg = str(error)
+        color = 'warning'
+        alerts = make_alerts(alerts, msg, color)
+
+        return no_update, no_update, alerts, True, '', no_update
+
+    except CapacityError as error:
+
+        msg = str(error)
+        color = 'warning'
+        alerts = make_alerts(alerts, msg, color)
+
+        return { 'token': None, 'click': click }, 'No solution for provided input.', alerts, True, '', no_update
+
+    except Exception as error:
+
+        # Unexpected failure of solve - queue polling is stopped as after any other outcome
+        print(f'Solve failed: {error!r}')
+        msg = f'Error during model computation: {error}'
+        color = 'danger'
+        alerts = make_alerts(alerts, msg, color)
+
+        return { 'token': None, 'click': click }, 'No solution for provided input.', alerts, True, '', no_update
+
     if not model:
 
         sys_cost = 'No solution for provided input.'
@@ -48,44 +108,131 @@ def generate_results(click, units, alerts):
         color = 'warning'
         alerts = make_alerts(alerts, msg, color)
 
-        return None, sys_cost, alerts
+        return { 'token': None, 'click': click }, sys_cost, alerts, True, '', no_update
 
-    msg = f'Model was computed successfully'  
+    msg = f'Model was computed successfully' if not from_history else 'Results were loaded from history'
     color = 'success'
     alerts = make_alerts(alerts, msg, color)
 
-    return model, sys_cost, alerts
+    # Elastic model - hours where demand was not balanced
+    for name in [UNSERVED, CURTAILED]:
+        hours = { hour: power for hour, power in model.get(name, {}).items() if power }
+        if hours:
+            msg = f'{name}: {len(hours)} hours, up to {max(hours.values()):.0f} MW (hours {", ".join(str(hour) for hour in hours)})'
+            color = 'warning'
+            alerts = make_alerts(alerts, msg, color)
+
+    token = results_store.save(model)
+
+    return { 'token': token, 'click': click }, sys_cost, alerts, True, '', { 'fleet': fleet['token'], 'results': token }
+
+
+@callback(
+    Output('id-store-preview', 'data'),
+    Output('id-div-preview', 'children'),
+    Output('id-interval-queue', 'disabled', allow_duplicate=True),
+    Input('id-button-generate-results', 'n_clicks'),
+    State('id-store-units', 'data'),
+    prevent_initial_call=True
+)
+def generate_preview(click, fleet):
+
+    # Merit order schedule is shown while exact model is computed (or waits in queue) - own store, exact results of the click replace it
+    schedule = merit_order_dispatch(fleet_store.load(fleet['token']))
+    if not schedule['feasible']:
+        return no_update, 'Merit order preview: no feasible schedule', False
+
+    return { 'token': results_store.save(schedule['results']), 'click': click }, f"Merit order preview: {schedule['sys_cost']}", False
+
+
+@callback(
+    Output('id-div-queue', 'children', allow_duplicate=True),
+    Input('id-interval-queue', 'n_intervals'),
+    State('id-store-session', 'data'),
+    prevent_initial_call=True
+)
+def show_queue_position(n, session):
+
+    position = solve_queue.position(session)
+    if not position:
+        return ''
+
+    return f'Waiting in queue: position {position}'
+
+
+# Width of results graph in browser (on load, new results and resize) - bars sent to browser are fitted to it
+clientside_callback(
+    """
+    function(results, preview, relayout, width) {
+        const graph = document.getElementById('id-graph-results');
+        const measured = graph ? Math.round(graph.offsetWidth / 50) * 50 : null;
+        return measured && measured !== width ? measured : window.dash_clientside.no_update;
+    }
+    """,
+    Output('id-store-graph-width', 'data'),
+    Input('id-store-results', 'data'),
+    Input('id-store-preview', 'data'),
+    Input('id-graph-results', 'relayoutData'),
+    State('id-store-graph-width', 'data'),
+)
 
 
 @callback(
     Output('id-graph-results', 'figure'),
+    Output('id-store-trace-types', 'data'),
     Input('id-store-results', 'data'),
-    Input('id-store-colors', 'data'),
+    Input('id-store-preview', 'data'),
+    Input('id-graph-results', 'relayoutData'),
+    Input('id-store-graph-width', 'data'),
+    State('id-store-colors', 'data'),
     State('id-store-units', 'data'),
 )
-def generate_graph_results(results, colors, units):
+def generate_graph_results(results, preview, relayout, width, colors, fleet):
 
+    units = fleet_store.load(fleet['token'])
     sorted_units = sorted( units.items(), key=lambda x: x[1]['vc'])
     sorted_units = dict(sorted_units).keys()
 
+    # Full results stay on server - zoomed window is re-queried (also on resize), buckets are averaged to fit the plot
+    start, end = None, None
+    triggered = set(ctx.triggered_prop_ids.values())
+    if not triggered & {'id-store-results', 'id-store-preview'}:
+        if triggered == {'id-graph-results'} and not ( relayout and ( 'xaxis.range[0]' in relayout or 'xaxis.autorange' in relayout ) ):
+            raise PreventUpdate
+        start, end = ( relayout or {} ).get('xaxis.range[0]'), ( relayout or {} ).get('xaxis.range[1]')
+
+    # Preview is shown only until exact results of the same click arrive (whichever callback finishes first)
+    is_preview = bool(preview) and preview['click'] > ( results or {} ).get('click', 0)
+    token = ( preview if is_preview else results or {} ).get('token')
+    try:
+        view = results_store.downsample(token, start, end, results_store.max_bars(width)) if token else None
+        expired = False
+    except OSError:
+        # Results removed after RESULTS_TTL (token of old page) - zoom or resize cannot re-query them
+        view, expired = None, True
+
+    # Unit type of each trace - colors are changed later by patching traces of the type
+    result_types = []
+
     fig = go.Figure()
     for unit in sorted_units:
-        if results is None:
+        if view is None:
             break
-        if unit not in results.keys():
+        if unit not in view['mean']:
             continue
 
-        x = results[unit].keys()  # each hour
-        y = results[unit].values()  # each hour
         kind = units[unit]['type']
+        result_types.append(kind)
 
         fig.add_trace(
             go.Bar(
-                x=list(x),
-                y=list(y),
+                x=view['x'],
+                y=view['mean'][unit].round(2),
+                width=view['width'],
+                customdata=np.stack([ view['min'][unit], view['max'][unit] ], axis=-1).round(2),
                 name=unit,
-                marker=dict(color=colors[kind], opacity=0.6, line=dict(width=0.5, color='black')),
-                hovertemplate='Power: %{y} MW',
+                marker=dict(color=colors[kind], opacity=0.6, line=dict(width=0.5 if view['bucket'] == 1 else 0, color='black')),
+                hovertemplate='Power: %{y} MW' if view['bucket'] == 1 else 'Mean: %{y} MW<br>Min: %{customdata[0]} MW<br>Max: %{customdata[1]} MW',
                 showlegend=False
             )
         )
@@ -95,7 +242,13 @@ def generate_graph_results(results, colors, units):
         plot_bgcolor='white',
         height=250, 
         margin={'r':5,'t':5,'l':5,'b':5},
+        uirevision=token,
     )
+    if is_preview and not expired:
+        fig.add_annotation(text='Merit order preview - not the exact schedule', xref='paper', yref='paper', x=0.01, y=0.98,
+                           xanchor='left', yanchor='top', showarrow=False, bgcolor='white', font=dict(size=11, color='grey'))
+    if start is not None:
+        fig.update_xaxes(range=[start, end])
     fig.update_xaxes(
         tickfont=dict(size=11),
         linewidth=1,
@@ -121,37 +274,58 @@ def generate_graph_results(results, colors, units):
             y=0.5, 
             showarrow=False
             )
+    elif expired:
+        fig.add_annotation(
+            text='Results expired - click button to solve again',
+            xref='paper', 
+            yref='paper',
+            x=0.5, 
+            y=0.5, 
+            showarrow=False
+            )
+
+    trace_types = Patch()
+    trace_types['results'] = result_types
     
-    return fig
+    return fig, trace_types
 
 
-@callback(
-    Output('id-graph-map', 'figure'),
-    Input('id-store-units', 'data'),
-    Input('id-store-colors', 'data')
-)
-def generate_graph_map(units, colors):
+def map_traces(units, colors, view, token):
+    # Markers of units and clusters in view - one trace per unit type, clusters and border
 
-    fig = go.Figure()
-    for unit in units.keys():
-        kind = units[unit]['type']
-        fig.add_trace(
+    lat_span = ( max_lat - min_lat ) / view['scale']
+    lon_span = ( max_lon - min_lon ) / view['scale']
+    shown = map_view(
+        units,
+        ( view['lat'] - lat_span / 2, view['lat'] + lat_span / 2 ),
+        ( view['lon'] - lon_span / 2, view['lon'] + lon_span / 2 ),
+        view['scale'],
+        token,
+        )
+
+    traces, trace_types = [], []
+    for kind, color in colors.items():
+        names = [ unit for unit in shown['units'] if units[unit]['type'] == kind ]
+        if not names:
+            continue
+        trace_types.append(kind)
+        traces.append(
             go.Scattergeo(
-            lon=[units[unit]['lon']],
-            lat=[units[unit]['lat']],
-            text=[unit],
+            lon=[ units[unit]['lon'] for unit in names ],
+            lat=[ units[unit]['lat'] for unit in names ],
+            text=names,
             mode='markers',
             name='',
-            customdata=[units[unit]['power']],
+            customdata=[ units[unit]['power'] for unit in names ],
             showlegend=False,
             hovertemplate='%{text} : %{customdata} MW',
             marker=dict(
-                size=units[unit]['power']/10,
+                size=[ units[unit]['power']/10 for unit in names ],
                 opacity=0.6,
                 reversescale=True,
                 autocolorscale=False,
                 symbol='circle',
-                color=colors[kind],
+                color=color,
                 line=dict(
                     width=1,
                     color='black',
@@ -160,7 +334,33 @@ def generate_graph_map(units, colors):
             )
         )
 
-    fig.add_trace(
+    # Clusters - summed power and power of each type in hover
+    clusters = shown['clusters']
+    trace_types.append('cluster')
+    traces.append(
+        go.Scattergeo(
+            lon=[ cluster['lon'] for cluster in clusters ],
+            lat=[ cluster['lat'] for cluster in clusters ],
+            text=[ 'cluster' for _ in clusters ],
+            hovertext=[
+                f"{cluster['count']} units : {round(cluster['power'])} MW<br>" + '<br>'.join( f'{kind.title()}: {round(power)} MW' for kind, power in cluster['types'].items() )
+                for cluster in clusters
+            ],
+            mode='markers+text',
+            texttemplate=[ str(cluster['count']) for cluster in clusters ],
+            textfont=dict(color='white', size=10),
+            showlegend=False,
+            hovertemplate='%{hovertext}<extra></extra>',
+            marker=dict(
+                size=[ min( 10 + cluster['power'] ** 0.5 / 2, 60 ) for cluster in clusters ],
+                opacity=0.7,
+                color='#555555',
+                line=dict(width=1, color='black'),
+                ),
+        ))
+
+    trace_types.append('border')
+    traces.append(
         go.Scattergeo(
             lon=[ ele[0] for ele in input.texas_boundaries ],
             lat=[ ele[1] for ele in input.texas_boundaries ],
@@ -172,6 +372,44 @@ def generate_graph_map(units, colors):
             text=[ 'border' for _ in input.texas_boundaries ],
         ))
 
+    return traces, trace_types
+
+
+@callback(
+    Output('id-graph-map', 'figure'),
+    Output('id-store-trace-types', 'data', allow_duplicate=True),
+    Output('id-store-map-view', 'data'),
+    Input('id-store-units', 'data'),
+    Input('id-graph-map', 'relayoutData'),
+    State('id-store-colors', 'data'),
+    State('id-store-map-view', 'data'),
+    prevent_initial_call='initial_duplicate'
+)
+def generate_graph_map(fleet, relayout, colors, view):
+
+    units = fleet_store.load(fleet['token'])
+    trace_types = Patch()
+
+    # Zoom / pan - only markers and clusters in new view are sent
+    if ctx.triggered_id == 'id-graph-map':
+        relayout = relayout or {}
+        if not any( key.startswith('geo.') for key in relayout ):
+            raise PreventUpdate
+        view = {
+            'lat': relayout.get('geo.center.lat', view['lat']),
+            'lon': relayout.get('geo.center.lon', view['lon']),
+            'scale': relayout.get('geo.projection.scale', view['scale']),
+        }
+        traces, trace_types['map'] = map_traces(units, colors, view, fleet['token'])
+        patched_figure = Patch()
+        patched_figure['data'] = traces
+
+        return patched_figure, trace_types, view
+
+    view = { 'lat': ( min_lat + max_lat ) / 2, 'lon': ( min_lon + max_lon ) / 2, 'scale': 1 }
+    traces, trace_types['map'] = map_traces(units, colors, view, fleet['token'])
+
+    fig = go.Figure(data=traces)
     fig.update_layout(
             height=375, 
             margin={'r':5,'t':5,'l':5,'b':5},
@@ -192,27 +430,16 @@ def generate_graph_map(units, colors):
         )
     fig.add_annotation(x=0, y=0, text='', showarrow=False)
     
-    return fig
+    return fig, trace_types, view
 
 
 @callback(
-    Output('id-table', 'rowData'), 
     Output('id-table', 'getRowStyle'), 
-    Input('id-store-units', 'data'),
-    Input('id-store-colors', 'data'),
+    Input('id-table', 'id'),
+    State('id-store-colors', 'data'),
 )
-def create_grid(units, colors):
+def create_grid(_, colors):
 
-    data = []
-    for key, value in units.items():
-        value['name'] = key
-        data.append(value)
-    df = pd.DataFrame.from_dict(data)
-
-    df_colors = pd.DataFrame(list( zip( colors.keys(), colors.values() ) ), columns=['type', 'color']) 
-    df = df.merge(df_colors, on=['type'])
-    data = df.to_dict('records')
-    
     getRowStyle = {
         'styleConditions': [
             {
@@ -222,7 +449,60 @@ def create_grid(units, colors):
         ] 
     }
     
-    return data, getRowStyle
+    return getRowStyle
+
+
+@callback(
+    Output('id-table', 'getRowsResponse'),
+    Input('id-table', 'getRowsRequest'),
+    State('id-store-units', 'data'),
+)
+def load_grid_rows(request, fleet):
+
+    if request is None:
+        raise PreventUpdate
+
+    # Grid holds only rows of pages shown - rows are sent on request (filtered and sorted by name when asked)
+    units = fleet_store.load(fleet['token'])
+    names = [ name for name in units if grid_filter(name, request.get('filterModel')) ]
+    for sort in request.get('sortModel', []):
+        if sort['colId'] == 'name':
+            names.sort(reverse=sort['sort'] == 'desc')
+
+    rows = [
+        { 'name': name, 'type': units[name]['type'], 'lat': units[name]['lat'], 'lon': units[name]['lon'] }
+        for name in names[request['startRow']:request['endRow']]
+    ]
+
+    return { 'rowData': rows, 'rowCount': len(names) }
+
+
+@callback(
+    Output('id-iframe-import', 'src'),
+    Output('id-link-export-csv', 'href'),
+    Output('id-link-export-parquet', 'href'),
+    Input('id-store-units', 'data'),
+)
+def link_fleet_files(fleet):
+
+    # Import adds to (or replaces) current fleet, export streams it from server
+    token = fleet['token']
+
+    return f'/api/fleets/form?base={token}', f'/api/fleets/{token}.csv', f'/api/fleets/{token}.parquet'
+
+
+# Rows cached in grid are dropped when fleet changes (grid asks for rows of shown page again)
+clientside_callback(
+    """
+    function(fleet) {
+        dash_ag_grid.getApiAsync('id-table').then((api) => api.purgeInfiniteCache());
+        return window.dash_clientside.no_update;
+    }
+    """,
+    Output('id-table', 'getRowsResponse', allow_duplicate=True),
+    Input('id-store-units', 'data'),
+    prevent_initial_call=True
+)
 
 
 @callback(
@@ -281,10 +561,12 @@ def delete_annotations(row_selected):
     State('id-store-units', 'data'),
     prevent_initial_call=True
 )
-def open_modal_update_delete_unit(clickData, units):
+def open_modal_update_delete_unit(clickData, fleet):
 
-    if clickData['points'][0]['text'] == 'border':
-        raise PreventUpdate
+    units = fleet_store.load(fleet['token'])
+
+    if clickData['points'][0]['text'] not in units:
+        raise PreventUpdate  # border or cluster
     
     unit = clickData['points'][0]['text']
     power = units[unit]['power']
@@ -306,15 +588,16 @@ def open_modal_update_delete_unit(clickData, units):
     State('id-alert-container', 'children'),
     prevent_initial_call=True
 )
-def delete_unit(click, data, name, alerts):
+def delete_unit(click, fleet, name, alerts):
 
-    del data[name]
+    units = fleet_store.load(fleet['token'])
+    del units[name]
 
     msg = f'Deleted unit: {name}'
     color = 'success'
     alerts = make_alerts(alerts, msg, color)
 
-    return False, data, alerts
+    return False, { 'token': fleet_store.save(units), 'units': len(units) }, alerts
 
 
 @callback(
@@ -330,25 +613,24 @@ def delete_unit(click, data, name, alerts):
     State('id-alert-container', 'children'),
     prevent_initial_call=True
 )
-def update_unit(click, data, name, power, vc, ramp, alerts):
+def update_unit(click, fleet, name, power, vc, ramp, alerts):
 
     # Error handling
     for value in [power, vc, ramp]:
-        if value is None or value < 0 or value > 1500:
+        if not valid_value(value):
             msg = f'Unit: {name} was not updated.'
             color = 'warning'
             alerts = make_alerts(alerts, msg, color)
             return False, no_update, alerts
 
-    data[name]['power'] = power
-    data[name]['vc'] = vc
-    data[name]['ramp'] = ramp
+    units = fleet_store.load(fleet['token'])
+    units[name] = { **units[name], 'power': power, 'vc': vc, 'ramp': ramp }
 
     msg = f'Updated unit: {name}'
     color = 'success'
     alerts = make_alerts(alerts, msg, color)
 
-    return False, data, alerts
+    return False, { 'token': fleet_store.save(units), 'units': len(units) }, alerts
 
 
 @callback(
@@ -370,6 +652,108 @@ def open_modal_create_unit(select):
     return True, lat, lon
 
 
+@callback(
+    Output('id-store-map-area', 'data'),
+    Input('id-graph-map', 'selectedData'),
+    prevent_initial_call=True
+)
+def store_map_area(select):
+
+    # Box selected on map is kept for bulk edit of units in it
+    if select is None or 'range' not in select:
+        return None
+
+    return select['range']['geo']
+
+
+@callback(
+    Output('id-modal-bulk-edit', 'is_open'),
+    Output('id-modal-create-unit', 'is_open', allow_duplicate=True),
+    Output('id-checklist-bulk-scope', 'value'),
+    Input('id-button-open-bulk-edit', 'n_clicks'),
+    Input('id-button-open-bulk-edit-area', 'n_clicks'),
+    State('id-checklist-bulk-scope', 'value'),
+    prevent_initial_call=True
+)
+def open_modal_bulk_edit(click, click_area, scope):
+
+    # Opened from create dialog of box selection - units in selected area are edited
+    if ctx.triggered_id == 'id-button-open-bulk-edit-area':
+        return True, False, sorted(set(scope) | {'area'})
+
+    return True, no_update, no_update
+
+
+def _bulk_selection(units, types, scope, area, request):
+
+    return select_units(
+        units,
+        types=types,
+        region=area if 'area' in ( scope or [] ) else None,
+        filter_model=( request or {} ).get('filterModel') if 'filter' in ( scope or [] ) else None,
+    )
+
+
+@callback(
+    Output('id-text-bulk-count', 'children'),
+    Output('id-button-bulk-apply', 'disabled'),
+    Input('id-modal-bulk-edit', 'is_open'),
+    Input('id-input-bulk-types', 'value'),
+    Input('id-checklist-bulk-scope', 'value'),
+    State('id-store-units', 'data'),
+    State('id-store-map-area', 'data'),
+    State('id-table', 'getRowsRequest'),
+    prevent_initial_call=True
+)
+def count_bulk_units(is_open, types, scope, fleet, area, request):
+
+    if not is_open:
+        raise PreventUpdate
+
+    if 'area' in ( scope or [] ) and not area:
+        return 'Select area on map first (box select).', True
+
+    count = len(_bulk_selection(fleet_store.load(fleet['token']), types, scope, area, request))
+
+    return f'Selected units: {count}', count == 0
+
+
+@callback(
+    Output('id-modal-bulk-edit', 'is_open', allow_duplicate=True),
+    Output('id-store-units', 'data', allow_duplicate=True), 
+    Output('id-alert-container', 'children', allow_duplicate=True),
+    Input('id-button-bulk-apply', 'n_clicks'),
+    State('id-store-units', 'data'), 
+    State('id-input-bulk-types', 'value'),
+    State('id-checklist-bulk-scope', 'value'),
+    State('id-store-map-area', 'data'),
+    State('id-table', 'getRowsRequest'),
+    State('id-input-bulk-key', 'value'),
+    State('id-radio-bulk-operation', 'value'),
+    State('id-input-bulk-value', 'value'),
+    State('id-alert-container', 'children'),
+    prevent_initial_call=True
+)
+def bulk_edit_units(click, fleet, types, scope, area, request, key, operation, value, alerts):
+
+    # All selected units are changed in one fleet update - map, grid and results react once
+    units = fleet_store.load(fleet['token'])
+    names = _bulk_selection(units, types, scope, area, request)
+    units, errors = edit_units(units, names, key, operation, value)
+
+    if errors:
+        msg = f'Units were not updated. {errors[0]}' + ( f' (and {len(errors) - 1} more)' if len(errors) > 1 else '' )
+        color = 'warning'
+        alerts = make_alerts(alerts, msg, color)
+        return True, no_update, alerts
+
+    msg = f'Updated {key} of {len(names)} units'
+    color = 'success'
+    alerts = make_alerts(alerts, msg, color)
+
+    return False, { 'token': fleet_store.save(units), 'units': len(units) }, alerts
+
+
 @callback(
     Output('id-modal-create-unit', 'is_open', allow_duplicate=True),
     Output('id-store-units', 'data', allow_duplicate=True), 
@@ -387,15 +771,15 @@ def open_modal_create_unit(select):
     State('id-alert-container', 'children'),
     prevent_initial_call=True
 )
-def create_unit(click, data, name, kind, power, vc, ramp, lat, lon, alerts):
+def create_unit(click, fleet, name, kind, power, vc, ramp, lat, lon, alerts):
 
     # Error handling
     for value in [power, vc, ramp]:
-        if value is None or value < 0 or value > 1500:
+        if not valid_value(value):
             msg = f'Unit: {name} was not created.'
             color = 'warning'
             alerts = make_alerts(alerts, msg, color)
-            return False, data, None, alerts
+            return False, no_update, None, alerts
 
     new_unit = {
         'type': kind, 
@@ -405,13 +789,14 @@ def create_unit(click, data, name, kind, power, vc, ramp, lat, lon, alerts):
         'vc': vc, 
         'ramp': ramp,
     }
-    data[name] = new_unit
+    units = fleet_store.load(fleet['token'])
+    units[name] = new_unit
 
     msg = f'Created unit: {name}'
     color = 'success'
     alerts = make_alerts(alerts, msg, color)
     
-    return False, data, None, alerts
+    return False, { 'token': fleet_store.save(units), 'units': len(units) }, None, alerts
 
 
 @callback(
@@ -420,18 +805,19 @@ def create_unit(click, data, name, kind, power, vc, ramp, lat, lon, alerts):
     State('id-store-units', 'data'), 
     prevent_initial_call=True
 )
-def check_unit_name(text, data):
+def check_unit_name(text, fleet):
 
-    if text is None or len(text) < 3 or text in data.keys():
+    if not valid_name(text, fleet_store.load(fleet['token'])):
         return True
     return False
 
 
 @callback(
     Output('id-div-colors', 'children'),
-    Input('id-store-colors', 'data')
+    Input('id-div-colors', 'id'),
+    State('id-store-colors', 'data')
 )
-def generate_colors_div(colors):
+def generate_colors_div(_, colors):
     
     lst = []
     for key, value in colors.items():
@@ -471,15 +857,38 @@ def open_modal_color_change(clicks, colors):
 @callback(
     Output('id-modal-change-color', 'is_open', allow_duplicate=True),
     Output('id-store-colors', 'data'),
+    Output('id-graph-results', 'figure', allow_duplicate=True),
+    Output('id-graph-map', 'figure', allow_duplicate=True),
+    Output('id-table', 'getRowStyle', allow_duplicate=True),
+    Output('id-div-colors', 'children', allow_duplicate=True),
     Input('id-button-change-color', 'n_clicks'),
     State('id-color-picker', 'value'),
     State('id-color-picker', 'label'),
     State('id-store-colors', 'data'),
+    State('id-store-trace-types', 'data'),
     prevent_initial_call=True
 )
-def save_color(click, value, unit, colors):
+def save_color(click, value, unit, colors, trace_types):
 
     color = value['hex']
     colors[unit] = color
 
-    return False, colors
+    # Only marker colors of traces with changed type are sent, figures and grid are not regenerated
+    patched_results = Patch()
+    for i, kind in enumerate(trace_types.get('results', [])):
+        if kind == unit:
+            patched_results['data'][i]['marker']['color'] = color
+
+    patched_map = Patch()
+    for i, kind in enumerate(trace_types.get('map', [])):
+        if kind == unit:
+            patched_map['data'][i]['marker']['color'] = color
+
+    index = list(colors.keys()).index(unit)
+    patched_style = Patch()
+    patched_style['styleConditions'][index]['style']['color'] = color
+
+    patched_buttons = Patch()
+    patched_buttons[index]['props']['style']['color'] = color
+
+    return False, colors, patched_results, patched_map, patched_style, patched_buttons
@@ -1,17 +1,40 @@
 import dash
 from dash import html, dcc
+import uuid
 import dash_bootstrap_components as dbc
 import dash_ag_grid as dag
 
 import input
+import fleet_store
 from partials import modals
 
 
-def layout():
+def _import_alerts(report_id):
+    # Result of fleet import - page is opened by redirect with id of import report
+
+    try:
+        report = fleet_store.load_report(report_id)
+    except (OSError, ValueError):
+        return []
+
+    if report.get('error'):
+        return [ dbc.Alert(f"Import failed: {report['error']}", is_open=True, color='danger', duration=10*1000) ]
+
+    msg = [ f"Imported {report['imported']} of {report['rows']} units." ]
+    if report['rejected']:
+        msg += [ f" Rejected rows: {report['rejected']} ", html.A('(errors)', href=f'/api/fleets/reports/{report_id}.csv') ]
+
+    return [ dbc.Alert(msg, is_open=True, color='warning' if report['rejected'] else 'success', duration=10*1000) ]
+
+
+def layout(fleet=None, report=None, **kwargs):
+
+    # Units stay on server - store holds token of fleet (given in page address after import)
+    token = fleet if fleet_store.exists(fleet) else fleet_store.save(input.units)
     
     return dbc.Container([
 
-    html.Div([],
+    html.Div(_import_alerts(report) if report else [],
         id='id-alert-container', 
             style={
                 'position': 'absolute',
@@ -26,11 +49,21 @@ def layout():
 
     modals.modal_update_delete,
     modals.modal_create,
+    modals.modal_bulk_edit,
     modals.modal_change_color,
 
-    dcc.Store(id='id-store-units', data=input.units),
+    dcc.Store(id='id-store-units', data={ 'token': token, 'units': len(fleet_store.load(token)) }),
     dcc.Store(id='id-store-results', data=None),
+    dcc.Store(id='id-store-preview', data=None),
+    dcc.Store(id='id-store-last-solve', data=None),
     dcc.Store(id='id-store-colors', data=input.units_colors),
+    dcc.Store(id='id-store-trace-types', data={}),
+    dcc.Store(id='id-store-graph-width', data=None),
+    dcc.Store(id='id-store-map-view', data=None),
+    dcc.Store(id='id-store-map-area', data=None),
+    dcc.Store(id='id-store-session', data=str(uuid.uuid4())),
+    dcc.Interval(id='id-interval-queue', interval=1000, disabled=True),
+    dcc.Location(id='id-location-dashboard', refresh=False),
 
     dbc.Row([
 
@@ -56,11 +89,12 @@ def layout():
                             dag.AgGrid(
                                 id='id-table',   
                                 columnDefs=[
-                                    { 'field': 'name', 'sortable': True, 'resizable': True},
+                                    { 'field': 'name', 'sortable': True, 'resizable': True, 'filter': 'agTextColumnFilter'},
                                     { 'field': 'lat', 'resizable': True},
                                     { 'field': 'lon', 'resizable': True},
                                     ],
-                                dashGridOptions={'pagination':True, 'paginationAutoPageSize': True, 'rowSelection':'single'},
+                                rowModelType='infinite',
+                                dashGridOptions={'pagination':True, 'paginationAutoPageSize': True, 'rowSelection':'single', 'cacheBlockSize': 100},
                                 columnSize='responsiveSizeToFit',
                                 )
                             ),             
@@ -89,8 +123,29 @@ def layout():
                             ),
                         className='d-grid gap-2'
                     ),
+                    html.Div(
+                        dbc.Button([
+                            html.I(className='bi bi-pencil-square me-2'),
+                            'Edit multiple units',
+                            ],
+                            id='id-button-open-bulk-edit',
+                            n_clicks=0,
+                            outline=True, 
+                            color='secondary',
+                            className='d-flex align-items-center'
+                            ),
+                        className='d-grid gap-2 mt-2'
+                    ),
+                    html.H6('Import or export fleet (CSV, Parquet):', className='my-3'),
+                    html.Iframe(id='id-iframe-import', style={'width': '100%', 'height': '2.5rem', 'border': 0}),
+                    html.Div([
+                        html.A('Export CSV', id='id-link-export-csv', className='me-3'),
+                        html.A('Export Parquet', id='id-link-export-parquet'),
+                    ], className='small'),
                     html.H6('Daily costs of running power grid:', className='my-3'),
                     dcc.Loading(html.Div('---', id='id-div-results')),
+                    html.Div(id='id-div-preview', className='text-muted small'),
+                    html.Div(id='id-div-queue', className='text-muted small'),
                 ]), className='mb-2 shadow-box'),
         ], xxl=4, className='mb-2', style={'display': 'grid'}),
 
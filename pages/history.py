@@ -0,0 +1,90 @@
+import dash
+from dash import html, dcc, callback, Input, Output
+import dash_bootstrap_components as dbc
+import plotly.graph_objects as go
+
+import history
+
+
+dash.register_page(__name__)
+
+
+def _run_label(run):
+
+    solve_time = sum(run['timings'].values())
+
+    return f"#{run['id']}  {run['created']}  |  {run['units_count']} units  |  {run['sys_cost']}  |  {solve_time:.1f} s"
+
+
+def layout():
+
+    fleets = sorted({ run['fleet_hash'] for run in history.list_runs(limit=1000) })
+
+    return dbc.Container([
+
+        dbc.Card(
+            dbc.CardBody([
+                html.H5('Compare stored solutions'),
+                dbc.Row([
+                    dbc.Col(dcc.Dropdown(
+                        id='id-history-fleet',
+                        options=[ {'label': f'Fleet {fleet[:8]}', 'value': fleet} for fleet in fleets ],
+                        placeholder='All fleets',
+                        ), md=4),
+                    dbc.Col(dcc.DatePickerSingle(id='id-history-day', placeholder='Any day', clearable=True), md=3),
+                ], className='mb-2'),
+                dcc.Dropdown(id='id-history-runs', multi=True, placeholder='Select runs to compare'),
+                dcc.Graph(id='id-history-graph', config={'displaylogo': False}),
+            ]), className='mb-2 shadow-box'),
+
+    ], fluid=True, className='page-container')
+
+
+@callback(
+    Output('id-history-runs', 'options'),
+    Input('id-history-fleet', 'value'),
+    Input('id-history-day', 'date'),
+)
+def list_history_runs(fleet, day):
+
+    return [ {'label': _run_label(run), 'value': run['id']} for run in history.list_runs(fleet, day) ]
+
+
+@callback(
+    Output('id-history-graph', 'figure'),
+    Input('id-history-runs', 'value'),
+)
+def compare_history_runs(run_ids):
+
+    # Only schedules of selected runs are loaded
+    schedules = history.load_schedules(run_ids or [])
+    costs = { run['id']: run['sys_cost'] for run in history.list_runs(limit=1000) if run['id'] in schedules }
+
+    fig = go.Figure()
+    for run_id, schedule in schedules.items():
+        hours = list(next(iter(schedule.values())).keys())
+        generation = [ sum( max(schedule[unit][hour], 0) for unit in schedule ) for hour in hours ]
+
+        fig.add_trace(
+            go.Scatter(
+                x=hours,
+                y=generation,
+                name=f'#{run_id} ({costs.get(run_id)})',
+                mode='lines',
+                line_shape='hv',
+                hovertemplate='Generation: %{y} MW',
+            )
+        )
+    fig.update_layout(
+        plot_bgcolor='white',
+        height=350,
+        margin={'r':5,'t':5,'l':5,'b':5},
+        legend=dict(orientation='h', y=-0.15),
+    )
+    fig.update_xaxes(linewidth=1, linecolor='black', ticks='outside', mirror=True)
+    fig.update_yaxes(title=dict(text='Generation [MW]', font=dict(size=14)), linewidth=1, linecolor='black', ticks='outside', mirror=True)
+
+    if not schedules:
+        fig.add_annotation(text='Select runs to compare', xref='paper', yref='paper', x=0.5, y=0.5, showarrow=False)
+
+    return fig
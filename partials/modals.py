@@ -3,6 +3,7 @@ from dash import dcc
 import dash_daq as daq
 
 import input
+from validation import MODEL_TYPES
 
 
 modal_update_delete = dbc.Modal([
@@ -104,6 +105,7 @@ modal_create = dbc.Modal([
         ])
     ]),        
     dbc.ModalFooter([
+        dbc.Button('Edit units in area', id='id-button-open-bulk-edit-area', n_clicks=0, color='secondary'),
         dbc.Button('Create', id='id-button-create', n_clicks=0, color='success', disabled=True),
     ]),
 ],
@@ -111,6 +113,61 @@ modal_create = dbc.Modal([
     is_open=False
 )
 
+modal_bulk_edit = dbc.Modal([
+
+    dbc.ModalHeader(dbc.ModalTitle('Edit multiple units')),
+
+    dbc.ModalBody([
+
+        dbc.Form([
+            dbc.Row([
+                    dbc.Label('Unit types', width=3, html_for='id-input-bulk-types'),
+                    dbc.Col(
+                        dcc.Dropdown(options=MODEL_TYPES, multi=True, placeholder='All types', id='id-input-bulk-types'),
+                        width=9,
+                    )], className='mb-3'),
+            dbc.Row([
+                    dbc.Label('Only units', width=3, html_for='id-checklist-bulk-scope'),
+                    dbc.Col(
+                        dbc.Checklist(
+                            options=[
+                                {'label': 'in selected map area', 'value': 'area'},
+                                {'label': 'matching grid filter', 'value': 'filter'},
+                            ],
+                            value=[],
+                            id='id-checklist-bulk-scope',
+                        ),
+                        width=9,
+                    )], className='mb-3'),
+            dbc.Row([
+                    dbc.Label('Change', width=3, html_for='id-input-bulk-key'),
+                    dbc.Col(
+                        dcc.Dropdown(options=[{'label': 'Power', 'value': 'power'}, {'label': 'Variable cost', 'value': 'vc'}, {'label': 'Ramp', 'value': 'ramp'}], value='vc', clearable=False, id='id-input-bulk-key'),
+                        width=9,
+                    )], className='mb-3'),
+            dbc.Row([
+                    dbc.Label('Operation', width=3, html_for='id-radio-bulk-operation'),
+                    dbc.Col(
+                        dbc.RadioItems(options=[{'label': 'Multiply by', 'value': 'scale'}, {'label': 'Set to', 'value': 'set'}], value='scale', inline=True, id='id-radio-bulk-operation'),
+                        width=9,
+                    )], className='mb-3'),
+            dbc.Row([
+                    dbc.Label('Value', width=3, html_for='id-input-bulk-value'),
+                    dbc.Col(
+                        dbc.Input(id='id-input-bulk-value', type='number', value=1),
+                        width=9,
+                    )], className='mb-3'),
+        ]),
+        dbc.FormText('---', id='id-text-bulk-count'),
+    ]),
+    dbc.ModalFooter([
+        dbc.Button('Apply', id='id-button-bulk-apply', n_clicks=0, color='success'),
+    ]),
+],
+    id='id-modal-bulk-edit',
+    is_open=False
+)
+
 modal_change_color = dbc.Modal([
 
     dbc.ModalHeader(dbc.ModalTitle('Change color')),
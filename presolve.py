@@ -0,0 +1,127 @@
+import numpy as np
+import time
+
+import input
+from pyo_model import split_units, step_durations, MIN_POWER
+from merit_order import net_demand
+
+
+# ## Presolve settings
+MAX_PASSES = 10  # fixings of one pass can enable fixings in the next one
+EPS = 1e-6
+
+
+class CapacityError(Exception):
+    '''Fleet cannot balance demand in some hours whatever the schedule'''
+
+    def __init__(self, check):
+
+        self.check = check
+        messages = []
+        if check['shortfall']:
+            messages.append(f"Demand cannot be covered in hours {_hour_ranges(check['shortfall'])} (up to {max(check['shortfall'].values()):.0f} MW missing).")
+        if check['surplus']:
+            messages.append(f"Renewable production exceeds demand and battery loading in hours {_hour_ranges(check['surplus'])} (up to {max(check['surplus'].values()):.0f} MW surplus).")
+        super().__init__(' '.join(messages))
+
+
+def _hour_ranges(values):
+
+    hours = sorted(values)
+    ranges, start = [], hours[0]
+    for previous, hour in zip(hours, hours[1:] + [None]):
+        if hour != previous + 1:
+            ranges.append(f'{start}-{previous}' if previous > start else f'{start}')
+            start = hour
+
+    return ', '.join(ranges)
+
+
+def capacity_check(units, profiles=input.profiles):
+    '''Hours no schedule can balance (necessary condition, ramps and battery volume are ignored) - MW missing when all plants run
+    at full power and batteries discharge, MW surplus when renewables exceed demand with batteries loading and all plants off'''
+
+    plants, _, _, _, batteries = split_units(units)
+
+    demand = net_demand(units, profiles)
+    storage = sum( battery['power'] for battery in batteries.values() )
+    capacity = sum( plant['power'] for plant in plants.values() )
+
+    return {
+        'shortfall': { hour: round(float(value), 2) for hour, value in enumerate(demand - capacity - storage, start=1) if value > EPS },
+        'surplus': { hour: round(float(value), 2) for hour, value in enumerate(- demand - storage, start=1) if value > EPS },
+    }
+
+
+def presolve(units, profiles=input.profiles):
+    '''Fix commitment that data already decides and find redundant constraints - before model is built.
+
+    Only reductions valid for every feasible schedule are made, so the optimum does not change:
+    - plant is on in hours when demand cannot be covered without it (by other plants, renewables and batteries)
+    - plant is off in hours when its min power would overload the system (renewables and must-on plants already cover demand and battery loading)
+    - plants off in all hours are removed from the model
+    - ramp constraints of plants whose ramp between the closest steps covers their whole power are redundant
+    (ramp >= power for hourly steps, sub-hourly steps need ramp * step >= power)
+    '''
+
+    start_time = time.time()
+
+    plants, _, _, _, batteries = split_units(units)
+    names = list(plants.keys())
+    hours = list(range(1, len(profiles['demand']) + 1))
+    duration = step_durations(profiles)
+    shortest = min( ( duration[hour-1] + duration[hour] ) / 2 for hour in hours[1:] ) if len(hours) > 1 else 1  # hours between centers of steps, as in ramp constraints
+
+    demand = net_demand(units, profiles)
+    storage = sum( battery['power'] for battery in batteries.values() )
+    capacity = np.array([ plants[plant]['power'] for plant in names ], dtype=float)
+    min_power = MIN_POWER * capacity
+
+    # Commitment state of each plant-hour: 1 - on, 0 - off, -1 - free
+    state = np.full((len(hours), len(names)), -1)
+
+    passes = 0
+    for passes in range(1, MAX_PASSES + 1):
+        previous = state.copy()
+
+        # Must be on - others (not fixed off) cannot cover demand even with batteries discharging at full power
+        available = np.where(state != 0, capacity, 0)
+        others = available.sum(axis=1, keepdims=True) - available
+        state[ (state == -1) & (others + storage < demand[:, None] - EPS) ] = 1
+
+        # Must be off - its min power with min power of must-on plants exceeds demand with batteries loading at full power
+        must_run = np.where(state == 1, min_power, 0)
+        others = must_run.sum(axis=1, keepdims=True) - must_run
+        state[ (state == -1) & (others + min_power > demand[:, None] + storage + EPS) ] = 0
+
+        if (state == previous).all():
+            break
+
+    removed = [ plant for i, plant in enumerate(names) if (state[:, i] == 0).all() ]
+    fixed_on = {
+        plant: { hour: int(state[h, i]) for h, hour in enumerate(hours) if state[h, i] != -1 }
+        for i, plant in enumerate(names) if plant not in removed
+    }
+
+    return {
+        'units': { unit: params for unit, params in units.items() if unit not in removed },
+        'removed': removed,
+        'on': { plant: fixed for plant, fixed in fixed_on.items() if fixed },
+        'ramp_free': [ plant for plant in names if plants[plant]['ramp'] * shortest >= plants[plant]['power'] and plant not in removed ],
+        'summary': {
+            'fixed_on': int((state == 1).sum()),
+            'fixed_off': int((state == 0).sum()),
+            'free': int((state == -1).sum()),
+            'removed_units': len(removed),
+            'passes': passes,
+        },
+        'wall_time': time.time() - start_time,
+    }
+
+
+if __name__ == '__main__':
+
+    result = presolve(input.units)
+    print(result['summary'])
+    for plant, fixed in result['on'].items():
+        print(plant.ljust(12), ''.join( str(fixed.get(hour, '.')) for hour in range(1, len(input.profiles['demand']) + 1) ))
@@ -0,0 +1,158 @@
+from pyomo.common.timing import report_timing
+from collections import Counter
+import threading
+import datetime
+import pathlib
+import json
+import time
+import sys
+import io
+import os
+import re
+
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', str(pathlib.Path(__file__).parent.resolve() / 'profiles'))
+SAMPLE_INTERVAL = 0.005  # sec
+TOP_FUNCTIONS = 40
+
+_profile_lock = threading.Lock()  # Pyomo timing report is process-global - one profiled solve at a time
+
+
+class SamplingProfiler:
+    '''Samples call stack of one thread in regular intervals (low overhead, rule lambdas and vc() show up with their lines)'''
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}')
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        '''Stacks in folded format (input of flame graph tools)'''
+
+        return ''.join( f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common() )
+
+    def summary(self):
+        '''Functions with the most samples - own (top of stack) and total (anywhere in stack)'''
+
+        total = sum(self.stacks.values()) or 1
+        own, inclusive = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for frame in set(stack):
+                inclusive[frame] += count
+
+        lines = [ f'Samples: {total} ({self.interval * 1000:.0f} ms interval)', '', 'Own time:' ]
+        lines += [ f'{count / total * 100:6.1f} %  {frame}' for frame, count in own.most_common(TOP_FUNCTIONS) ]
+        lines += [ '', 'Total time:' ]
+        lines += [ f'{count / total * 100:6.1f} %  {frame}' for frame, count in inclusive.most_common(TOP_FUNCTIONS) ]
+
+        return '\n'.join(lines)
+
+
+def _construction_report(text):
+    '''Pyomo timing report sorted from the slowest component'''
+
+    entries = []
+    for line in text.splitlines():
+        match = re.match(r'\s*([\d.eE+-]+) seconds to (.*)', line)
+        if match:
+            entries.append(( float(match.group(1)), match.group(2) ))
+
+    return '\n'.join( f'{seconds:10.4f} s  {what}' for seconds, what in sorted(entries, reverse=True) )
+
+
+# ### Switch (shared by all workers through a file)
+
+def is_enabled():
+
+    return os.path.exists(os.path.join(PROFILE_DIR, 'enabled'))
+
+
+def set_enabled(enabled):
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, 'enabled')
+    if enabled:
+        open(path, 'w').close()
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+# ### Capture and browse profiles
+
+def profile_call(label, function, *args, **kwargs):
+    '''Run function with sampling profiler and Pyomo construction timing, save both to PROFILE_DIR/<time>-<label>.
+    Profiled calls are serialized (waiting is not counted in wall time). Construction timing is process-global -
+    components built by solves of other threads running at the same time are reported too.'''
+
+    timing = io.StringIO()
+    with _profile_lock:
+        start_time = time.time()
+        with SamplingProfiler(threading.get_ident()) as profiler, report_timing(stream=timing):
+            result = function(*args, **kwargs)
+        wall_time = time.time() - start_time
+
+    name = f"{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}-{label}"
+    directory = os.path.join(PROFILE_DIR, name)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'summary.txt'), 'w') as file:
+        file.write(profiler.summary())
+    with open(os.path.join(directory, 'stacks.txt'), 'w') as file:
+        file.write(profiler.collapsed())
+    with open(os.path.join(directory, 'construction.txt'), 'w') as file:
+        file.write(_construction_report(timing.getvalue()))
+    with open(os.path.join(directory, 'meta.json'), 'w') as file:
+        json.dump({ 'label': label, 'created': datetime.datetime.now().isoformat(timespec='seconds'), 'wall_time': wall_time }, file)
+
+    return result
+
+
+def list_profiles():
+
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        try:
+            with open(os.path.join(PROFILE_DIR, name, 'meta.json')) as file:
+                profiles.append({ 'name': name, **json.load(file) })
+        except (OSError, ValueError):
+            continue
+
+    return profiles
+
+
+def load_profile(name):
+    '''Summary, construction times and stacks of saved profile'''
+
+    directory = os.path.join(PROFILE_DIR, os.path.basename(name))
+    profile = {}
+    for part in ['summary', 'construction', 'stacks']:
+        with open(os.path.join(directory, f'{part}.txt')) as file:
+            profile[part] = file.read()
+
+    return profile
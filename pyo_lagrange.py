@@ -0,0 +1,327 @@
+import pyomo.environ as pyo
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import time
+import os
+
+import input
+from pyo_model import build_model, solve_model, is_solved, extract_results, split_units, hourly_profiles, generation_cost, backend_available
+from pyo_model import MIN_POWER, OPT_POWER, START_UP_COST, BATTERY_EFF, BATTERY_START, BATTERY_LOAD_TIME
+
+
+# ## Lagrangian relaxation settings
+LR_PLANT_LEVELS = 21  # power levels between min and max power of a plant
+LR_BATTERY_LEVELS = 41  # volume levels of a battery
+LR_MAX_ITERATIONS = 200
+LR_REPAIR_STORAGE_SHARES = [1, 0.5, 0]  # share of storage power counted as capacity in repair, decreased when dispatch is infeasible
+LR_STEP = 1.0  # first step of prices (in average variable costs), decreasing with square root of iteration
+EPS = 1e-6
+
+
+# ### Single unit subproblems (run in worker processes)
+
+def _plant_dp(plant, prices):
+    '''Single plant commitment for given hourly prices - dynamic programming over power levels (0 = off)'''
+
+    levels = np.concatenate(( [0], np.linspace(MIN_POWER * plant['power'], plant['power'], LR_PLANT_LEVELS) ))
+    level_prev, level_next = levels[:, None], levels[None, :]
+    on_prev, on_next = level_prev > 0, level_next > 0
+
+    # Allowed transitions follow ramp constraints of the model, start-up is the only transition cost
+    allowed = (
+        ( ~on_prev & ~on_next )
+        | ( ~on_prev & on_next & ( level_next <= MIN_POWER * plant['power'] + EPS ) )
+        | ( on_prev & ~on_next )
+        | ( on_prev & on_next & ( np.abs(level_next - level_prev) <= plant['ramp'] + EPS ) )
+        )
+    start_up = START_UP_COST * plant['vc'] * plant['power'] * ( ~on_prev & on_next )
+    transition = np.where(allowed, start_up, np.inf)
+
+    production = generation_cost(plant, levels)
+    stage = production[None, :] - prices[:, None] * levels[None, :]
+
+    # Forward pass (plant is off before first hour, ramp is not limited in first hour)
+    hours = len(prices)
+    choice = np.zeros((hours, len(levels)), dtype=int)
+    value = start_up[0] + stage[0]
+    for hour in range(1, hours):
+        total = value[:, None] + transition
+        choice[hour] = total.argmin(axis=0)
+        value = total[choice[hour], np.arange(len(levels))] + stage[hour]
+
+    # Backward pass
+    path = np.zeros(hours, dtype=int)
+    path[-1] = value.argmin()
+    for hour in range(hours - 1, 0, -1):
+        path[hour-1] = choice[hour, path[hour]]
+
+    power = levels[path]
+    cost = production[path].sum() + start_up[0, path[0]] + transition[path[:-1], path[1:]].sum()
+
+    return power, cost, value.min()
+
+
+def _battery_dp(battery, prices):
+    '''Single battery schedule for given hourly prices - dynamic programming over volume levels'''
+
+    volume_max = battery['power'] * BATTERY_LOAD_TIME
+    levels = np.linspace(0, volume_max, LR_BATTERY_LEVELS)
+    start = np.abs(levels - volume_max * BATTERY_START).argmin()
+
+    delta = levels[None, :] - levels[:, None]
+    load = np.where(delta > 0, delta / BATTERY_EFF, 0)
+    reload = np.where(delta < 0, -delta, 0)
+    allowed = ( load <= battery['power'] + EPS ) & ( reload <= battery['power'] + EPS )
+    injection = reload - load
+    own_cost = np.where(allowed, battery['vc'] * load, np.inf)
+
+    hours = len(prices)
+    choice = np.zeros((hours, len(levels)), dtype=int)
+    value = own_cost[start] - prices[0] * injection[start]
+    for hour in range(1, hours):
+        total = value[:, None] + own_cost - prices[hour] * injection
+        choice[hour] = total.argmin(axis=0)
+        value = total[choice[hour], np.arange(len(levels))]
+
+    path = np.zeros(hours, dtype=int)
+    path[-1] = value.argmin()
+    for hour in range(hours - 1, 0, -1):
+        path[hour-1] = choice[hour, path[hour]]
+
+    prev = np.concatenate(( [start], path[:-1] ))
+
+    return injection[prev, path], own_cost[prev, path].sum(), value.min()
+
+
+# ### Relaxed subproblems - lower bound of the dual function (discrete levels above only approximate it from above)
+
+def _plant_bound(plant, prices):
+    '''Lower bound of single plant subproblem - continuous power between min and max power when on, ramps relaxed'''
+
+    p_min, p_opt, p_max = MIN_POWER * plant['power'], OPT_POWER * plant['power'], plant['power']
+
+    # Cost curve is quadratic below and above optimal power - minimum of each piece is at its ends or its stationary point
+    candidates = [ np.full(len(prices), value) for value in [p_min, p_opt, p_max] ]
+    for low, high in [ (p_min, p_opt), (p_opt, p_max) ]:
+        if high <= low:
+            continue
+        middle = ( low + high ) / 2
+        c_low, c_mid, c_high = generation_cost(plant, np.array([low, middle, high]))
+        curvature = 2 * ( c_low - 2 * c_mid + c_high ) / ( high - low ) ** 2  # a of piece a * p^2 + b * p + c
+        if curvature > EPS:
+            beta = ( c_high - c_low ) / ( high - low ) - 2 * curvature * middle
+            candidates.append(np.clip(( prices - beta ) / ( 2 * curvature ), low, high))
+    candidates = np.array(candidates)
+    on_value = ( generation_cost(plant, candidates) - prices[None, :] * candidates ).min(axis=0)
+
+    # Commitment over on / off states (plant is off before first hour)
+    start_up = START_UP_COST * plant['vc'] * plant['power']
+    value_off, value_on = 0, start_up + on_value[0]
+    for hour in range(1, len(prices)):
+        value_off, value_on = min(value_off, value_on), min(value_on, value_off + start_up) + on_value[hour]
+
+    return min(value_off, value_on)
+
+
+def _battery_bound(battery, prices):
+    '''Lower bound of single battery subproblem - LP with continuous volume (loading and reloading in the same hour allowed)'''
+
+    volume_max = battery['power'] * BATTERY_LOAD_TIME
+    hours = range(len(prices))
+
+    if not backend_available('highs'):
+        # Without LP solver volume is relaxed too - each hour on its own
+        return sum( min(0, ( battery['vc'] + price ) * battery['power']) + min(0, -price * battery['power']) for price in prices )
+
+    model = pyo.ConcreteModel()
+    model.b_load = pyo.Var(hours, bounds=(0, battery['power']))
+    model.b_reload = pyo.Var(hours, bounds=(0, battery['power']))
+    model.b_volume = pyo.Var(hours, bounds=(0, volume_max))
+    model.ct_b_volume = pyo.Constraint(hours, rule=lambda m, h:
+        m.b_volume[h] == ( m.b_volume[h-1] if h > 0 else volume_max * BATTERY_START ) + m.b_load[h] * BATTERY_EFF - m.b_reload[h] )
+    model.cost = pyo.Objective(expr=sum( battery['vc'] * model.b_load[h] - prices[h] * ( model.b_reload[h] - model.b_load[h] ) for h in hours ))
+
+    results = pyo.SolverFactory('appsi_highs').solve(model)
+
+    return pyo.value(model.cost) if is_solved(results) else -np.inf
+
+
+def lower_bound(units, prices, net_demand):
+    '''Dual function with relaxed subproblems at given prices - valid lower bound of system cost, but a loose one: ramps and the
+    battery load / reload exclusion are relaxed (on input.units about 2000 against optimum of about 9700)'''
+
+    plants, _, _, _, batteries = split_units(units)
+
+    return (
+        prices @ net_demand
+        + sum( _plant_bound(plant, prices) for plant in plants.values() )
+        + sum( _battery_bound(battery, prices) for battery in batteries.values() )
+        )
+
+
+_worker = {'units': None}
+
+
+def _init_worker(units):
+
+    _worker['units'] = units
+
+
+def _solve_chunk(names, prices):
+    '''Solve subproblems of a group of units'''
+
+    solutions = {}
+    for name in names:
+        unit = _worker['units'][name]
+        if unit['type'] == 'battery':
+            solutions[name] = _battery_dp(unit, prices)
+        else:
+            solutions[name] = _plant_dp(unit, prices)
+
+    return solutions
+
+
+# ### Feasible schedule
+
+def repair_commitment(units, commitment, net_demand, storage_share=1):
+    '''Commit cheapest units when capacity is missing and release most expensive when min power exceeds demand'''
+
+    plants, _, _, _, batteries = split_units(units)
+    by_cost = sorted(plants, key=lambda plant: plants[plant]['vc'])
+    storage = sum( battery['power'] for battery in batteries.values() )
+
+    def available(plant, h):
+        '''Started plant can only reach min power in its first hour'''
+        if not commitment[plant][h]:
+            return 0
+        if h == 0 or commitment[plant][h-1]:
+            return plants[plant]['power']
+        return MIN_POWER * plants[plant]['power']
+
+    commitment = { plant: list(commitment[plant]) for plant in plants }
+    for h, demand in enumerate(net_demand):
+
+        # Storage energy is limited, so only a share of its power is counted as capacity
+        for plant in by_cost:
+            if sum( available(plant, h) for plant in plants ) + storage_share * storage >= demand:
+                break
+            commitment[plant][h] = 1
+            if h > 0:
+                commitment[plant][h-1] = 1
+
+    for h, demand in enumerate(net_demand):
+
+        must_run = sum( MIN_POWER * plants[plant]['power'] * commitment[plant][h] for plant in plants )
+        for plant in reversed(by_cost):
+            if must_run <= demand + storage:
+                break
+            if commitment[plant][h]:
+                commitment[plant][h] = 0
+                must_run -= MIN_POWER * plants[plant]['power']
+
+    return commitment
+
+
+def dispatch_commitment(units, commitment, profiles=input.profiles):
+    '''Optimal dispatch for fixed commitment of plants'''
+
+    model = build_model(units, profiles)
+    for plant, hour in model.on:
+        model.on[plant, hour].fix(commitment[plant][hour-1])
+    pyo.TransformationFactory('gdp.hull').apply_to(model)
+    results = solve_model(model)
+
+    if not is_solved(results):
+        return False, 0
+
+    return extract_results(model, units, profiles), pyo.value(model.system_costs)
+
+
+# ### Lagrangian relaxation
+
+def lagrangian_relaxation(units, profiles=input.profiles, workers=None, max_iterations=LR_MAX_ITERATIONS):
+    '''UC with relaxed demand balance - independent unit subproblems and subgradient update of hourly prices'''
+
+    start_time = time.time()
+
+    plants, demand_sources, wind_farms, pv_farms, batteries = split_units(units)
+    demand_profile, wind_profile, pv_profile = hourly_profiles(profiles)
+    hours = list(demand_profile.keys())
+
+    net_demand = np.array([
+        + sum( ele['power'] * demand_profile[hour] for ele in demand_sources.values() )
+        - sum( ele['power'] * wind_profile[hour] for ele in wind_farms.values() )
+        - sum( ele['power'] * pv_profile[hour] for ele in pv_farms.values() )
+        for hour in hours
+        ])
+
+    names = list(plants) + list(batteries)
+    workers = min(workers or os.cpu_count(), max(len(names), 1))
+    chunks = [ list(chunk) for chunk in np.array_split(names, workers) if len(chunk) ]
+
+    # Start from average variable cost
+    average_vc = np.mean([ plant['vc'] for plant in plants.values() ] or [0])
+    prices = np.full(len(hours), average_vc)
+    best = { 'dual': -np.inf, 'prices': prices, 'solutions': None }  # dual of discrete subproblems - picks prices, not a bound
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(units,)) as pool:
+
+        for iteration in range(1, max_iterations + 1):
+
+            solutions = {}
+            for chunk in pool.map(_solve_chunk, chunks, [prices] * len(chunks)):
+                solutions.update(chunk)
+
+            dual = prices @ net_demand + sum( value for _, _, value in solutions.values() )
+            subgradient = net_demand - sum( injection for injection, _, _ in solutions.values() )
+
+            if dual > best['dual']:
+                best = { 'dual': dual, 'prices': prices, 'solutions': solutions }
+
+            norm = np.linalg.norm(subgradient)
+            if norm < EPS:
+                break
+
+            # Normalized subgradient step
+            prices = prices + LR_STEP * average_vc / np.sqrt(iteration) * subgradient / norm
+
+    # Repair relaxed commitment and dispatch it
+    commitment = { plant: ( best['solutions'][plant][0] > 0 ).astype(int).tolist() for plant in plants }
+    for storage_share in LR_REPAIR_STORAGE_SHARES:
+        repaired = repair_commitment(units, commitment, net_demand, storage_share)
+        results, upper_bound = dispatch_commitment(units, repaired, profiles)
+        if results:
+            break
+    commitment = repaired
+
+    if not results:
+        print('Repaired commitment is infeasible')
+        return False
+
+    # Dual value of discrete subproblems is not a bound - bound is evaluated with relaxed subproblems at the best prices
+    bound = lower_bound(units, best['prices'], net_demand)
+
+    return {
+        'results': results,
+        'sys_cost': f'{round(upper_bound, 0)} $',
+        'commitment': { plant: { hour: value for hour, value in zip(hours, commitment[plant]) } for plant in plants },
+        'prices': dict(zip(hours, best['prices'].round(2).tolist())),
+        'lower_bound': bound,
+        'upper_bound': upper_bound,
+        'duality_gap': ( upper_bound - bound ) / max(abs(upper_bound), EPS),
+        'iterations': iteration,
+        'wall_time': time.time() - start_time,
+    }
+
+
+if __name__ == '__main__':
+
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
+
+    solution = lagrangian_relaxation(input.units)
+    if solution:
+        print(f"Lower bound: {solution['lower_bound']:.0f} (valid but loose - ramps are relaxed)")
+        print(f"Upper bound: {solution['upper_bound']:.0f}")
+        print(f"Duality gap: {100 * solution['duality_gap']:.2f} %")
+        print(f"Iterations: {solution['iterations']}, execution time: {solution['wall_time']:.2f} s")
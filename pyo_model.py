@@ -1,49 +1,167 @@
 import pyomo.environ as pyo
 import pyomo.gdp as gdp
+from pyomo.common.collections import ComponentSet, ComponentMap
+import tracemalloc
 import pathlib
 import math
 import time
 import os
+import gc
+import numpy as np
 
 import input
 
 
-def uc_model(units):
+# ## Constants
+MIN_POWER = 0.4
+START_UP_COST = 10
+OPT_POWER = 0.7
+BATTERY_EFF = 0.6
+BATTERY_START = 0.5  # 0 - fully discharged, 0 - fully charged
+BATTERY_LOAD_TIME = 5  # hours
+
+# ## Elastic mode - demand balance with penalized slacks
+UNSERVED_COST = 20000  # $/MWh, value of lost load (well above max vc of unit)
+CURTAILMENT_COST = 5000  # $/MWh, surplus of must-run generation (above max vc, so batteries load first)
+UNSERVED = 'Unserved energy'  # pseudo-units of results with shortfall of elastic solve
+CURTAILED = 'Curtailment'
+
+# ## Solver settings
+MIP_SOLVER = 'cbc'
+# solver_path = pathlib.Path(__file__).parent.resolve() / f'{solver_name}.exe'
+NLP_SOLVER = 'ipopt'
+SOLVER_BACKENDS = {
+    'mindtpy': { 'engine': 'mindtpy', 'mip_solver': MIP_SOLVER, 'nlp_solver': NLP_SOLVER },  # executables, subproblems exchanged through files
+    'mindtpy_in_memory': { 'engine': 'mindtpy', 'mip_solver': 'appsi_gurobi', 'nlp_solver': 'cyipopt' },  # in-process bindings (gurobipy, cyipopt)
+    'highs': { 'engine': 'appsi_highs' },  # in-process MILP, only for linear objective
+}
+SOLVER_OPTIONS = dict(constraint_tolerance=0.1, absolute_bound_tolerance=0.1, relative_bound_tolerance=0.1, small_dual_tolerance=0.1, integer_tolerance=0.1)  # absolute_bound_tolerance=0.01, relative_bound_tolerance=0.01, small_dual_tolerance=0.01, integer_tolerance=0.01
+PRICE_UPDATE_FLAGS = [
+    'check_for_new_or_removed_constraints', 'check_for_new_or_removed_vars', 'check_for_new_or_removed_params', 'check_for_new_objective',
+    'update_constraints', 'update_params', 'update_named_expressions', 'update_objective',
+]  # update checks of persistent solver skipped by price re-solve - only variables change
+
+
+def model_settings():
+    '''Settings which together with units and profiles determine the solution'''
+
+    return {
+        'DEVIATION_COST': float( os.environ.get("DEVIATION_COST") ),
+        'SOLVER_BACKEND': os.environ.get('SOLVER_BACKEND', 'auto'),
+        'SOLVER_OPTIONS': SOLVER_OPTIONS,
+        'MIN_POWER': MIN_POWER,
+        'START_UP_COST': START_UP_COST,
+        'OPT_POWER': OPT_POWER,
+        'BATTERY_EFF': BATTERY_EFF,
+        'BATTERY_START': BATTERY_START,
+        'BATTERY_LOAD_TIME': BATTERY_LOAD_TIME,
+        'TIME_STEP': int( os.environ.get('TIME_STEP', 60) ),
+        'ADAPTIVE_STEPS': os.environ.get('ADAPTIVE_STEPS', '0') == '1',
+        'ELASTIC': os.environ.get('ELASTIC', '0') == '1',
+        'NETWORK': input.network if os.environ.get('ZONAL', '0') == '1' else None,
+    }
+
+
+def split_units(units):
+    '''Group units by their type'''
+
+    plants = { key: val for key, val in units.items() if units[key]['type'] in ['coal', 'gas', 'nuclear'] }
+    demand_sources = { key: val for key, val in units.items() if units[key]['type'] in ['demand'] }
+    wind_farms = { key: val for key, val in units.items() if units[key]['type'] in ['wind'] }
+    pv_farms = { key: val for key, val in units.items() if units[key]['type'] in ['pv'] }
+    batteries = { key: val for key, val in units.items() if units[key]['type'] in ['battery'] }
+
+    return plants, demand_sources, wind_farms, pv_farms, batteries
+
+
+def hourly_profiles(profiles):
+    '''Profiles indexed by hour (starting from 1)'''
+
+    demand_profile = { hour+1: value for hour, value in enumerate(profiles['demand']) }
+    wind_profile = { hour+1: value for hour, value in enumerate(profiles['wind']) }
+    pv_profile = { hour+1: value for hour, value in enumerate(profiles['pv']) }
+
+    return demand_profile, wind_profile, pv_profile
+
+
+def step_durations(profiles):
+    '''Length of each time step in hours (profiles without durations are hourly)'''
+
+    durations = profiles.get('duration', [1] * len(profiles['demand']))
+
+    return { step+1: value for step, value in enumerate(durations) }
+
+
+def generation_cost(plant, power):
+    '''Cost of plant production at given power (same cost curve as in model objective), works with numpy arrays'''
+
+    DEVIATION_COST = float( os.environ.get("DEVIATION_COST") )
+    BASE_COST = plant['vc']
+    max_power = plant['power']
+    opt_power = plant['power'] * OPT_POWER
+
+    power_neg = ( power - opt_power ) * ( power < opt_power )
+    power_pos = ( power - opt_power ) * ( power >= opt_power )
+
+    a = BASE_COST * ( DEVIATION_COST - 1 ) / ( max_power * ( MIN_POWER - OPT_POWER ) )
+    neg_cost = a * ( opt_power + power_neg )
+    a = BASE_COST * ( DEVIATION_COST - 1 ) / ( max_power * ( 1 - OPT_POWER ) )
+    pos_cost = a * ( opt_power + power_pos )
+
+    return power * ( neg_cost + BASE_COST + pos_cost )
+
+
+def build_model(units, profiles=input.profiles, model=None, presolved=None, elastic=False):
+    '''Build the unit commitment model. When a block is passed, components are added to it.
+    With presolve result, fixed commitment goes into bounds and redundant constraints are not created.
+    Elastic model always has a solution - demand balance gets penalized slacks for unserved energy and curtailment.'''
 
     # ## Auxiliary functions
 
-    def power_bounds(_m, plant, _hour):
+    def fixed(plant, hour):
+        '''Commitment fixed by presolve (1 - on, 0 - off) or None'''
+        return fixed_on.get(plant, {}).get(hour)
+
+    def power_bounds(_m, plant, hour):
         '''Max power for each plant'''
+        if fixed(plant, hour) == 0:
+            return ( 0, 0 )
+        if fixed(plant, hour) == 1:
+            return ( MIN_POWER * plants[plant]['power'], plants[plant]['power'] )
         return ( 0, plants[plant]['power'] )
-    
-    def power_pos_bounds(_m, plant, _hour):
+
+    def power_pos_bounds(_m, plant, hour):
+        if fixed(plant, hour) == 0:
+            return ( 0, 0 )
         return ( 0, plants[plant]['power'] * ( 1 - OPT_POWER ) )
-    
-    def power_neg_bounds(_m, plant, _hour):
+
+    def power_neg_bounds(_m, plant, hour):
+        if fixed(plant, hour) == 0:
+            return ( 0, 0 )
         return ( -plants[plant]['power'] * ( OPT_POWER - MIN_POWER ), 0 )
-    
+
     def b_load_bounds(_m, battery, _hour):
         return ( 0, batteries[battery]['power'] )
 
     def b_reload_bounds(_m, battery, _hour):
         return ( -batteries[battery]['power'], 0 )
-    
+
     def b_bounds(_m, battery, _hour):
         return ( -batteries[battery]['power'], batteries[battery]['power'] )
-    
+
     def b_volume_bounds(_m, battery, _hour):
         return ( 0, batteries[battery]['power'] * BATTERY_LOAD_TIME)
-    
+
     def vc(m, plant, hour):
 
         '''Additional vc cost related to deviation from optimal point'''
 
         BASE_COST = plants[plant]['vc']
         max_power = plants[plant]['power']
-        opt_power = plants[plant]['power'] * OPT_POWER 
+        opt_power = plants[plant]['power'] * OPT_POWER
 
         # Cost related to negative power / deviation in minus from optimal power
-        a = BASE_COST * ( DEVIATION_COST - 1 ) / ( max_power * ( MIN_POWER - OPT_POWER ) ) 
+        a = BASE_COST * ( DEVIATION_COST - 1 ) / ( max_power * ( MIN_POWER - OPT_POWER ) )
         b = -a * OPT_POWER * max_power
         x = opt_power + (opt_power + m.power_neg[plant, hour])
         y = neg_cost = a * x + b
@@ -57,33 +175,29 @@ def uc_model(units):
         return neg_cost + BASE_COST + pos_cost
 
     # ### Data
-    
+
     # ## Constants
-    HOURS = [t for t in range(1, 25)]
-    MIN_POWER = 0.4
-    START_UP_COST = 10
-    OPT_POWER = 0.7
+    HOURS = [t for t in range(1, len(profiles['demand']) + 1)]  # time steps, hourly unless profiles have durations
     DEVIATION_COST = float( os.environ.get("DEVIATION_COST") )
-    BATTERY_EFF = 0.6
-    BATTERY_START = 0.5  # 0 - fully discharged, 0 - fully charged
-    BATTERY_LOAD_TIME = 5  # hours
 
     # ## Profiles
-    demand_profile = { hour+1: value for hour, value in enumerate(input.profiles['demand']) }
-    wind_profile = { hour+1: value for hour, value in enumerate(input.profiles['wind']) }
-    pv_profile = { hour+1: value for hour, value in enumerate(input.profiles['pv']) }
+    demand_profile, wind_profile, pv_profile = hourly_profiles(profiles)
+    duration = step_durations(profiles)
 
     # ## Units
-    plants = { key: val for key, val in units.items() if units[key]['type'] in ['coal', 'gas', 'nuclear'] }
-    demand_sources = { key: val for key, val in units.items() if units[key]['type'] in ['demand'] }
-    wind_farms = { key: val for key, val in units.items() if units[key]['type'] in ['wind'] }
-    pv_farms = { key: val for key, val in units.items() if units[key]['type'] in ['pv'] }
-    batteries = { key: val for key, val in units.items() if units[key]['type'] in ['battery'] }
-    
+    if presolved:
+        units = presolved['units']
+    plants, demand_sources, wind_farms, pv_farms, batteries = split_units(units)
+
+    # ## Presolve reductions
+    fixed_on = presolved['on'] if presolved else {}
+    ramp_free = presolved['ramp_free'] if presolved else []
+
     # ### Pyomo model
 
     # ## Model initialization
-    model = pyo.ConcreteModel()
+    if model is None:
+        model = pyo.ConcreteModel()
 
     # ## Sets
     model.hours = pyo.Set(initialize=HOURS)
@@ -93,6 +207,9 @@ def uc_model(units):
     model.pv_farms = pyo.Set(initialize=list(pv_farms.keys()))
     model.batteries = pyo.Set(initialize=list(batteries.keys()))
 
+    # ## Parameters
+    model.duration = pyo.Param(model.hours, initialize=duration)  # hours
+
     # ## Variables
     model.power = pyo.Var(model.plants, model.hours, domain=pyo.NonNegativeReals, bounds=power_bounds)
     model.power_pos = pyo.Var(model.plants, model.hours, domain=pyo.NonNegativeReals, bounds=power_pos_bounds)
@@ -101,25 +218,43 @@ def uc_model(units):
     model.change_state = pyo.Var(model.plants, model.hours, domain=pyo.Integers, bounds=(-1, 1))  # switch-on = 1, switch-off = -1, else 0
     model.switch_on = pyo.Var(model.plants, model.hours, domain=pyo.NonNegativeIntegers, bounds=(-1, 1))
     model.switch_off = pyo.Var(model.plants, model.hours, domain=pyo.NonPositiveIntegers, bounds=(-1, 1))
-    
+
     model.b_load = pyo.Var(model.batteries, model.hours, domain=pyo.NonNegativeReals, bounds=b_load_bounds)
     model.b_reload = pyo.Var(model.batteries, model.hours, domain=pyo.NonPositiveReals, bounds=b_reload_bounds)
     model.b_power = pyo.Var(model.batteries, model.hours, domain=pyo.Reals, bounds=b_bounds)
     model.b_volume = pyo.Var(model.batteries, model.hours, domain=pyo.NonNegativeReals, bounds=b_volume_bounds)
 
+    if elastic:
+        model.unserved = pyo.Var(model.hours, domain=pyo.NonNegativeReals)
+        model.curtailed = pyo.Var(model.hours, domain=pyo.NonNegativeReals)
+
+    # Commitment decided by presolve - start-up variables are known where commitment of both hours is fixed
+    for plant in fixed_on:
+        for hour in fixed_on[plant]:
+            model.on[plant, hour].fix(fixed(plant, hour))
+            previous = fixed(plant, hour-1) if hour > 1 else 0
+            if previous is not None:
+                change = fixed(plant, hour) - previous
+                model.change_state[plant, hour].fix(change)
+                model.switch_on[plant, hour].fix(max(change, 0))
+                model.switch_off[plant, hour].fix(min(change, 0))
+
     # ## Objective - minimize cost of the power system
     model.system_costs = pyo.Objective(
-        expr = 
-        
+        expr =
+
         # Plants variable cost
-        + sum( model.power[plant, hour] * vc(model, plant, hour) for hour in model.hours for plant in model.plants )
+        + sum( model.power[plant, hour] * vc(model, plant, hour) * duration[hour] for hour in model.hours for plant in model.plants if fixed(plant, hour) != 0 )
 
         # Plants start-up cost
         + sum( START_UP_COST * plants[plant]['vc'] * plants[plant]['power'] * model.switch_on[plant, hour] for hour in model.hours for plant in model.plants )
 
         # Batteries variable cost
-        + sum( model.b_load[battery, hour] * batteries[battery]['vc'] for hour in model.hours for battery in model.batteries ) 
-        
+        + sum( model.b_load[battery, hour] * batteries[battery]['vc'] * duration[hour] for hour in model.hours for battery in model.batteries )
+
+        # Unserved energy and curtailment (elastic model)
+        + ( sum( ( UNSERVED_COST * model.unserved[hour] + CURTAILMENT_COST * model.curtailed[hour] ) * duration[hour] for hour in model.hours ) if elastic else 0 )
+
         , sense=pyo.minimize)
 
     # ## Constraints
@@ -130,63 +265,365 @@ def uc_model(units):
         + sum( wind_farms[ele]['power'] * wind_profile[hour] for ele in m.wind_farms )
         + sum( pv_farms[ele]['power'] * pv_profile[hour] for ele in m.pv_farms )
         + sum( -m.b_reload[battery, hour] for battery in m.batteries )
+        + ( m.unserved[hour] - m.curtailed[hour] if elastic else 0 )
         ==
         + sum( demand_sources[ele]['power'] * demand_profile[hour] for ele in m.demand_sources )
         + sum( m.b_load[battery, hour] for battery in m.batteries )
         )
 
-    # Max plant power
-    model.ct_plant_max_power = pyo.Constraint( model.plants, model.hours, rule=lambda m, plant, hour: m.power[plant, hour] <= plants[plant]['power'] * m.on[plant, hour] )
-    model.ct_plant_min_power = pyo.Constraint( model.plants, model.hours, rule=lambda m, plant, hour: m.power[plant, hour] >= MIN_POWER * plants[plant]['power'] * m.on[plant, hour] )
-    model.ct_plant_opt_power = pyo.Constraint( model.plants, model.hours, rule=lambda m, plant, hour: m.power[plant, hour] == m.power_neg[plant, hour] + OPT_POWER * plants[plant]['power'] * m.on[plant, hour] + m.power_pos[plant, hour] )
+    # Max plant power (fixed commitment is already in power bounds)
+    model.ct_plant_max_power = pyo.Constraint( model.plants, model.hours, rule=lambda m, plant, hour: m.power[plant, hour] <= plants[plant]['power'] * m.on[plant, hour] if fixed(plant, hour) is None else pyo.Constraint.Skip )
+    model.ct_plant_min_power = pyo.Constraint( model.plants, model.hours, rule=lambda m, plant, hour: m.power[plant, hour] >= MIN_POWER * plants[plant]['power'] * m.on[plant, hour] if fixed(plant, hour) is None else pyo.Constraint.Skip )
+    model.ct_plant_opt_power = pyo.Constraint( model.plants, model.hours, rule=lambda m, plant, hour: m.power[plant, hour] == m.power_neg[plant, hour] + OPT_POWER * plants[plant]['power'] * m.on[plant, hour] + m.power_pos[plant, hour] if fixed(plant, hour) != 0 else pyo.Constraint.Skip )
 
     # Do not allow negative / positive power in the same time
-    model.dj_plant = gdp.Disjunction( model.plants, model.hours, rule=lambda m, plant, hour: [ m.power_neg[plant, hour] == 0, m.power_pos[plant, hour] == 0 ] )
-    # pyo.TransformationFactory('gdp.hull').apply_to(model)
+    model.dj_plant = gdp.Disjunction( model.plants, model.hours, rule=lambda m, plant, hour: [ m.power_neg[plant, hour] == 0, m.power_pos[plant, hour] == 0 ] if fixed(plant, hour) != 0 else gdp.Disjunction.Skip )
 
     # Plant start up
-    model.ct_change_state = pyo.Constraint( model.plants, model.hours, rule=lambda m, plant, hour: m.change_state[plant, hour] == m.on[plant, hour] - m.on[plant, hour-1] if hour > 1 else m.change_state[plant, hour] == m.on[plant, hour] )
-    model.ct_switch = pyo.Constraint( model.plants, model.hours, rule=lambda m, plant, hour: m.change_state[plant, hour] == m.switch_on[plant, hour] + m.switch_off[plant, hour] )
-
-    # Plant ramp
-    model.ramp_up = pyo.Constraint(   
-        model.plants, model.hours, rule=lambda m, plant, hour: 
-        m.power[plant, hour] - m.power[plant, hour-1] 
-        <= 
-        + plants[plant]['ramp'] * model.on[plant, hour-1] 
+    model.ct_change_state = pyo.Constraint( model.plants, model.hours, rule=lambda m, plant, hour: pyo.Constraint.Skip if m.change_state[plant, hour].fixed else m.change_state[plant, hour] == m.on[plant, hour] - m.on[plant, hour-1] if hour > 1 else m.change_state[plant, hour] == m.on[plant, hour] )
+    model.ct_switch = pyo.Constraint( model.plants, model.hours, rule=lambda m, plant, hour: m.change_state[plant, hour] == m.switch_on[plant, hour] + m.switch_off[plant, hour] if not m.change_state[plant, hour].fixed else pyo.Constraint.Skip )
+
+    # Plant ramp (redundant when plant is off in the hour / ramp covers whole power), ramp is per hour - scaled by time between centers of steps
+    model.ramp_up = pyo.Constraint(
+        model.plants, model.hours, rule=lambda m, plant, hour:
+        m.power[plant, hour] - m.power[plant, hour-1]
+        <=
+        + plants[plant]['ramp'] * ( duration[hour-1] + duration[hour] ) / 2 * model.on[plant, hour-1]
         + MIN_POWER * plants[plant]['power'] * (1 - model.on[plant, hour-1])
-        if hour > 1 else pyo.Constraint.Skip )
-    model.ramp_down = pyo.Constraint( 
-        model.plants, model.hours, rule=lambda m, plant, hour: 
-        m.power[plant, hour] - m.power[plant, hour-1] 
-        >= 
-        - plants[plant]['ramp'] * model.on[plant, hour] 
+        if hour > 1 and fixed(plant, hour) != 0 and not (plant in ramp_free and fixed(plant, hour-1) == 1) else pyo.Constraint.Skip )
+    model.ramp_down = pyo.Constraint(
+        model.plants, model.hours, rule=lambda m, plant, hour:
+        m.power[plant, hour] - m.power[plant, hour-1]
+        >=
+        - plants[plant]['ramp'] * ( duration[hour-1] + duration[hour] ) / 2 * model.on[plant, hour]
         - plants[plant]['power'] * (1 - model.on[plant, hour])
-        if hour > 1 else pyo.Constraint.Skip )
-    
+        if hour > 1 and fixed(plant, hour-1) != 0 and plant not in ramp_free else pyo.Constraint.Skip )
+
     # Battery volume
-    model.b_volume_state = pyo.Constraint( model.batteries, model.hours, rule=lambda m, battery, hour: 
-        m.b_volume[battery, hour] == m.b_load[battery, hour] * BATTERY_EFF + m.b_reload[battery, hour] + m.b_volume[battery, hour-1] if hour > 1 else
-        m.b_volume[battery, hour] == m.b_load[battery, hour] * BATTERY_EFF + m.b_reload[battery, hour] + batteries[battery]['power'] * BATTERY_START * BATTERY_LOAD_TIME
+    model.b_volume_state = pyo.Constraint( model.batteries, model.hours, rule=lambda m, battery, hour:
+        m.b_volume[battery, hour] == ( m.b_load[battery, hour] * BATTERY_EFF + m.b_reload[battery, hour] ) * duration[hour] + m.b_volume[battery, hour-1] if hour > 1 else
+        m.b_volume[battery, hour] == ( m.b_load[battery, hour] * BATTERY_EFF + m.b_reload[battery, hour] ) * duration[hour] + batteries[battery]['power'] * BATTERY_START * BATTERY_LOAD_TIME
         )
 
     # Do not load / reload in the same time
     model.dj_battery = gdp.Disjunction( model.batteries, model.hours, rule=lambda m, battery, hour: [ m.b_load[battery, hour] == 0, m.b_reload[battery, hour] == 0 ] )
-    
+
     # Sum load and reload
     model.b_power_sum = pyo.Constraint( model.batteries, model.hours, rule=lambda m, battery, hour: m.b_power[battery, hour] == m.b_load[battery, hour] + m.b_reload[battery, hour] )
 
-    # ## Solve the model
-    mip_solver = 'cbc'
-    # solver_path = pathlib.Path(__file__).parent.resolve() / f'{solver_name}.exe'
-    nlp_solver = 'ipopt'
-    pyo.TransformationFactory('gdp.hull').apply_to(model)
+    return model
+
+
+def is_linear(model):
+    '''Model is MILP after GDP transformation when there is no deviation cost'''
+
+    objective = next(model.component_data_objects(pyo.Objective, active=True))
+
+    return objective.expr.polynomial_degree() in [0, 1]
+
+
+def backend_available(backend):
+    '''Check if all solvers of a backend are installed'''
+
+    settings = SOLVER_BACKENDS[backend]
+    names = [ settings['mip_solver'], settings['nlp_solver'] ] if settings['engine'] == 'mindtpy' else [ settings['engine'] ]
+
+    return all( pyo.SolverFactory(name).available(exception_flag=False) for name in names )
+
+
+def _solve_mindtpy(model, mip_solver, nlp_solver, **options):
+
+    options = { **SOLVER_OPTIONS, **options }
     solver = pyo.SolverFactory('mindtpy')
+
+    return solver.solve(model, mip_solver=mip_solver, nlp_solver=nlp_solver, **options)
+
+
+def _mip_start(solver, model):
+    '''Pass current values of integer variables (warm start) to HiGHS as MIP start, continuous part is completed by HiGHS'''
+
+    solver.set_instance(model)
+    columns = solver._pyomo_var_to_solver_var_map
+    start = [ ( columns[id(var)], var.value ) for var in model.component_data_objects(pyo.Var, active=True, descend_into=True)
+              if var.is_integer() and var.value is not None and id(var) in columns ]
+    if start:
+        index, value = zip(*start)
+        solver._solver_model.setSolution(len(index), np.array(index, dtype=np.int32), np.array(value, dtype=np.float64))
+
+
+def _solve_appsi(model, engine, **options):
+    '''In-process MILP solve (no problem / solution files). Of MindtPy options only init_strategy='initial_binary' applies -
+    on the first solve with HiGHS the warm start values are passed as MIP start, other options are ignored.'''
+
+    if not is_linear(model):
+        raise ValueError(f'Backend {engine} requires linear objective (DEVIATION_COST = 1)')
+
+    solver = getattr(model, 'solver', None)  # re-solve (added flow limits) updates the solver's copy of model
+    if not solver:
+        solver = pyo.SolverFactory(engine)
+        solver.update_config.treat_fixed_vars_as_params = False  # fixed variables stay columns - later fixing changes only their bounds
+        if engine == 'appsi_highs' and options.get('init_strategy') == 'initial_binary':
+            _mip_start(solver, model)
+    results = solver.solve(model, load_solutions=False)
+    if is_solved(results):
+        model.solutions.load_from(results)
+    model.solver = solver  # kept with its in-memory copy of model for later re-solves (marginal prices)
+
+    return results
+
+
+def solve_model(model, backend=None, **options):
+    '''Solve GDP-transformed model with given backend (by default SOLVER_BACKEND from environment or auto)'''
+
+    backend = backend or os.environ.get('SOLVER_BACKEND', 'auto')
+    if backend == 'auto':
+        backend = 'highs' if is_linear(model) and backend_available('highs') else 'mindtpy'
+
+    settings = { **SOLVER_BACKENDS[backend], **options }
+    engine = settings.pop('engine')
+    if engine == 'mindtpy':
+        return _solve_mindtpy(model, **settings)
+
+    return _solve_appsi(model, engine, **settings)
+
+
+def is_solved(results):
+    '''Check if solver found optimal or feasible solution'''
+
+    return (results.solver.status == pyo.SolverStatus.ok) and (results.solver.termination_condition in [pyo.TerminationCondition.optimal, pyo.TerminationCondition.feasible])
+
+
+def extract_results(model, units, profiles=input.profiles):
+    '''Summarize results - power of each unit at each hour'''
+
+    _, _, wind_farms, pv_farms, _ = split_units(units)
+    _, wind_profile, pv_profile = hourly_profiles(profiles)
+
+    results = {}
+    for unit in model.plants:
+        results[unit] = {}
+        for hour in model.hours:
+            power = round(pyo.value(model.power[unit, hour]), 2)
+            results[unit][hour] = power
+    for unit in model.pv_farms:
+        results[unit] = {}
+        for hour in model.hours:
+            power = pv_farms[unit]['power'] * pv_profile[hour]
+            results[unit][hour] = power
+    for unit in model.wind_farms:
+        results[unit] = {}
+        for hour in model.hours:
+            power = wind_farms[unit]['power'] * wind_profile[hour]
+            results[unit][hour] = power
+    for unit in model.batteries:
+        results[unit] = {}
+        for hour in model.hours:
+            power = round(pyo.value(model.b_power[unit, hour]), 2)
+            results[unit][hour] = -power
+
+    return results
+
+
+def marginal_prices(model):
+    '''System marginal price of each step [$/MWh] - duals of demand constraints of solved model with commitment fixed at its optimal values.
+    The same model is re-solved as LP (NLP with deviation cost), integer variables are released afterwards. None when re-solve fails.'''
+
+    integers = [ var for var in model.component_data_objects(pyo.Var, descend_into=(pyo.Block, gdp.Disjunct)) if var.is_integer() or var.is_binary() ]
+    fixed = ComponentSet( var for var in integers if var.fixed )  # presolve decisions stay fixed
+    domains = ComponentMap( (var, var.domain) for var in integers )
+    for var in integers:
+        var.domain = pyo.Reals  # fixed value as continuous bounds - solver sees LP, not MIP with fixed columns
+        if not var.fixed:
+            var.fix(round(var.value or 0))
+
+    demand = list(model.demand.values())
+    config, flags = None, {}
+    try:
+        # Duals of all demand constraints are read in one call (LP) or loaded with the solution into suffix (NLP)
+        if is_linear(model) and backend_available('highs'):
+            solver = getattr(model, 'solver', None) or pyo.SolverFactory('appsi_highs')
+
+            # Solver of MIP keeps its copy of the model - only bounds and integrality of variables are updated (flags are restored for later solves)
+            config = solver.update_config
+            flags = { flag: getattr(config, flag) for flag in PRICE_UPDATE_FLAGS }
+            for flag in PRICE_UPDATE_FLAGS:
+                setattr(config, flag, False)
+            results = solver.solve(model, load_solutions=False)
+            if not is_solved(results):
+                return None
+            duals = solver.get_duals(cons_to_load=demand)
+        else:
+            model.dual = pyo.Suffix(direction=pyo.Suffix.IMPORT)
+            results = pyo.SolverFactory(NLP_SOLVER).solve(model)
+            if not is_solved(results):
+                return None
+            duals = { constraint: model.dual[constraint] for constraint in demand }
+    finally:
+        for flag, value in flags.items():
+            setattr(config, flag, value)
+        for var in integers:
+            var.domain = domains[var]
+            if var not in fixed:
+                var.unfix()
+        if model.component('dual') is not None:
+            model.del_component(model.dual)
+
+    # Dual is change of cost per MW of demand in the step - divided by duration for price per MWh
+    return { hour: round(duals[model.demand[hour]] / pyo.value(model.duration[hour]), 4) for hour in model.hours }
+
+
+def warm_start(model, schedule):
+    '''Initialize model variables (before GDP transformation) with a schedule, e.g. from merit order heuristic'''
+
+    def set_value(var, value):
+        if not var.fixed:
+            var.set_value(min(max(value, var.lb), var.ub))
+
+    results = schedule['results']
+
+    for plant in model.plants:
+        for hour in model.hours:
+            power = results[plant][hour]
+            on = schedule['on'][plant][hour]
+            on_prev = schedule['on'][plant][hour-1] if hour > 1 else 0
+            deviation = power - OPT_POWER * model.power[plant, hour].ub * on
+
+            set_value(model.power[plant, hour], power)
+            set_value(model.on[plant, hour], on)
+            set_value(model.power_neg[plant, hour], min(deviation, 0))
+            set_value(model.power_pos[plant, hour], max(deviation, 0))
+            set_value(model.change_state[plant, hour], on - on_prev)
+            set_value(model.switch_on[plant, hour], max(on - on_prev, 0))
+            set_value(model.switch_off[plant, hour], min(on - on_prev, 0))
+            if (plant, hour) in model.dj_plant:
+                model.dj_plant[plant, hour].disjuncts[0].binary_indicator_var.set_value(int(deviation >= 0))
+                model.dj_plant[plant, hour].disjuncts[1].binary_indicator_var.set_value(int(deviation < 0))
+
+    for battery in model.batteries:
+        volume = model.b_volume[battery, 1].ub * BATTERY_START
+        for hour in model.hours:
+            injection = results[battery][hour]
+            load, reload = max(-injection, 0), -max(injection, 0)
+            volume = volume + ( load * BATTERY_EFF + reload ) * pyo.value(model.duration[hour])
+
+            set_value(model.b_load[battery, hour], load)
+            set_value(model.b_reload[battery, hour], reload)
+            set_value(model.b_power[battery, hour], load + reload)
+            set_value(model.b_volume[battery, hour], volume)
+            model.dj_battery[battery, hour].disjuncts[0].binary_indicator_var.set_value(int(load == 0))
+            model.dj_battery[battery, hour].disjuncts[1].binary_indicator_var.set_value(int(load != 0))
+
+
+def model_size(model):
+    '''Number of free variables and active constraints'''
+
+    return {
+        'variables': sum( 1 for var in model.component_data_objects(pyo.Var, descend_into=True) if not var.fixed ),
+        'constraints': sum( 1 for _ in model.component_data_objects(pyo.Constraint, active=True, descend_into=True) ),
+    }
+
+
+def _track_memory(stats, phase):
+    '''Peak Python memory of phase in MB - only while tracemalloc is tracing (benchmark), memory of solver libraries is not included'''
+
+    if tracemalloc.is_tracing():
+        stats.setdefault('memory', {})[phase] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.reset_peak()
+
+
+def release_model(model):
+    '''Free parts of solved model not needed for extraction of results - solver with its copy of model, disjunctions with their disjunct data
+    and all constraints (GDP transformation blocks included). Variables, sets, parameters and objective stay.'''
+
+    if 'solver' in model.__dict__:
+        del model.solver
+    for component in list(model.component_objects([gdp.Disjunction, gdp.Disjunct, pyo.Constraint, pyo.Block], descend_into=False)):
+        model.del_component(component)
+    gc.collect()
+
+
+def uc_model(units, profiles=input.profiles, initial=None, stats=None, use_presolve=None, lean=None, prices=None, elastic=None, zonal=None, previous=None, fallback=True):
+    '''Solve unit commitment - returns results (power of each unit in each step) and system cost, or (False, 0).
+    Memory-lean mode (MEMORY_LEAN=1) uses big-M reformulation (no disaggregated copies of variables)
+    and frees solver, disjunctions and constraints of the model before results are extracted. With prices (MARGINAL_PRICES=1) hourly marginal prices are put in stats.
+    Elastic mode (ELASTIC=1) always returns a schedule - unserved energy and curtailment are added to results as pseudo-units
+    and to stats, system cost does not include their penalty. Otherwise fleet failing capacity check is rejected before model is built.
+    Zonal mode (ZONAL=1) splits units into zones of input.network and limits flows between them (only overloaded lines are constrained),
+    flows of congested lines are put in stats. Marginal prices of zonal model are prices of its reference zone.
+    With previous solve ({'units', 'results'}) of a slightly different fleet only commitment near the change is re-optimized (repair.solve_repair),
+    the rest keeps previous schedule - with fallback the search ends with full solve when neighborhoods do not hold up.
+    Feasible initial schedule (hourly profiles only) is warm start of MindtPy (initial_binary) or MIP start of HiGHS (commitment only, first solve).'''
+
+    from presolve import presolve, capacity_check  # presolve, time steps and network use helpers of this module
+    from time_steps import model_profiles, expand_results
+    from network import add_network, solve_zonal, congestion
+    from repair import solve_repair
+
+    # Cost, status and duration of each phase are stored in stats dict (when provided)
+    stats = {} if stats is None else stats
+    timings = stats['timings'] = {}
+    lean = lean if lean is not None else os.environ.get('MEMORY_LEAN', '0') == '1'
+    prices = prices if prices is not None else os.environ.get('MARGINAL_PRICES', '0') == '1'
+    elastic = elastic if elastic is not None else os.environ.get('ELASTIC', '0') == '1'
+    zonal = zonal if zonal is not None else os.environ.get('ZONAL', '0') == '1'
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+
+    # ## Time resolution - TIME_STEP minutes, optionally merged into blocks of similar net load
+    hourly = profiles
+    profiles = model_profiles(units, profiles)
+    stats['steps'] = len(profiles['demand'])
+
+    # ## Capacity check - hours no schedule can balance
+    if not elastic:
+        check = capacity_check(units, profiles)
+        if check['shortfall'] or check['surplus']:
+            print('Model is infeasible (capacity check)')
+            stats['status'], stats['capacity'] = 'infeasible', check
+            return False, 0
+
+    # ## Presolve - fix commitment decided by data, skip redundant constraints (its reductions assume balanced single-bus demand, not used in elastic or zonal mode)
+    presolved = None
+    if not elastic and not zonal and ( use_presolve if use_presolve is not None else os.environ.get('PRESOLVE', '1') == '1' ):
+        start_time = time.time()
+        presolved = presolve(units, profiles)
+        stats['presolve'] = presolved['summary']
+        timings['presolve'] = time.time() - start_time
+        _track_memory(stats, 'presolve')
+
+    # ### Pyomo model
     start_time = time.time()
-    results = solver.solve(model, mip_solver=mip_solver, nlp_solver=nlp_solver, constraint_tolerance=0.1, absolute_bound_tolerance=0.1, relative_bound_tolerance=0.1, small_dual_tolerance=0.1, integer_tolerance=0.1)  # absolute_bound_tolerance=0.01, relative_bound_tolerance=0.01, small_dual_tolerance=0.01, integer_tolerance=0.01
+    model = build_model(units, profiles, presolved=presolved, elastic=elastic)
+    if zonal:
+        add_network(model, units, input.network, profiles, elastic=elastic)
+
+    # Start from provided feasible schedule
+    options = {}
+    if initial and initial['feasible'] and profiles is hourly:
+        warm_start(model, initial)
+        options['init_strategy'] = 'initial_binary'
+    timings['build'] = time.time() - start_time
+    _track_memory(stats, 'build')
 
-    # ## Optimalization results 
-    if (results.solver.status == pyo.SolverStatus.ok) and (results.solver.termination_condition in [pyo.TerminationCondition.optimal, pyo.TerminationCondition.feasible]):
+    # ## Solve the model
+    start_time = time.time()
+    pyo.TransformationFactory('gdp.bigm' if lean else 'gdp.hull').apply_to(model)
+    timings['transform'] = time.time() - start_time
+    stats['size'] = model_size(model)
+    _track_memory(stats, 'transform')
+
+    start_time = time.time()
+    solve = ( lambda: solve_zonal(model, lambda: solve_model(model, **options), stats) ) if zonal else ( lambda: solve_model(model, **options) )
+    if previous and profiles is hourly:
+        results = solve_repair(model, solve, units, previous, stats, fallback=fallback)
+    else:
+        results = solve()
+    timings['solve'] = time.time() - start_time
+    stats['status'] = str(results.solver.termination_condition)
+    _track_memory(stats, 'solve')
+
+    # ## Optimalization results
+    if is_solved(results):
 
         print(f'Model is {results.solver.termination_condition}')
 
@@ -234,54 +671,65 @@ def uc_model(units):
         # print('Reload:', 'Battery 1'.ljust(8, ' ') , '\t', [ str(int(pyo.value(model.b_reload['Battery 1', hour]))).rjust(4, ' ') for hour in model.hours ])
         # print('Sum:', 'Battery 1'.ljust(15, ' ') , '\t', [ str(int(pyo.value(model.b_reload['Battery 1', hour]))).rjust(4, ' ') for hour in model.hours ])
 
+        # Shortfall of elastic model - MW of unserved energy and curtailment in each step, their penalty
+        shortfall, penalty = {}, 0
+        if elastic:
+            shortfall = { name: { hour: round(pyo.value(var[hour]), 2) for hour in model.hours } for name, var in [ (UNSERVED, model.unserved), (CURTAILED, model.curtailed) ] }
+            penalty = sum( ( UNSERVED_COST * shortfall[UNSERVED][hour] + CURTAILMENT_COST * shortfall[CURTAILED][hour] ) * pyo.value(model.duration[hour]) for hour in model.hours )
+            shortfall = { name: values for name, values in shortfall.items() if any(values.values()) }
+
         # System cost
-        sys_cost = round(pyo.value(model.system_costs), 0)
+        stats['cost'] = pyo.value(model.system_costs) - penalty
+        sys_cost = round(stats['cost'], 0)
         sys_cost = f'{sys_cost} $'
-        
+
+        # Marginal prices - LP re-solve of the built model with fixed commitment
+        if prices:
+            start_time = time.time()
+            step_prices = marginal_prices(model)
+            stats['prices'] = expand_results({ 'price': step_prices }, profiles)['price'] if step_prices else None
+            timings['prices'] = time.time() - start_time
+
+        # Lean mode keeps only values of variables for extraction
+        if lean:
+            release_model(model)
+            _track_memory(stats, 'release')
+
         # Summarize results - power of each plant at each hour
-        model.results = {}
-        for unit in model.plants:
-            model.results[unit] = {}
-            for hour in model.hours:
-                power = round(pyo.value(model.power[unit, hour]), 2)
-                model.results[unit][hour] = power
-        for unit in model.pv_farms:
-            model.results[unit] = {}
-            for hour in model.hours:
-                power = pv_farms[unit]['power'] * pv_profile[hour]
-                model.results[unit][hour] = power
-        for unit in model.wind_farms:
-            model.results[unit] = {}
-            for hour in model.hours:
-                power = wind_farms[unit]['power'] * wind_profile[hour]
-                model.results[unit][hour] = power
-        for unit in model.batteries:
-            model.results[unit] = {}
-            for hour in model.hours:
-                power = round(pyo.value(model.b_power[unit, hour]), 2)
-                model.results[unit][hour] = -power
-        
+        start_time = time.time()
+        model.results = extract_results(model, units, profiles)
+        for plant in (presolved['removed'] if presolved else []):
+            model.results[plant] = { hour: 0 for hour in model.hours }
+        model.results.update(shortfall)
+        model.results = expand_results(model.results, profiles)
+        if shortfall:
+            stats['shortfall'] = { name: { hour: value for hour, value in model.results[name].items() if value } for name in shortfall }
+        if zonal:
+            stats['network']['congestion'] = expand_results(congestion(model), profiles)
+        timings['extract'] = time.time() - start_time
+        _track_memory(stats, 'extract')
+
         return model.results, sys_cost
 
     elif (results.solver.termination_condition == pyo.TerminationCondition.infeasible):
-        print('Model is infeasible') 
+        print('Model is infeasible')
         model, sys_cost = False, 0
         return False, 0
 
     elif (results.solver.termination_condition == pyo.TerminationCondition.unbounded):
         print('Model is unbounded')
         model, sys_cost = False, 0
-        return False, 0 
+        return False, 0
 
     else:
         print('Unhandled error. Solver Status: ',  results.solver.status)
         model, sys_cost = False, 0
         return False, 0
-    
+
 
 if __name__ == '__main__':
 
     from dotenv import load_dotenv
     load_dotenv(override=True)
 
-    uc_model(input.units)
\ No newline at end of file
+    uc_model(input.units)
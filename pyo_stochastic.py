@@ -0,0 +1,239 @@
+import pyomo.environ as pyo
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import time
+import os
+
+import input
+from pyo_model import build_model, solve_model, is_solved, extract_results, split_units
+
+
+# ## Progressive hedging settings
+PH_RHO_FACTOR = 0.5  # rho of each plant = factor * vc * power (cost of one hour at full power)
+PH_MAX_ITERATIONS = 20
+PH_TOLERANCE = 0.01  # average deviation of commitment from its scenario mean
+
+
+def generate_scenarios(n, profiles=input.profiles, deviation=0.2, seed=0):
+    '''Equally probable renewable scenarios - wind and pv profiles with multiplicative noise'''
+
+    rng = np.random.default_rng(seed)
+
+    scenarios = []
+    for _ in range(n):
+        wind = np.clip( np.array(profiles['wind']) * rng.normal(1, deviation, len(profiles['wind'])), 0, 1 )
+        pv = np.clip( np.array(profiles['pv']) * rng.normal(1, deviation, len(profiles['pv'])), 0, 1 )
+        scenarios.append({
+            'probability': 1 / n,
+            'profiles': {
+                'demand': list(profiles['demand']),
+                'wind': wind.round(2).tolist(),
+                'pv': pv.round(2).tolist(),
+            },
+        })
+
+    return scenarios
+
+
+# ### Scenario subproblems (run in worker processes)
+
+_worker = {'units': None, 'scenarios': None, 'models': {}}
+
+
+def _init_worker(units, scenarios):
+    '''Each worker keeps its own copy of data and builds scenario models only once'''
+
+    _worker['units'] = units
+    _worker['scenarios'] = scenarios
+    _worker['models'] = {}
+
+
+def _scenario_model(scenario):
+
+    if scenario in _worker['models']:
+        return _worker['models'][scenario]
+
+    units = _worker['units']
+    profiles = _worker['scenarios'][scenario]['profiles']
+    model = build_model(units, profiles)
+
+    # Progressive hedging terms: w * on + rho / 2 * (on - xbar)^2, for binary on: (on - xbar)^2 = on * (1 - 2 * xbar) + xbar^2
+    model.ph_w = pyo.Param(model.plants, model.hours, mutable=True, initialize=0)
+    model.ph_xbar = pyo.Param(model.plants, model.hours, mutable=True, initialize=0)
+    model.ph_rho = pyo.Param(model.plants, mutable=True, initialize=0)
+    model.system_costs.deactivate()
+    model.ph_costs = pyo.Objective(
+        expr =
+        + model.system_costs.expr
+        + sum( model.ph_w[plant, hour] * model.on[plant, hour] for hour in model.hours for plant in model.plants )
+        + sum( model.ph_rho[plant] / 2 * ( model.on[plant, hour] * ( 1 - 2 * model.ph_xbar[plant, hour] ) + model.ph_xbar[plant, hour] ** 2 ) for hour in model.hours for plant in model.plants )
+        , sense=pyo.minimize)
+
+    pyo.TransformationFactory('gdp.hull').apply_to(model)
+    _worker['models'][scenario] = model
+
+    return model
+
+
+def _solve_scenario(scenario, w, xbar, rho, fixed=None):
+    '''Solve one scenario subproblem. With fixed commitment only dispatch is optimized.'''
+
+    model = _scenario_model(scenario)
+
+    for key in model.on:
+        model.ph_w[key] = w.get(key, 0)
+        model.ph_xbar[key] = xbar.get(key, 0)
+        if fixed is None:
+            model.on[key].unfix()
+        else:
+            model.on[key].fix(fixed[key])
+    for plant in model.plants:
+        model.ph_rho[plant] = rho.get(plant, 0)
+
+    results = solve_model(model)
+    if not is_solved(results):
+        return scenario, False, {}, 0, {}
+
+    on = { key: round(pyo.value(model.on[key])) for key in model.on }
+    cost = pyo.value(model.system_costs)
+    dispatch = extract_results(model, _worker['units'], _worker['scenarios'][scenario]['profiles'])
+
+    return scenario, True, on, cost, dispatch
+
+
+def _commitment(on):
+    '''Commitment as nested dict {plant: {hour: 0/1}}'''
+
+    commitment = {}
+    for (plant, hour), value in on.items():
+        commitment.setdefault(plant, {})[hour] = value
+
+    return commitment
+
+
+# ### Solution methods
+
+def progressive_hedging(units, scenarios, workers=None, rho_factor=PH_RHO_FACTOR, max_iterations=PH_MAX_ITERATIONS, tolerance=PH_TOLERANCE):
+    '''Two-stage stochastic UC solved by scenario decomposition: commitment is first-stage, dispatch is per scenario'''
+
+    start_time = time.time()
+
+    plants, _, _, _, _ = split_units(units)
+    ids = list(range(len(scenarios)))
+    probability = { s: scenarios[s]['probability'] for s in ids }
+    rho = { plant: rho_factor * plants[plant]['vc'] * plants[plant]['power'] for plant in plants }
+    no_rho = {}
+    w = { s: {} for s in ids }
+    xbar = {}
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker, initargs=(units, scenarios)) as pool:
+
+        def solve_all(**kwargs):
+            futures = [ pool.submit(_solve_scenario, s, w[s], xbar, kwargs.get('rho', no_rho), kwargs.get('fixed')) for s in ids ]
+            solutions = [ future.result() for future in futures ]
+            return { s: solution for s, *solution in solutions }
+
+        # Iteration 0 - independent scenario solutions
+        iteration, converged = 0, False
+        solutions = solve_all()
+
+        while True:
+
+            if not all( solved for solved, _, _, _ in solutions.values() ):
+                print('Scenario subproblem is infeasible')
+                return False
+
+            # Mean commitment and its deviation from scenario commitments
+            keys = solutions[ids[0]][1].keys()
+            xbar = { key: sum( probability[s] * solutions[s][1][key] for s in ids ) for key in keys }
+            deviation = sum( probability[s] * abs(solutions[s][1][key] - xbar[key]) for s in ids for key in keys ) / max(len(keys), 1)
+
+            if deviation <= tolerance or iteration >= max_iterations:
+                converged = deviation <= tolerance
+                break
+
+            # Update multipliers and resolve scenarios with proximal term
+            for s in ids:
+                for key in keys:
+                    w[s][key] = w[s].get(key, 0) + rho[key[0]] * (solutions[s][1][key] - xbar[key])
+            iteration += 1
+            solutions = solve_all(rho=rho)
+
+        # Recourse - dispatch of each scenario for the common (rounded) commitment
+        on = { key: round(value) for key, value in xbar.items() }
+        w = { s: {} for s in ids }
+        xbar = {}
+        solutions = solve_all(fixed=on)
+
+    if not all( solved for solved, _, _, _ in solutions.values() ):
+        print('Commitment is infeasible for some scenarios')
+        return False
+
+    return {
+        'commitment': _commitment(on),
+        'expected_cost': sum( probability[s] * solutions[s][2] for s in ids ),
+        'scenarios': [ solutions[s][3] for s in ids ],
+        'iterations': iteration,
+        'converged': converged,
+        'wall_time': time.time() - start_time,
+    }
+
+
+def extensive_form(units, scenarios):
+    '''Two-stage stochastic UC solved as one model with non-anticipative commitment'''
+
+    start_time = time.time()
+
+    plants, _, _, _, _ = split_units(units)
+    ids = list(range(len(scenarios)))
+
+    model = pyo.ConcreteModel()
+    model.scenarios = pyo.Set(initialize=ids)
+    model.scenario = pyo.Block(model.scenarios)
+    for s in ids:
+        build_model(units, scenarios[s]['profiles'], model=model.scenario[s])
+        model.scenario[s].system_costs.deactivate()
+
+    # First-stage commitment shared by all scenarios
+    model.hours = pyo.Set(initialize=list(model.scenario[ids[0]].hours))
+    model.plants = pyo.Set(initialize=list(plants.keys()))
+    model.on = pyo.Var(model.plants, model.hours, domain=pyo.Binary)
+    model.non_anticipativity = pyo.Constraint(model.scenarios, model.plants, model.hours, rule=lambda m, s, plant, hour: m.scenario[s].on[plant, hour] == m.on[plant, hour])
+
+    model.expected_costs = pyo.Objective(expr=sum( scenarios[s]['probability'] * model.scenario[s].system_costs.expr for s in ids ), sense=pyo.minimize)
+
+    pyo.TransformationFactory('gdp.hull').apply_to(model)
+    results = solve_model(model)
+
+    if not is_solved(results):
+        print('Model is infeasible')
+        return False
+
+    on = { key: round(pyo.value(model.on[key])) for key in model.on }
+
+    return {
+        'commitment': _commitment(on),
+        'expected_cost': pyo.value(model.expected_costs),
+        'scenarios': [ extract_results(model.scenario[s], units, scenarios[s]['profiles']) for s in ids ],
+        'wall_time': time.time() - start_time,
+    }
+
+
+if __name__ == '__main__':
+
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
+
+    # Wall time of decomposition versus extensive form for growing number of scenarios
+    print('Scenarios'.ljust(12), 'PH [s]'.rjust(10), 'EF [s]'.rjust(10), 'PH cost'.rjust(14), 'EF cost'.rjust(14))
+    for n in [2, 4, 8, 16, 32]:
+        scenarios = generate_scenarios(n)
+        ph = progressive_hedging(input.units, scenarios)
+        ef = extensive_form(input.units, scenarios)
+        print(
+            str(n).ljust(12),
+            (f"{ph['wall_time']:.1f}" if ph else '-').rjust(10),
+            (f"{ef['wall_time']:.1f}" if ef else '-').rjust(10),
+            (f"{ph['expected_cost']:.0f}" if ph else '-').rjust(14),
+            (f"{ef['expected_cost']:.0f}" if ef else '-').rjust(14),
+        )
@@ -0,0 +1,149 @@
+from pyomo.common.collections import ComponentSet
+import pyomo.environ as pyo
+import bisect
+
+from pyo_model import split_units, is_solved, generation_cost, START_UP_COST
+
+
+# ## Neighborhood search settings
+REPAIR_RADIUS = 2  # plants freed on each side of the change in merit order (doubled each time neighborhood is widened)
+REPAIR_TOLERANCE = 0.001  # share of cost - wider neighborhood improving best cost by less than this is not widened further
+REPAIR_ROUNDS = 4  # neighborhoods tried before falling back to full solve
+EPS = 1e-6
+
+
+def changed_units(units, previous_units):
+    '''Names of units created, deleted or updated since previous fleet'''
+
+    return { name for name in set(units) | set(previous_units) if units.get(name) != previous_units.get(name) }
+
+
+def _anchor_costs(units, previous_units, previous_results):
+    # Variable costs the change happened at - changed plants (old and new vc), for other units the most expensive plant running in each hour
+
+    plants, _, _, _, _ = split_units(units)
+    previous_plants, _, _, _, _ = split_units(previous_units)
+
+    costs = set()
+    for name in changed_units(units, previous_units):
+        if name in plants or name in previous_plants:
+            costs.update( fleet[name]['vc'] for fleet in [plants, previous_plants] if name in fleet )
+            continue
+
+        # Demand, renewables or batteries - change is absorbed by marginal plants of previous schedule
+        for hour in next(iter(previous_results.values()), {}):
+            running = [ previous_plants[plant]['vc'] for plant in previous_plants if previous_results.get(plant, {}).get(hour, 0) > EPS ]
+            if running:
+                costs.add(max(running))
+
+    return costs
+
+
+def neighborhood(units, previous_units, previous_results, radius=REPAIR_RADIUS):
+    '''Plants with commitment free to change - radius plants around each change in merit order and plants without previous schedule'''
+
+    plants, _, _, _, _ = split_units(units)
+    merit = sorted(plants, key=lambda plant: plants[plant]['vc'])
+    costs = [ plants[plant]['vc'] for plant in merit ]
+
+    free = { plant for plant in plants if plant not in previous_results }
+    for cost in _anchor_costs(units, previous_units, previous_results):
+        position = bisect.bisect_left(costs, cost)
+        free.update(merit[max(position - radius, 0):position + radius + 1])
+
+    return free
+
+
+def previous_cost(units, previous_results, hours):
+    '''Cost of previous schedule re-priced for edited fleet - production and start-ups of plants and loading of batteries still in the fleet
+    (hourly steps, feasibility for the edited fleet is not checked)'''
+
+    plants, _, _, _, batteries = split_units(units)
+
+    cost = 0
+    for plant in plants:
+        power = [ previous_results.get(plant, {}).get(hour, 0) for hour in hours ]
+        start_ups = sum( 1 for step, value in enumerate(power) if value > EPS and ( step == 0 or power[step-1] <= EPS ) )
+        cost += sum( generation_cost(plants[plant], value) for value in power if value > EPS )
+        cost += START_UP_COST * plants[plant]['vc'] * plants[plant]['power'] * start_ups
+    for battery in batteries:
+        cost += sum( max(-previous_results.get(battery, {}).get(hour, 0), 0) * batteries[battery]['vc'] for hour in hours )
+
+    return cost
+
+
+def _values(model):
+    # Values of all variables (transformed model included) - solution of a round restored after later rounds
+
+    return [ (var, var.value) for var in model.component_data_objects(pyo.Var, descend_into=True) ]
+
+
+def solve_repair(model, solve, units, previous, stats=None, fallback=True):
+    '''Re-solve after small fleet edit (solve is called without arguments) - commitment of plants far from the change is fixed to the previous
+    schedule ({'units', 'results'}), only neighborhood is optimized. Neighborhood is accepted when it is not more expensive than the previous
+    schedule re-priced for the edited fleet. Otherwise it is widened while the wider one lowers the best cost found (and when fixed commitment
+    is infeasible). With fallback all commitment is freed (full solve) after REPAIR_ROUNDS. Solution of the best round is kept.'''
+
+    stats = {} if stats is None else stats
+    previous_units = previous['units']
+    previous_results = { unit: { int(hour): power for hour, power in values.items() } for unit, values in previous['results'].items() }
+    plants = list(model.plants)
+    hours = list(model.hours)
+
+    committed = { plant: { hour: int(previous_results[plant].get(hour, 0) > EPS) for hour in hours } for plant in plants if plant in previous_results }
+    presolved = ComponentSet( var for var in model.on.values() if var.fixed )  # commitment fixed by presolve stays fixed
+    reference = previous_cost(units, previous_results, hours)
+
+    def commitment(plant, hour):
+        # On state, its change and start-up / shut-down of plant in hour (as presolve fixes them)
+        on = committed[plant][hour]
+        change = on - ( committed[plant][hour-1] if hour > hours[0] else 0 )
+        return [ (model.on, on), (model.change_state, change), (model.switch_on, max(change, 0)), (model.switch_off, min(change, 0)) ]
+
+    radius, best, rounds = REPAIR_RADIUS, None, 0
+    while True:
+        free = set(plants) if rounds == REPAIR_ROUNDS and fallback else neighborhood(units, previous_units, previous_results, radius)
+        for plant in plants:
+            for hour in hours:
+                if model.on[plant, hour] in presolved:
+                    continue
+                for var, value in ( commitment(plant, hour) if plant in committed else [] ):
+                    if plant in free:
+                        var[plant, hour].unfix()
+                    else:
+                        var[plant, hour].fix(value)
+
+        results = solve()
+        rounds += 1
+        full = set(plants) <= free
+
+        # Stop when neighborhood is not worse than previous schedule or wider neighborhood did not lower best cost enough
+        if is_solved(results):
+            cost = pyo.value(model.system_costs)
+            improved = best is None or best['cost'] - cost > REPAIR_TOLERANCE * abs(best['cost'])
+            if best is None or cost < best['cost']:
+                best = { 'cost': cost, 'results': results, 'round': rounds, 'free': len(free), 'full': full, 'values': None if full else _values(model) }
+            if cost <= reference + REPAIR_TOLERANCE * abs(reference) or not improved:
+                break
+
+        # Stop when all plants are free or when rounds are used up (no fallback)
+        if full or ( not fallback and rounds == REPAIR_ROUNDS ):
+            break
+        radius *= 2
+
+    # Later rounds did not beat the best one - its solution is restored
+    if best is not None and best['round'] != rounds:
+        for var, value in best['values']:
+            var.set_value(value, skip_validation=True)
+        results = best['results']
+
+    stats['repair'] = {
+        'changed': len(changed_units(units, previous_units)),
+        'free': best['free'] if best else len(free),
+        'plants': len(plants),
+        'rounds': rounds,
+        'best_round': best['round'] if best else None,
+        'full': best['full'] if best else full,
+    }
+
+    return results
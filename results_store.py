@@ -0,0 +1,109 @@
+from functools import lru_cache
+import numpy as np
+import tempfile
+import uuid
+import time
+import glob
+import os
+
+from history import pack_schedule, unpack_schedule
+
+
+RESULTS_DIR = os.environ.get('RESULTS_DIR', os.path.join(tempfile.gettempdir(), 'uc_results'))
+RESULTS_TTL = 24 * 3600  # sec, results not read for this long are removed
+MAX_BARS = 400  # bars per unit sent to browser when width of results graph is not known
+BAR_WIDTH = 2  # px of results graph per bar
+
+
+# ### Results kept on server, browser holds only token
+
+def save(results):
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    _remove_old()
+
+    token = uuid.uuid4().hex
+    temp_path = os.path.join(RESULTS_DIR, f'{token}.{os.getpid()}.tmp')
+    with open(temp_path, 'wb') as file:
+        file.write(pack_schedule(results))
+    os.replace(temp_path, os.path.join(RESULTS_DIR, f'{token}.npz'))
+
+    return token
+
+
+def load(token):
+    '''Results as unit x step matrix - (units, steps, power). Every read renews their time to live,
+    removed (expired) results raise FileNotFoundError also when they are still cached.'''
+
+    path = os.path.join(RESULTS_DIR, f'{os.path.basename(token)}.npz')
+    os.utime(path)
+
+    return _read(path)
+
+
+@lru_cache(maxsize=32)
+def _read(path):
+
+    with open(path, 'rb') as file:
+        results = unpack_schedule(file.read())
+
+    units = list(results.keys())
+    steps = np.array(list(results[units[0]].keys())) if units else np.array([], dtype=int)
+    power = np.array([ list(results[unit].values()) for unit in units ])
+
+    return units, steps, power
+
+
+def schedule(token):
+    '''Results as power of each unit in each step (previous schedule of repair re-solve)'''
+
+    units, steps, power = load(token)
+
+    return { unit: dict(zip(steps.tolist(), power[i].tolist())) for i, unit in enumerate(units) }
+
+
+def _remove_old():
+
+    for path in glob.glob(os.path.join(RESULTS_DIR, '*.npz')):
+        try:
+            if os.path.getmtime(path) < time.time() - RESULTS_TTL:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+# ### Aggregated view
+
+def max_bars(width=None):
+    '''Bars per unit fitting graph of given width [px]'''
+
+    return max(1, int(width // BAR_WIDTH)) if width else MAX_BARS
+
+
+def downsample(token, start=None, end=None, max_bars=MAX_BARS):
+    '''Results in window of steps [start, end] reduced to at most max_bars buckets per unit.
+    Returns bucket centers, widths and mean / min / max power of each unit.'''
+
+    units, steps, power = load(token)
+
+    mask = np.ones(len(steps), dtype=bool)
+    if start is not None:
+        mask &= steps >= start
+    if end is not None:
+        mask &= steps <= end
+    steps, power = steps[mask], power[:, mask]
+    if not len(steps):
+        return { 'units': units, 'x': [], 'width': [], 'mean': {}, 'min': {}, 'max': {}, 'bucket': 1 }
+
+    size = max(1, int(np.ceil(len(steps) / max_bars)))
+    edges = np.arange(0, len(steps), size)
+
+    return {
+        'units': units,
+        'x': ( ( steps[edges] + steps[np.minimum(edges + size, len(steps)) - 1] ) / 2 ).tolist(),
+        'width': [ float(min(size, len(steps) - edge)) for edge in edges ],
+        'mean': { unit: np.add.reduceat(power[i], edges) / np.diff(np.append(edges, len(steps))) for i, unit in enumerate(units) },
+        'min': { unit: np.minimum.reduceat(power[i], edges) for i, unit in enumerate(units) },
+        'max': { unit: np.maximum.reduceat(power[i], edges) for i, unit in enumerate(units) },
+        'bucket': size,
+    }
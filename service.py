@@ -0,0 +1,54 @@
+import input
+import history
+import profiling
+from pyo_model import uc_model, model_settings
+from merit_order import merit_order_dispatch
+from presolve import capacity_check, CapacityError
+from solve_queue import solve_queue
+from single_flight import single_flight, solve_key
+import os
+
+
+def _solve_and_store(key, units, profiles, previous=None):
+
+    stats = {}
+    fallback = os.environ.get('REPAIR_FALLBACK', '1') == '1'
+    results, sys_cost = uc_model(units, profiles, initial=merit_order_dispatch(units, profiles), stats=stats, previous=previous, fallback=fallback)
+
+    # Repaired schedule is optimal only within its neighborhood - history keeps full solves
+    if results and stats.get('repair', {}).get('full', True):
+        history.save_run(key, units, model_settings(), results, sys_cost, stats)
+
+    return results, sys_cost
+
+
+def solve(units, session, profiles=input.profiles, profile=False, previous=None):
+    '''Solution from history when the same input was already solved, otherwise solved in queue
+    (identical requests in flight share one solve). Returns results, sys_cost and if it comes from history.
+    Profiled solve always runs (no history, no sharing) and its profile is saved.
+    Fleet which cannot balance demand in some hours raises CapacityError before anything is queued (unless model is elastic).
+    With REPAIR=1 and previous solve of edited fleet ({'units', 'results'}) only commitment near the edit is re-optimized (not shared, not stored).'''
+
+    settings = model_settings()
+    if not settings['ELASTIC']:
+        check = capacity_check(units, profiles)
+        if check['shortfall'] or check['surplus']:
+            raise CapacityError(check)
+
+    key = solve_key(units, profiles, settings)
+
+    if profile:
+        results, sys_cost = solve_queue.run(session, profiling.profile_call, f'{len(units)}-units', _solve_and_store, key, units, profiles)
+        return results, sys_cost, False
+
+    stored = history.find_run(key)
+    if stored:
+        return *stored, True
+
+    if previous and os.environ.get('REPAIR', '0') == '1':
+        results, sys_cost = solve_queue.run(session, _solve_and_store, key, units, profiles, previous)
+        return results, sys_cost, False
+
+    results, sys_cost = single_flight.run(key, solve_queue.run, session, _solve_and_store, key, units, profiles)
+
+    return results, sys_cost, False
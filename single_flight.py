@@ -0,0 +1,143 @@
+import threading
+import tempfile
+import hashlib
+import pickle
+import json
+import time
+import glob
+import os
+
+try:
+    import fcntl  # lock files coordinate worker processes (not available on Windows)
+except ImportError:
+    fcntl = None
+
+
+RESULT_TTL = 60  # sec, result files of finished solves older than this are removed
+
+
+def solve_key(*parts):
+    '''Hash of everything that determines the solution (units, profiles, settings)'''
+
+    text = json.dumps(parts, sort_keys=True, default=str)
+
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class _Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    '''Concurrent calls with the same key share one execution - within process through events,
+    between processes through lock files (waiting process reads result of the one holding the lock)'''
+
+    def __init__(self, directory):
+
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def run(self, key, function, *args, **kwargs):
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_between_processes(key, function, *args, **kwargs)
+            return call.result
+
+        except Exception as error:
+            call.error = error
+            raise
+
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _run_between_processes(self, key, function, *args, **kwargs):
+
+        if fcntl is None:
+            return function(*args, **kwargs)
+
+        path = os.path.join(self.directory, key)
+        start_time = time.time()
+
+        lock, waited = self._acquire(f'{path}.lock')
+        with lock:
+
+            # Other process was solving - take its result
+            if waited:
+                try:
+                    if os.path.getmtime(f'{path}.result') >= start_time:
+                        with open(f'{path}.result', 'rb') as file:
+                            return pickle.load(file)
+                except (OSError, pickle.UnpicklingError, EOFError):
+                    pass  # other process failed, solve here
+
+            self._remove_old_results()
+            result = function(*args, **kwargs)
+
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            with open(temp_path, 'wb') as file:
+                pickle.dump(result, file)
+            os.replace(temp_path, f'{path}.result')
+
+            return result
+
+    def _acquire(self, lock_path):
+        '''Open and exclusively lock lock file - returns (file, waited). Lock file removed by cleanup meanwhile is opened again,
+        so all processes lock the same file.'''
+
+        waited = False
+        while True:
+            lock = open(lock_path, 'w')
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                waited = True
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if os.fstat(lock.fileno()).st_ino == os.stat(lock_path).st_ino:
+                    return lock, waited
+            except OSError:
+                pass
+            lock.close()
+
+    def _remove_old_results(self):
+
+        for path in glob.glob(os.path.join(self.directory, '*.result')):
+            try:
+                if os.path.getmtime(path) < time.time() - RESULT_TTL:
+                    os.remove(path)
+            except OSError:
+                pass
+
+        # Lock files of old keys - removed only when no process holds the lock (process waiting for it opens the file again)
+        for path in glob.glob(os.path.join(self.directory, '*.lock')):
+            try:
+                if os.path.getmtime(path) < time.time() - RESULT_TTL:
+                    with open(path, 'a') as lock:
+                        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        os.remove(path)
+            except OSError:
+                pass  # lock is held (BlockingIOError) or file is already removed
+
+
+single_flight = SingleFlight(os.environ.get('SINGLE_FLIGHT_DIR', os.path.join(tempfile.gettempdir(), 'uc_single_flight')))
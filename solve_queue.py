@@ -0,0 +1,83 @@
+from collections import OrderedDict, deque
+import threading
+import os
+
+
+class QueueFull(Exception):
+    '''Solve was rejected because the queue (or session's share of it) is full'''
+
+
+class SolveQueue:
+    '''Limits number of concurrent solves. Waiting solves form a bounded queue served round-robin by session.'''
+
+    def __init__(self, max_running, max_waiting, max_per_session):
+
+        self.max_running = max_running
+        self.max_waiting = max_waiting
+        self.max_per_session = max_per_session
+
+        self._condition = threading.Condition()
+        self._running = 0
+        self._waiting = 0
+        self._queues = OrderedDict()  # session -> tickets, order of sessions is the round-robin order
+
+    def _is_next(self, ticket):
+
+        session = next(iter(self._queues))
+
+        return self._running < self.max_running and self._queues[session][0] is ticket
+
+    def run(self, session, function, *args, **kwargs):
+        '''Wait for a free slot and run function in it. Raises QueueFull immediately when there is no room to wait.'''
+
+        ticket = object()
+
+        with self._condition:
+
+            if self._waiting >= self.max_waiting:
+                raise QueueFull('Server is busy, try again later.')
+            if len(self._queues.get(session, [])) >= self.max_per_session:
+                raise QueueFull('Previous request is still waiting.')
+
+            self._queues.setdefault(session, deque()).append(ticket)
+            self._waiting += 1
+
+            while not self._is_next(ticket):
+                self._condition.wait()
+
+            # Session goes to the end of round-robin order
+            queue = self._queues.pop(session)
+            queue.popleft()
+            if queue:
+                self._queues[session] = queue
+            self._waiting -= 1
+            self._running += 1
+            self._condition.notify_all()
+
+        try:
+            return function(*args, **kwargs)
+
+        finally:
+            with self._condition:
+                self._running -= 1
+                self._condition.notify_all()
+
+    def position(self, session):
+        '''Position of session's next solve in queue (1 - runs next, 0 - nothing waiting)'''
+
+        with self._condition:
+            sessions = list(self._queues.keys())
+
+        return sessions.index(session) + 1 if session in sessions else 0
+
+    def status(self):
+
+        with self._condition:
+            return { 'running': self._running, 'waiting': self._waiting }
+
+
+solve_queue = SolveQueue(
+    max_running=int( os.environ.get('SOLVE_WORKERS', max(1, os.cpu_count() // 2)) ),
+    max_waiting=int( os.environ.get('SOLVE_QUEUE_SIZE', 10) ),
+    max_per_session=int( os.environ.get('SOLVE_QUEUE_PER_SESSION', 1) ),
+    )
@@ -0,0 +1,9 @@
+import pathlib
+import sys
+
+from dotenv import load_dotenv
+
+
+ROOT = pathlib.Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(ROOT))
+load_dotenv(ROOT / '.env', override=True)
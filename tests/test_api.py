@@ -0,0 +1,33 @@
+import threading
+import time
+import json
+
+import index
+import input
+import service
+
+
+def test_batch_is_one_queue_session_of_client_address(monkeypatch):
+
+    sessions, running, overlap = [], [], []
+    lock = threading.Lock()
+
+    def solve(units, session, profiles=None):
+        with lock:
+            sessions.append(session)
+            running.append(1)
+            overlap.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.pop()
+        return { 'Coal 1': {} }, '0 $', False
+
+    monkeypatch.setattr(service, 'solve', solve)
+    client = index.server.test_client()
+    body = { 'fleets': [ { 'id': f'f{i}', 'units': input.units } for i in range(6) ] }
+    response = client.post('/api/solve', json=body, headers={ 'X-Client-Id': 'someone-else' }, environ_base={ 'REMOTE_ADDR': '10.0.0.7' })
+
+    lines = [ json.loads(line) for line in response.get_data(as_text=True).splitlines() ]
+    assert [ line['id'] for line in lines ] == [ f'f{i}' for i in range(6) ]
+    assert set(sessions) == { 'api:10.0.0.7' }
+    assert max(overlap) == 1
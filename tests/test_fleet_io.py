@@ -0,0 +1,22 @@
+import io
+
+import pytest
+
+import fleet_io
+from map_clusters import map_view
+
+
+HEADER = 'name,type,power,vc,ramp,lat,lon\n'
+
+
+@pytest.mark.parametrize('lat, lon', [('nan', '-97.8'), ('31.1', 'inf'), ('-inf', '-97.8'), ('95', '-97.8'), ('31.1', '-200')])
+def test_non_finite_or_out_of_range_coordinates_are_rejected(lat, lon):
+
+    csv = HEADER + 'Coal 1,coal,180,3,50,31.06,-97.82\n' + f'Coal 2,coal,190,2,50,{lat},{lon}\n'
+    report = fleet_io.read_fleet(io.BytesIO(csv.encode()))
+
+    assert list(report['units']) == ['Coal 1']
+    assert report['rejected'] == 1 and report['errors'][0]['row'] == 2
+
+    # Imported fleet renders on map
+    map_view(report['units'], (25, 37), (-112.5, -87.5))
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from pyo_lagrange import _plant_bound
+from pyo_model import generation_cost, MIN_POWER, START_UP_COST
+
+
+@pytest.mark.parametrize('deviation_cost', ['1', '2', '3.5'])
+def test_plant_bound_is_below_grid_minimum(monkeypatch, deviation_cost):
+
+    monkeypatch.setenv('DEVIATION_COST', deviation_cost)
+    plant = { 'type': 'gas', 'vc': 20, 'power': 500, 'ramp': 500 }
+    grid = np.linspace(MIN_POWER * plant['power'], plant['power'], 100001)
+
+    for price in [0, 10, 20, 35, 50, 80, 120]:
+
+        # Constant price over two days - plant is off, or on in all hours at best power (one start-up)
+        prices = np.full(48, float(price))
+        on = START_UP_COST * plant['vc'] * plant['power'] + len(prices) * ( generation_cost(plant, grid) - price * grid ).min()
+        bound = _plant_bound(plant, prices)
+
+        assert bound <= min(0, on) + 1e-6
+        assert bound >= min(0, on) - 1e-3 * max(1, abs(on))
+
+
+def test_plant_bound_of_reported_case(monkeypatch):
+
+    # DEVIATION_COST = 2, price 80 - minimizer is 400 MW (on value -21333 without start-up)
+    monkeypatch.setenv('DEVIATION_COST', '2')
+    plant = { 'type': 'gas', 'vc': 20, 'power': 500, 'ramp': 500 }
+    grid = np.linspace(MIN_POWER * plant['power'], plant['power'], 100001)
+    prices = np.full(48, 80.0)
+
+    on_value = ( generation_cost(plant, grid) - 80 * grid ).min()
+    expected = START_UP_COST * plant['vc'] * plant['power'] + len(prices) * on_value
+
+    assert _plant_bound(plant, prices) == pytest.approx(expected, rel=1e-6)
@@ -0,0 +1,42 @@
+import pytest
+
+import input
+from presolve import presolve
+from pyo_model import uc_model
+from time_steps import model_profiles
+
+
+# Ramp covers whole power per hour, but only a quarter of it per 15-minute step
+RAMP_UNITS = { name: { **unit, 'ramp': unit['power'] } if name in ['Coal 1', 'Coal 2', 'Coal 3', 'Gas 3'] else unit for name, unit in input.units.items() }
+
+
+def _largest_ramp(results, plant):
+    # Largest change of power between consecutive steps the plant is on in both
+
+    power = list(results[plant].values())
+
+    return max(( abs(after - before) for before, after in zip(power, power[1:]) if before > 0 and after > 0 ), default=0)
+
+
+def test_ramp_free_needs_whole_power_within_shortest_step(monkeypatch):
+
+    monkeypatch.setenv('ADAPTIVE_STEPS', '0')
+
+    monkeypatch.setenv('TIME_STEP', '60')
+    assert 'Coal 3' in presolve(RAMP_UNITS, model_profiles(RAMP_UNITS))['ramp_free']
+
+    monkeypatch.setenv('TIME_STEP', '15')
+    assert presolve(RAMP_UNITS, model_profiles(RAMP_UNITS))['ramp_free'] == []
+
+
+@pytest.mark.parametrize('use_presolve', [False, True])
+def test_presolve_keeps_ramp_limits_of_sub_hourly_steps(monkeypatch, use_presolve):
+
+    monkeypatch.setenv('TIME_STEP', '15')
+    monkeypatch.setenv('ADAPTIVE_STEPS', '0')
+
+    results, _ = uc_model(RAMP_UNITS, use_presolve=use_presolve, lean=False, prices=False, elastic=False, zonal=False)
+
+    assert results
+    for plant in ['Coal 1', 'Coal 2', 'Coal 3', 'Gas 3']:
+        assert _largest_ramp(results, plant) <= RAMP_UNITS[plant]['ramp'] * 0.25 + 0.01
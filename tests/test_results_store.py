@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+import results_store
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+
+    monkeypatch.setattr(results_store, 'RESULTS_DIR', str(tmp_path))
+    results_store._read.cache_clear()
+
+    return tmp_path
+
+
+def test_cached_read_renews_time_to_live(store):
+
+    token = results_store.save({ 'Coal 1': { 1: 100.0, 2: 150.0 } })
+    path = store / f'{token}.npz'
+    results_store.load(token)
+    os.utime(path, (0, 0))
+    units, steps, power = results_store.load(token)
+
+    assert units == ['Coal 1'] and steps.tolist() == [1, 2] and power.tolist() == [[100.0, 150.0]]
+    assert results_store._read.cache_info().hits == 1
+    assert os.path.getmtime(path) > results_store.RESULTS_TTL
+
+
+def test_expired_results_are_not_served_from_cache(store):
+
+    token = results_store.save({ 'Coal 1': { 1: 100.0 } })
+    results_store.downsample(token)
+    os.remove(store / f'{token}.npz')
+
+    with pytest.raises(FileNotFoundError):
+        results_store.downsample(token, 1, 1)
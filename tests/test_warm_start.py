@@ -0,0 +1,45 @@
+import pyomo.environ as pyo
+import pytest
+
+import input
+import pyo_model
+from aggregation import annual_profiles
+from merit_order import merit_order_dispatch
+from pyo_model import build_model, warm_start, backend_available, _mip_start
+
+pytestmark = pytest.mark.skipif(not backend_available('highs'), reason='HiGHS not installed')
+
+
+def _model(profiles):
+
+    model = build_model(input.units, profiles)
+    warm_start(model, merit_order_dispatch(input.units, profiles))
+    pyo.TransformationFactory('gdp.hull').apply_to(model)
+
+    return model
+
+
+@pytest.mark.parametrize('start', [False, True])
+def test_mip_start_is_incumbent(start):
+
+    # No search (time limit 0) - only MIP start gives a feasible solution
+    model = _model(annual_profiles(3))
+    solver = pyo.SolverFactory('appsi_highs')
+    solver.update_config.treat_fixed_vars_as_params = False
+    solver.highs_options = { 'time_limit': 0.0 }
+    if start:
+        _mip_start(solver, model)
+    results = solver.solve(model, load_solutions=False)
+
+    assert ( results.problem.upper_bound is not None ) == start
+
+
+def test_initial_binary_reaches_highs(monkeypatch):
+
+    calls = []
+    monkeypatch.setattr(pyo_model, '_mip_start', lambda solver, model: calls.append(model))
+    model = _model(annual_profiles(3))
+    pyo_model.solve_model(model, backend='highs', init_strategy='initial_binary')
+    pyo_model.solve_model(model, backend='highs', init_strategy='initial_binary')  # re-solve keeps solver, no new start
+
+    assert calls == [model]
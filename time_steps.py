@@ -0,0 +1,79 @@
+import numpy as np
+import os
+
+import input
+from merit_order import net_demand
+
+
+# ## Time step settings
+MERGE_TOLERANCE = 0.02  # max spread of net load within merged block, share of peak net load
+MAX_BLOCK = 4  # hours, longest merged block (start-ups stay possible inside long flat periods)
+SERIES = ['demand', 'wind', 'pv']
+EPS = 1e-6
+
+
+def resample(profiles, minutes):
+    '''Hourly profiles at steps of given length - value of an hour belongs to its middle, steps between are interpolated'''
+
+    step = minutes / 60
+    hours = len(profiles['demand'])
+    centers = np.arange(hours) + 0.5
+    steps = ( np.arange(round(hours / step)) + 0.5 ) * step
+
+    resampled = { key: np.interp(steps, centers, profiles[key]).round(4).tolist() for key in SERIES }
+    resampled['duration'] = [step] * len(steps)
+
+    return resampled
+
+
+def merge_steps(units, profiles, tolerance=MERGE_TOLERANCE, max_block=MAX_BLOCK):
+    '''Consecutive steps with near-identical net load merged into variable-length blocks (duration-weighted averages)'''
+
+    net = net_demand(units, profiles)
+    duration = np.array(profiles.get('duration', [1] * len(net)), dtype=float)
+    limit = tolerance * max(np.abs(net).max(), EPS)
+
+    blocks = []
+    start = 0
+    for end in range(1, len(net) + 1):
+        if end == len(net) or np.ptp(net[start:end + 1]) > limit or duration[start:end + 1].sum() > max_block + EPS:
+            blocks.append((start, end))
+            start = end
+
+    merged = { key: [ float(np.average(profiles[key][start:end], weights=duration[start:end]).round(4)) for start, end in blocks ] for key in SERIES }
+    merged['duration'] = [ float(duration[start:end].sum()) for start, end in blocks ]
+    merged['steps'] = [ end - start for start, end in blocks ]  # original steps in each block
+
+    return merged
+
+
+def model_profiles(units, profiles=input.profiles):
+    '''Profiles in time resolution of the model - TIME_STEP minutes, merged into blocks when ADAPTIVE_STEPS is on'''
+
+    minutes = int( os.environ.get('TIME_STEP', 60) )
+    adaptive = os.environ.get('ADAPTIVE_STEPS', '0') == '1'
+
+    if minutes != 60:
+        profiles = resample(profiles, minutes)
+    if adaptive:
+        profiles = merge_steps(units, profiles)
+
+    return profiles
+
+
+def expand_results(results, profiles):
+    '''Results of merged blocks back on the uniform step grid (value of block repeated for each of its steps)'''
+
+    if 'steps' not in profiles:
+        return results
+
+    expanded = {}
+    for unit, values in results.items():
+        expanded[unit] = {}
+        step = 1
+        for block, count in enumerate(profiles['steps'], start=1):
+            for _ in range(count):
+                expanded[unit][step] = values[block]
+                step += 1
+
+    return expanded
@@ -0,0 +1,90 @@
+import math
+
+import input
+
+
+MAX_VALUE = 1500  # upper limit of unit power, vc and ramp
+MIN_NAME_LENGTH = 3
+MODEL_TYPES = ['coal', 'gas', 'nuclear', 'demand', 'wind', 'pv', 'battery']  # types known to the model (dashboard creates input.unit_types only)
+PROFILES = ['demand', 'wind', 'pv']
+COORDINATES = { 'lat': (-90, 90), 'lon': (-180, 180) }  # degrees
+
+
+def _is_number(value):
+
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def valid_value(value):
+    '''Power, vc and ramp of unit - number between 0 and MAX_VALUE'''
+
+    return _is_number(value) and 0 <= value <= MAX_VALUE
+
+
+def valid_name(name, units):
+    '''Name of new unit - long enough and not used yet'''
+
+    return isinstance(name, str) and len(name) >= MIN_NAME_LENGTH and name not in units
+
+
+def unit_errors(name, unit):
+    '''Problems of unit definition, empty when unit is valid (same rules as unit creation in dashboard)'''
+
+    if not isinstance(unit, dict):
+        return [f'Unit: {name} is not an object.']
+
+    errors = []
+    if not isinstance(name, str) or len(name) < MIN_NAME_LENGTH:
+        errors.append(f'Unit: {name} - name must have at least {MIN_NAME_LENGTH} characters.')
+    if unit.get('type') not in MODEL_TYPES:
+        errors.append(f"Unit: {name} - type must be one of {', '.join(MODEL_TYPES)}.")
+    for key in ['power', 'vc', 'ramp']:
+        if not valid_value(unit.get(key)):
+            errors.append(f'Unit: {name} - {key} must be between 0 and {MAX_VALUE}.')
+    for key, (low, high) in COORDINATES.items():
+        if key in unit and not ( _is_number(unit[key]) and low <= unit[key] <= high ):
+            errors.append(f'Unit: {name} - {key} must be a number between {low} and {high}.')
+
+    return errors
+
+
+def fleet_errors(units):
+
+    if not isinstance(units, dict) or not units:
+        return ['Units must be a non-empty object.']
+
+    errors = []
+    for name, unit in units.items():
+        errors += unit_errors(name, unit)
+
+    return errors
+
+
+def profiles_errors(profiles):
+    '''Problems of profiles - demand, wind and pv shares of installed power with equal length (optionally step durations)'''
+
+    if not isinstance(profiles, dict):
+        return ['Profiles must be an object.']
+
+    errors = []
+    lengths = set()
+    for key in PROFILES + ( ['duration'] if 'duration' in profiles else [] ):
+        values = profiles.get(key)
+        if not isinstance(values, list) or not values or not all( _is_number(value) and value >= 0 for value in values ):
+            errors.append(f'Profile: {key} must be a non-empty list of non-negative numbers.')
+            continue
+        if key in ['wind', 'pv'] and max(values) > 1:
+            errors.append(f'Profile: {key} must not exceed 1 (share of installed power).')
+        if key == 'duration' and min(values) <= 0:
+            errors.append('Profile: duration must be positive.')
+        lengths.add(len(values))
+
+    if len(lengths) > 1:
+        errors.append('Profiles must have the same length.')
+
+    return errors
+
+
+if __name__ == '__main__':
+
+    print(fleet_errors(input.units) + profiles_errors(input.profiles) or 'input.units and input.profiles are valid')